@@ -0,0 +1,11 @@
+-- 既存のテーブルに row_hash 列を追加する（create_tables.sql の変更前に作成したテーブル用）
+-- row_hash は update_supabase.py が送信する行のハッシュ（sync_manifest.py。管理用の列を除く全列から計算）
+
+ALTER TABLE master_teams_info ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE master_players_info ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE transaction_game_info ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE transaction_game_hitter_stats ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE transaction_game_pitcher_stats ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE transaction_team_stats ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE transaction_hitter_stats ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE transaction_pitcher_stats ADD COLUMN IF NOT EXISTS row_hash TEXT;
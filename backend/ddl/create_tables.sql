@@ -18,6 +18,7 @@ CREATE TABLE master_teams_info (
     key TEXT PRIMARY KEY,
     team TEXT,
     team_name TEXT,
+    row_hash TEXT,
     delete_flg INTEGER NOT NULL DEFAULT 0,
     created_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
@@ -30,6 +31,7 @@ CREATE TABLE master_players_info (
     player_number INTEGER,
     player_name TEXT,
     nickname TEXT,
+    row_hash TEXT,
     delete_flg INTEGER NOT NULL DEFAULT 0,
     created_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
@@ -72,6 +74,7 @@ CREATE TABLE transaction_game_info (
     lose_pitcher TEXT,
     save_pitcher TEXT,
     hr_player TEXT,
+    row_hash TEXT,
     delete_flg INTEGER NOT NULL DEFAULT 0,
     created_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
@@ -109,6 +112,7 @@ CREATE TABLE transaction_game_hitter_stats (
     oponent_error INTEGER,
     own_error INTEGER,
     caught_stealing INTEGER,
+    row_hash TEXT,
     delete_flg INTEGER NOT NULL DEFAULT 0,
     created_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
@@ -138,6 +142,7 @@ CREATE TABLE transaction_game_pitcher_stats (
     balks INTEGER,
     wild_pitches INTEGER,
     "order" INTEGER,
+    row_hash TEXT,
     delete_flg INTEGER NOT NULL DEFAULT 0,
     created_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
@@ -159,6 +164,7 @@ CREATE TABLE transaction_team_stats (
     home_runs INTEGER,
     stolen_bases INTEGER,
     earned_run_average NUMERIC(6,2),
+    row_hash TEXT,
     delete_flg INTEGER NOT NULL DEFAULT 0,
     created_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
@@ -196,6 +202,7 @@ CREATE TABLE transaction_hitter_stats (
     opponent_error INTEGER,
     own_error INTEGER,
     caught_stealing INTEGER,
+    row_hash TEXT,
     delete_flg INTEGER NOT NULL DEFAULT 0,
     created_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
@@ -231,6 +238,7 @@ CREATE TABLE transaction_pitcher_stats (
     wild_pitches INTEGER,
     k_bb NUMERIC(8,3),
     whip NUMERIC(6,3),
+    row_hash TEXT,
     delete_flg INTEGER NOT NULL DEFAULT 0,
     created_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_dt TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
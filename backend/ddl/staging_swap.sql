@@ -0,0 +1,166 @@
+-- 一括投入用のステージングテーブルと入れ替えの関数（PostgreSQL / Supabase）
+-- load_to_supabase.py がトランザクションテーブルの一括投入に使う
+-- （投入中も公開中のテーブルは前回の内容のまま読めるようにし、投入が途中で失敗しても変更しない）
+--
+-- create_staging_table(テーブル名)
+--   - staging スキーマにテーブルと同じ列・キーのステージングテーブルを作る（既にある場合は作り直す）
+--
+-- stage_records(テーブル名, レコードの配列)
+--   - ステージングテーブルにレコードを登録する（key が既にあるレコードは無視するため、同じバッチを再送してもよい）
+--   - 戻り値は登録件数（CSV 内の key の重複は無視されるため、load_to_supabase.py が事前に確認し、登録件数も照合する）
+--
+-- swap_staging_tables(テーブル名の配列)
+--   - 1つのトランザクションで、各テーブルの全レコードを削除してステージングテーブルのレコードを登録し、
+--     ステージングテーブルを削除する（created_dt・updated_dt は現在日時）
+--   - 読み込みはロックしないため、コミットまでは前回の内容が読める（書き込みは入れ替えの間のみ待たせる）
+--   - 戻り値は登録件数の合計
+--
+-- drop_staging_tables(テーブル名の配列)
+--   - ステージングテーブルを削除する（投入が失敗した場合の後始末）
+--
+-- create_tables.sql の実行後に実行すること（テーブルを作り直した場合も再実行不要）
+-- ステージングテーブルは API（PostgREST）に公開しない staging スキーマに作り、関数の所有者の権限で操作する
+
+CREATE SCHEMA IF NOT EXISTS staging;
+REVOKE ALL ON SCHEMA staging FROM PUBLIC, anon, authenticated;
+
+CREATE OR REPLACE FUNCTION create_staging_table(p_table TEXT)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp
+AS $$
+BEGIN
+    IF p_table NOT LIKE 'transaction\_%' THEN
+        RAISE EXCEPTION 'create_staging_table: 対象外のテーブルです: %', p_table;
+    END IF;
+    IF to_regclass(format('public.%I', p_table)) IS NULL THEN
+        RAISE EXCEPTION 'create_staging_table: テーブルが存在しません: %', p_table;
+    END IF;
+
+    EXECUTE format('DROP TABLE IF EXISTS staging.%I', p_table);
+    -- WAL を書かない（投入後すぐに入れ替えて削除するため）
+    EXECUTE format(
+        'CREATE UNLOGGED TABLE staging.%1$I (LIKE public.%1$I INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING INDEXES)',
+        p_table
+    );
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION stage_records(p_table TEXT, p_records JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp
+AS $$
+DECLARE
+    v_column_list TEXT;
+    v_count INTEGER;
+BEGIN
+    IF p_table NOT LIKE 'transaction\_%' THEN
+        RAISE EXCEPTION 'stage_records: 対象外のテーブルです: %', p_table;
+    END IF;
+    IF p_records IS NULL OR jsonb_array_length(p_records) = 0 THEN
+        RETURN 0;
+    END IF;
+
+    -- 送信された列（先頭のレコードのキー）のうちテーブルに存在する列。日時の列は入れ替え時に設定するため除く
+    SELECT string_agg(format('%I', a.attname), ', ' ORDER BY a.attnum)
+    INTO v_column_list
+    FROM pg_attribute a
+    WHERE a.attrelid = to_regclass(format('staging.%I', p_table))
+      AND a.attnum > 0
+      AND NOT a.attisdropped
+      AND a.attname NOT IN ('created_dt', 'updated_dt')
+      AND (p_records -> 0) ? a.attname;
+
+    IF v_column_list IS NULL THEN
+        RAISE EXCEPTION 'stage_records: ステージングテーブルがありません（create_staging_table を先に呼び出すこと）: %', p_table;
+    END IF;
+
+    EXECUTE format(
+        'INSERT INTO staging.%1$I (%2$s)
+         SELECT %2$s FROM jsonb_populate_recordset(NULL::staging.%1$I, $1)
+         ON CONFLICT (key) DO NOTHING',
+        p_table, v_column_list
+    )
+    USING p_records;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION swap_staging_tables(p_tables TEXT[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp
+AS $$
+DECLARE
+    v_table TEXT;
+    v_column_list TEXT;
+    v_count INTEGER;
+    v_total INTEGER := 0;
+BEGIN
+    FOREACH v_table IN ARRAY p_tables LOOP
+        IF v_table NOT LIKE 'transaction\_%' THEN
+            RAISE EXCEPTION 'swap_staging_tables: 対象外のテーブルです: %', v_table;
+        END IF;
+        IF to_regclass(format('staging.%I', v_table)) IS NULL THEN
+            RAISE EXCEPTION 'swap_staging_tables: ステージングテーブルがありません: %', v_table;
+        END IF;
+        -- 入れ替えの間の書き込み（update_supabase.py など）を待たせる。読み込みは待たせない
+        EXECUTE format('LOCK TABLE public.%I IN SHARE ROW EXCLUSIVE MODE', v_table);
+    END LOOP;
+
+    FOREACH v_table IN ARRAY p_tables LOOP
+        SELECT string_agg(format('%I', a.attname), ', ' ORDER BY a.attnum)
+        INTO v_column_list
+        FROM pg_attribute a
+        WHERE a.attrelid = to_regclass(format('public.%I', v_table))
+          AND a.attnum > 0
+          AND NOT a.attisdropped
+          AND a.attname NOT IN ('created_dt', 'updated_dt');
+
+        -- TRUNCATE は読み込みもロックするため DELETE で削除する
+        EXECUTE format('DELETE FROM public.%I', v_table);
+        EXECUTE format(
+            'INSERT INTO public.%1$I (%2$s, created_dt, updated_dt)
+             SELECT %2$s, now(), now() FROM staging.%1$I',
+            v_table, v_column_list
+        );
+        GET DIAGNOSTICS v_count = ROW_COUNT;
+        v_total := v_total + v_count;
+        EXECUTE format('DROP TABLE staging.%I', v_table);
+    END LOOP;
+    RETURN v_total;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION drop_staging_tables(p_tables TEXT[])
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = pg_catalog, pg_temp
+AS $$
+DECLARE
+    v_table TEXT;
+BEGIN
+    FOREACH v_table IN ARRAY p_tables LOOP
+        IF v_table NOT LIKE 'transaction\_%' THEN
+            RAISE EXCEPTION 'drop_staging_tables: 対象外のテーブルです: %', v_table;
+        END IF;
+        EXECUTE format('DROP TABLE IF EXISTS staging.%I', v_table);
+    END LOOP;
+END;
+$$;
+
+-- 呼び出しはサービスロールのみ（anon・authenticated からは呼び出せない）
+REVOKE ALL ON FUNCTION create_staging_table(TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION create_staging_table(TEXT) TO service_role;
+REVOKE ALL ON FUNCTION stage_records(TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION stage_records(TEXT, JSONB) TO service_role;
+REVOKE ALL ON FUNCTION swap_staging_tables(TEXT[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION swap_staging_tables(TEXT[]) TO service_role;
+REVOKE ALL ON FUNCTION drop_staging_tables(TEXT[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION drop_staging_tables(TEXT[]) TO service_role;
@@ -0,0 +1,96 @@
+-- 野球記録テーブルの UPSERT・論理削除の関数（PostgreSQL / Supabase）
+-- update_supabase.py が 1バッチにつき1回 RPC で呼び出す（既存レコードの事前取得は行わない）
+--
+-- upsert_records(テーブル名, レコードの配列)
+--   - key が一致するレコードは送信された列を更新し、updated_dt を現在日時にする（created_dt は保持）
+--   - 新規レコードは created_dt・updated_dt を現在日時にして登録する
+--   - 戻り値は新規登録件数・更新件数（RETURNING の xmax = 0 で新規登録を判定）
+--
+-- mark_records_deleted(テーブル名, key の配列)
+--   - key が一致する有効なレコードの delete_flg を 1 にし、updated_dt を現在日時にする
+--   - 対象はトランザクションテーブルのみ（マスターテーブルは手動管理のため論理削除しない）
+--   - 戻り値は論理削除した件数
+--
+-- create_tables.sql の実行後に実行すること（テーブルを作り直した場合も再実行不要）
+
+CREATE OR REPLACE FUNCTION upsert_records(p_table TEXT, p_records JSONB)
+RETURNS TABLE (inserted INTEGER, updated INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_columns TEXT[];
+    v_column_list TEXT;
+    v_update_list TEXT;
+BEGIN
+    IF p_table NOT LIKE 'master\_%' AND p_table NOT LIKE 'transaction\_%' THEN
+        RAISE EXCEPTION 'upsert_records: 対象外のテーブルです: %', p_table;
+    END IF;
+    IF p_records IS NULL OR jsonb_array_length(p_records) = 0 THEN
+        RETURN QUERY SELECT 0, 0;
+        RETURN;
+    END IF;
+
+    -- 送信された列（先頭のレコードのキー）のうちテーブルに存在する列。日時の列はここで設定するため除く
+    SELECT array_agg(a.attname::TEXT ORDER BY a.attnum)
+    INTO v_columns
+    FROM pg_attribute a
+    WHERE a.attrelid = to_regclass(format('public.%I', p_table))
+      AND a.attnum > 0
+      AND NOT a.attisdropped
+      AND a.attname NOT IN ('created_dt', 'updated_dt')
+      AND (p_records -> 0) ? a.attname;
+
+    IF v_columns IS NULL OR NOT ('key' = ANY (v_columns)) THEN
+        RAISE EXCEPTION 'upsert_records: テーブルが存在しないか、key 列がありません: %', p_table;
+    END IF;
+
+    SELECT string_agg(format('%I', c), ', '),
+           string_agg(format('%I = EXCLUDED.%I', c, c), ', ') FILTER (WHERE c <> 'key')
+    INTO v_column_list, v_update_list
+    FROM unnest(v_columns) AS c;
+
+    RETURN QUERY EXECUTE format(
+        'WITH upserted AS (
+             INSERT INTO public.%1$I (%2$s, created_dt, updated_dt)
+             SELECT %2$s, now(), now() FROM jsonb_populate_recordset(NULL::public.%1$I, $1)
+             ON CONFLICT (key) DO UPDATE SET %3$s
+             RETURNING (xmax = 0) AS is_insert
+         )
+         SELECT (count(*) FILTER (WHERE is_insert))::INTEGER,
+                (count(*) FILTER (WHERE NOT is_insert))::INTEGER
+         FROM upserted',
+        p_table, v_column_list, concat_ws(', ', v_update_list, 'updated_dt = now()')
+    )
+    USING p_records;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION mark_records_deleted(p_table TEXT, p_keys TEXT[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    IF p_table NOT LIKE 'transaction\_%' THEN
+        RAISE EXCEPTION 'mark_records_deleted: 対象外のテーブルです: %', p_table;
+    END IF;
+    IF to_regclass(format('public.%I', p_table)) IS NULL THEN
+        RAISE EXCEPTION 'mark_records_deleted: テーブルが存在しません: %', p_table;
+    END IF;
+
+    EXECUTE format(
+        'UPDATE public.%I SET delete_flg = 1, updated_dt = now() WHERE key = ANY ($1) AND delete_flg = 0',
+        p_table
+    )
+    USING p_keys;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+-- 書き込みはサービスロールのみ（anon・authenticated からは呼び出せない）
+REVOKE ALL ON FUNCTION upsert_records(TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION upsert_records(TEXT, JSONB) TO service_role;
+REVOKE ALL ON FUNCTION mark_records_deleted(TEXT, TEXT[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION mark_records_deleted(TEXT, TEXT[]) TO service_role;
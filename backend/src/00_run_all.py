@@ -1,12 +1,37 @@
 """
-全てのスクレイピングスクリプトを順に実行するスクリプト
+全てのスクレイピングスクリプトを実行するスクリプト
+
+各スクリプト（ステージ）は読み込む・出力するファイルとともに STAGES で宣言し、入出力から決まる
+依存関係に従って実行する。依存関係のないステージ（試合ページ・チーム成績、打者成績・投手成績）は
+並行に実行するため、全体の実行時間は全ステージの合計ではなく最も長い依存の連鎖に近づく。
+
+既定では各スクリプトを同一プロセスで読み込み、main() をステージごとのスレッドで呼び出す
+（HTTPセッション・ホストごとのレート制限・キャッシュ・選手情報などの読み込み結果をステージ間で共有する）。
+--sequential を指定した場合は宣言順に1つずつ実行し、--subprocess を指定した場合は従来どおり
+スクリプトごとに別のPythonプロセスで1つずつ実行する。
+
+使用方法: python src/00_run_all.py <チーム名> [<チーム名> ...] [--test] [--workers N] [--parse-workers N]
+          [--team-workers N] [--incremental] [--resume] [--replay <dir>] [--parser NAME] [--sequential] [--subprocess]
+（baseball-record scrape <チーム名> ... でも実行できる）
 """
 import sys
-import subprocess
 import os
+import time
+import functools
+import importlib.util
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 数字で始まるモジュール名をインポートするため、importlibを使用
+# 同一プロセスで実行する各スクリプトと同じものを共有する（出力の接頭辞・HTTP統計など）
+utils = importlib.import_module("99_utils")
+
 
+# 読み込み済みのスクリプト（スクリプトのパス -> モジュール）
+_stage_modules = {}
 
-def run_script(script_path, team_names, test_mode=False):
+
+def run_script(script_path, team_names, test_mode=False, extra_args=None):
     """
     スクリプトを実行する
     
@@ -14,6 +39,7 @@ def run_script(script_path, team_names, test_mode=False):
         script_path: 実行するスクリプトのパス（相対パスまたは絶対パス）
         team_names: チーム名のリスト
         test_mode: テストモードかどうか
+        extra_args: 各スクリプトにそのまま渡すオプション（例: ['--workers', '8']）
     
     Returns:
         成功した場合はTrue、失敗した場合はFalse
@@ -39,6 +65,13 @@ def run_script(script_path, team_names, test_mode=False):
     if test_mode:
         cmd.append('--test')
     
+    if extra_args:
+        cmd.extend(extra_args)
+    
+    # --subprocess の場合のみ使うため、起動時にはインポートしない
+    import subprocess
+
+    started = time.perf_counter()
     try:
         # スクリプトを実行（プロジェクトルートを作業ディレクトリとして設定）
         result = subprocess.run(
@@ -47,11 +80,12 @@ def run_script(script_path, team_names, test_mode=False):
             cwd=project_root  # プロジェクトルートに移動
         )
         
+        elapsed = time.perf_counter() - started
         if result.returncode == 0:
-            print(f"\n✓ {script_name} が正常に完了しました")
+            print(f"\n✓ {script_name} が正常に完了しました（{elapsed:.1f}秒）")
             return True
         else:
-            print(f"\n✗ {script_name} がエラーで終了しました (終了コード: {result.returncode})")
+            print(f"\n✗ {script_name} がエラーで終了しました (終了コード: {result.returncode}, {elapsed:.1f}秒)")
             return False
             
     except Exception as e:
@@ -59,6 +93,177 @@ def run_script(script_path, team_names, test_mode=False):
         return False
 
 
+def load_stage(script_path):
+    """
+    スクリプトをモジュールとして読み込む（読み込み済みの場合はそれを返す）
+
+    Args:
+        script_path: スクリプトのパス（プロジェクトルートからの相対パスまたは絶対パス）
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script_abs_path = script_path if os.path.isabs(script_path) else os.path.join(project_root, script_path)
+    module = _stage_modules.get(script_abs_path)
+    if module is None:
+        name = os.path.splitext(os.path.basename(script_abs_path))[0]
+        spec = importlib.util.spec_from_file_location(f"stage_{name}", script_abs_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _stage_modules[script_abs_path] = module
+    return module
+
+
+def run_stage(script_path, team_names, test_mode=False, extra_args=None, reset_stats=True):
+    """
+    スクリプトの main() を同一プロセスで実行する（引数・戻り値は run_script と同じ）
+
+    スクリプトには set_stage_argv でチーム名とオプションを渡す（実行中のスレッドにのみ設定されるため、
+    複数のスクリプトを並行に実行できる）。sys.exit による終了は終了コードで、
+    例外はトレースバックを表示して失敗として扱う。
+
+    Args:
+        reset_stats: 実行前にHTTP統計をリセットするかどうか（並行実行時は統計が共有されるためFalse）
+    """
+    script_name = os.path.basename(script_path)
+    print("\n" + "=" * 70)
+    print(f"実行中: {script_name}")
+    print("=" * 70)
+    
+    argv = [script_path] + list(team_names)
+    if test_mode:
+        argv.append('--test')
+    if extra_args:
+        argv.extend(extra_args)
+    
+    started = time.perf_counter()
+    try:
+        module = load_stage(script_path)
+        utils.set_stage_argv(argv)
+        # HTTP統計はスクリプトごとに表示する
+        if reset_stats:
+            utils.reset_http_stats()
+        module.main()
+        returncode = 0
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        returncode = 1
+    finally:
+        utils.set_stage_argv(None)
+    
+    elapsed = time.perf_counter() - started
+    if returncode == 0:
+        print(f"\n✓ {script_name} が正常に完了しました（{elapsed:.1f}秒）")
+        return True
+    print(f"\n✗ {script_name} がエラーで終了しました (終了コード: {returncode}, {elapsed:.1f}秒)")
+    return False
+
+
+class Stage:
+    """
+    実行するスクリプト（ステージ）の宣言
+
+    Args:
+        script: スクリプトのパス（プロジェクトルートからの相対パス）
+        inputs: 読み込む出力ファイル（output/ 内のファイル名。これを出力するステージの完了後に実行する）
+        outputs: 出力するファイル（output/ 内のファイル名）
+        incremental_inputs: --incremental 指定時のみ読み込む出力ファイル
+    """
+
+    def __init__(self, script, inputs=(), outputs=(), incremental_inputs=()):
+        self.script = script
+        self.name = os.path.basename(script)
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.incremental_inputs = tuple(incremental_inputs)
+
+
+# 実行するステージ（入出力から依存関係を決める。宣言順は --sequential / --subprocess 時の実行順）
+# 試合情報・試合別打者成績・試合別投手成績（01〜03）は game_pages.py で試合ページを1回だけ取得してまとめて出力する。
+# 05・06 はチーム成績（04）の年度のみ取得し、--incremental 時は試合情報（01）から更新のあった年度を判定する
+STAGES = [
+    Stage('src/game_pages.py',
+          outputs=['01_game_info.csv', '02_game_hitter_stats.csv', '03_game_pitcher_stats.csv']),
+    Stage('src/04_get_team_stats.py',
+          outputs=['04_team_stats.csv']),
+    Stage('src/05_get_hitter_stats.py',
+          inputs=['04_team_stats.csv'], incremental_inputs=['01_game_info.csv'],
+          outputs=['05_hitter_stats.csv']),
+    Stage('src/06_get_pitcher_stats.py',
+          inputs=['04_team_stats.csv'], incremental_inputs=['01_game_info.csv'],
+          outputs=['06_pitcher_stats.csv']),
+]
+
+
+def stage_dependencies(stages, incremental=False):
+    """
+    ステージの依存関係を返す（ステージ名 -> 先に完了している必要があるステージ名の集合）
+
+    Args:
+        stages: Stage のリスト
+        incremental: --incremental 指定時の入力も依存関係に含めるかどうか
+    """
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            producers[output] = stage.name
+    dependencies = {}
+    for stage in stages:
+        inputs = stage.inputs + (stage.incremental_inputs if incremental else ())
+        dependencies[stage.name] = {
+            producers[path] for path in inputs
+            if path in producers and producers[path] != stage.name
+        }
+    return dependencies
+
+
+def run_stages(stages, runner, team_names, test_mode=False, extra_args=None, max_parallel=None):
+    """
+    依存関係に従ってステージを実行する。依存するステージが全て完了したステージから順に、
+    最大 max_parallel 個を並行に実行する（依存先が失敗した場合も、既存の出力を使って実行する）。
+
+    Args:
+        stages: Stage のリスト
+        runner: ステージを実行する関数（run_stage または run_script と同じ引数）
+        max_parallel: 同時に実行するステージ数の上限（1の場合は宣言順に1つずつ実行）
+
+    Returns:
+        {ステージ名: (成功したかどうか, 開始時刻, 終了時刻)}（時刻は time.perf_counter の値）
+    """
+    dependencies = stage_dependencies(stages, incremental='--incremental' in (extra_args or []))
+    remaining = list(stages)
+    results = {}
+    running = {}
+    
+    def execute(stage):
+        started = time.perf_counter()
+        # 並行実行中は出力の各行にステージ名を付ける
+        with utils.output_prefix(stage.name) if max_parallel > 1 else nullcontext():
+            success = runner(stage.script, team_names, test_mode=test_mode, extra_args=extra_args)
+        return success, started, time.perf_counter()
+    
+    max_parallel = max_parallel or len(stages)
+    with utils.prefixed_output() if max_parallel > 1 else nullcontext(), \
+            ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        while remaining or running:
+            # 依存先が全て完了したステージを開始する
+            for stage in list(remaining):
+                if len(running) >= max_parallel:
+                    break
+                if dependencies[stage.name] <= results.keys():
+                    remaining.remove(stage)
+                    running[executor.submit(execute, stage)] = stage
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                results[stage.name] = future.result()
+                # エラーが発生した場合は続行する（テストモードでない場合）
+                if not results[stage.name][0] and not test_mode:
+                    print(f"\n警告: {stage.name} でエラーが発生しましたが、処理を続行します...")
+    return results
+
+
 def main():
     """メイン処理"""
     # コマンドライン引数を解析
@@ -69,10 +274,63 @@ def main():
     if test_mode:
         args.remove('--test')
     
+    # --subprocess オプション（スクリプトごとに別プロセスで実行する）
+    use_subprocess = '--subprocess' in args
+    if use_subprocess:
+        args.remove('--subprocess')
+    
+    # --sequential オプション（依存関係のないスクリプトも並行に実行せず、1つずつ順に実行する）
+    sequential = '--sequential' in args
+    if sequential:
+        args.remove('--sequential')
+    
+    # --workers N / --parse-workers N / --team-workers N オプション（各スクリプトにそのまま渡す）
+    extra_args = []
+    for option in ('--workers', '--parse-workers', '--team-workers'):
+        if option in args:
+            idx = args.index(option)
+            if idx + 1 >= len(args) or not args[idx + 1].isdigit() or int(args[idx + 1]) < 1:
+                print(f"エラー: {option} には1以上の整数を指定してください")
+                sys.exit(1)
+            extra_args.extend(args[idx:idx + 2])
+            del args[idx:idx + 2]
+    
+    # --incremental オプション（各スクリプトにそのまま渡す）
+    if '--incremental' in args:
+        args.remove('--incremental')
+        extra_args.append('--incremental')
+    
+    # --resume オプション（前回中断した実行の続きから再開する。各スクリプトにそのまま渡す）
+    # 前回完了したスクリプトは出力ファイルをそのまま使い、中断したスクリプトは完了済みのページを取得しない
+    if '--resume' in args:
+        args.remove('--resume')
+        extra_args.append('--resume')
+    
+    # --replay <dir> オプション（ネットワークの代わりにアーカイブ・フィクスチャからページを取得）
+    # 各スクリプトはプロジェクトルートで実行されるため、絶対パスに変換して渡す
+    replay_dir = None
+    if '--replay' in args:
+        idx = args.index('--replay')
+        if idx + 1 >= len(args) or not os.path.isdir(args[idx + 1]):
+            print("エラー: --replay には存在するディレクトリを指定してください")
+            sys.exit(1)
+        replay_dir = os.path.abspath(args[idx + 1])
+        extra_args.extend(['--replay', replay_dir])
+        del args[idx:idx + 2]
+    
+    # --parser NAME オプション（HTMLパーサー。各スクリプトにそのまま渡す）
+    if '--parser' in args:
+        idx = args.index('--parser')
+        if idx + 1 >= len(args):
+            print("エラー: --parser にはパーサー名を指定してください")
+            sys.exit(1)
+        extra_args.extend(args[idx:idx + 2])
+        del args[idx:idx + 2]
+    
     # チーム名を取得
     if len(args) < 1:
         print("エラー: チーム名を指定してください")
-        print("使用方法: python src/00_run_all.py <チーム名> [<チーム名> ...] [--test]")
+        print("使用方法: python src/00_run_all.py <チーム名> [<チーム名> ...] [--test] [--workers N] [--parse-workers N] [--team-workers N] [--incremental] [--resume] [--replay <dir>] [--parser NAME] [--sequential] [--subprocess]")
         print("例: python src/00_run_all.py orcas")
         print("例: python src/00_run_all.py orcas swallows-fan")
         print("例（テストモード）: python src/00_run_all.py orcas swallows-fan --test")
@@ -86,46 +344,77 @@ def main():
             print(f"エラー: チーム名「{team_name}」は英数字のみで指定してください")
             sys.exit(1)
     
-    # 実行するスクリプトのリスト
-    scripts = [
-        'src/01_get_game_info.py',
-        'src/02_get_game_hitter_stats.py',
-        'src/03_get_game_pitcher_stats.py',
-        'src/04_get_team_stats.py',
-        'src/05_get_hitter_stats.py',
-        'src/06_get_pitcher_stats.py',
-    ]
-    
     print("=" * 70)
     print("全スクレイピングスクリプトの実行を開始します")
     print(f"チーム: {', '.join(team_names)}")
     if test_mode:
         print("モード: テストモード")
+    if '--incremental' in extra_args:
+        print("モード: 差分取得（--incremental）")
+    if '--resume' in extra_args:
+        print("モード: 前回中断した実行の続きから再開（--resume）")
+    if use_subprocess:
+        print("モード: スクリプトごとに別プロセスで実行（--subprocess）")
+    if replay_dir is not None:
+        print(f"モード: リプレイ（{replay_dir} からページを取得、ネットワークアクセスなし）")
+    
+    # 依存関係のないステージは並行に実行する（--sequential / --subprocess 指定時は宣言順に1つずつ実行）
+    dependencies = stage_dependencies(STAGES, incremental='--incremental' in extra_args)
+    if sequential or use_subprocess:
+        print("モード: 1つずつ順に実行")
+        max_parallel = 1
+    else:
+        max_parallel = None
+        print("実行順序（依存するステージの完了後に実行）:")
+        for stage in STAGES:
+            after = ', '.join(sorted(dependencies[stage.name])) or "なし"
+            print(f"  {stage.name}（依存: {after}）")
     print("=" * 70)
     
-    # 各スクリプトを順に実行
-    results = []
-    for script_path in scripts:
-        success = run_script(script_path, team_names, test_mode=test_mode)
-        results.append((script_path, success))
-        
-        # エラーが発生した場合は続行するか確認（テストモードでない場合）
-        if not success and not test_mode:
-            print(f"\n警告: {os.path.basename(script_path)} でエラーが発生しましたが、処理を続行します...")
+    if use_subprocess:
+        runner = run_script
+    else:
+        # 同一プロセスで実行する場合は、スクリプトの相対パス（output/ など）をプロジェクトルート基準にする
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        # スクリプトの読み込みは並行実行の前にまとめて行う
+        for stage in STAGES:
+            try:
+                load_stage(stage.script)
+            except Exception:
+                # 読み込みに失敗したスクリプトは run_stage で改めて読み込み、失敗として扱う
+                pass
+        if max_parallel == 1:
+            runner = run_stage
+        else:
+            # 並行実行中のステージはHTTPセッション・ホストごとのレート制限・HTTP統計を共有するため、
+            # 各スクリプトが表示するHTTP統計はその時点までの全ステージの合計になる
+            runner = functools.partial(run_stage, reset_stats=False)
+    started = time.perf_counter()
+    stage_results = run_stages(
+        STAGES, runner, team_names, test_mode=test_mode, extra_args=extra_args, max_parallel=max_parallel
+    )
+    total_elapsed = time.perf_counter() - started
     
     # 結果をまとめて表示
     print("\n" + "=" * 70)
     print("実行結果サマリー")
     print("=" * 70)
     
-    success_count = sum(1 for _, success in results if success)
-    total_count = len(results)
-    
-    for script_path, success in results:
+    results = []
+    for stage in STAGES:
+        success, stage_started, stage_finished = stage_results[stage.name]
+        results.append((stage.script, success, stage_finished - stage_started))
         status = "✓ 成功" if success else "✗ 失敗"
-        print(f"{status}: {os.path.basename(script_path)}")
+        print(
+            f"{status}: {stage.name}（{stage_finished - stage_started:.1f}秒, "
+            f"開始 +{stage_started - started:.1f}秒 / 終了 +{stage_finished - started:.1f}秒）"
+        )
+    
+    success_count = sum(1 for _, success, _ in results if success)
+    total_count = len(results)
     
     print(f"\n成功: {success_count}/{total_count}")
+    print(f"実行時間: {total_elapsed:.1f}秒（各スクリプトの合計 {sum(elapsed for _, _, elapsed in results):.1f}秒）")
     
     if success_count == total_count:
         print("\n全てのスクリプトが正常に完了しました！")
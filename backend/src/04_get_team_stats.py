@@ -1,34 +1,56 @@
 """
 チーム成績をスクレイピングしてCSVに出力するスクリプト
 """
-import sys
-import os
-import csv
-import importlib.util
+import importlib
 from datetime import datetime
-from bs4 import BeautifulSoup
-import time
 
 # 数字で始まるモジュール名をインポートするため、importlibを使用
-spec = importlib.util.spec_from_file_location("utils", os.path.join(os.path.dirname(__file__), "99_utils.py"))
-utils = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(utils)
+# 通常の import と同じく sys.modules に登録されるため、同一プロセスで複数のスクリプトを実行する場合（00_run_all）は
+# セッション・キャッシュを共有する
+utils = importlib.import_module("99_utils")
 get_html = utils.get_html
+record_failure = utils.record_failure
+make_soup = utils.make_soup
+print_http_stats = utils.print_http_stats
+polite_wait = utils.polite_wait
+run_for_teams = utils.run_for_teams
 extract_text = utils.extract_text
 parse_command_line_args = utils.parse_command_line_args
-prepare_csv_filename = utils.prepare_csv_filename
+open_checkpoint = utils.open_checkpoint
+
+
+# チーム成績ページで抽出処理が参照する領域（クラス名）。この領域のみツリーに構築する（make_soup の regions）
+TEAM_STATS_REGIONS = ('teamStatsDetailContainer',)
+
+# 出力行の型（row_types。列はkeyを先頭列）
+TeamStatsRow = utils.row_types.TeamStatsRow
+
+# 出力CSVファイル名と列
+TEAM_STATS_CSV = utils.constants.TEAM_STATS_CSV
+TEAM_STATS_FIELDNAMES = list(TeamStatsRow.fieldnames)
+
+
+def team_stats_url(team_name):
+    """チーム成績ページのURLを返す"""
+    return f"https://teams.one/teams/{team_name}/stats"
 
 
 def scrape_team_stats(team_name):
     """チーム成績ページから情報を抽出する"""
-    url = f"https://teams.one/teams/{team_name}/stats"
+    url = team_stats_url(team_name)
     print(f"チーム成績を取得中: {url}")
     
     html = get_html(url)
     if html is None:
+        record_failure(url, 'team_stats', team_name)
         return []
     
-    soup = BeautifulSoup(html, 'html.parser')
+    return parse_team_stats(html, team_name)
+
+
+def parse_team_stats(html, team_name):
+    """チーム成績ページのHTMLから情報を抽出する"""
+    soup = make_soup(html, regions=TEAM_STATS_REGIONS)
     
     # div.teamStatsDetailContainer > table.stats_battingがなければ処理終了
     table = soup.select_one('div.teamStatsDetailContainer > table.stats_batting')
@@ -100,53 +122,27 @@ def scrape_team_stats(team_name):
         # key: ${team}_${year}
         row_key = f"{team_name}_{year}"
 
-        row = {
-            'key': row_key,
-            'team': team_name,
-            'year': year,
-            'games': games,
-            'wins': wins,
-            'losses': losses,
-            'draws': draws,
-            'winning_percentage': winning_percentage,
-            'runs_scored': runs_scored,
-            'runs_allowed': runs_allowed,
-            'batting_average': batting_average,
-            'home_runs': home_runs,
-            'stolen_bases': stolen_bases,
-            'earned_run_average': earned_run_average,
-        }
+        row = TeamStatsRow(
+            key=row_key,
+            team=team_name,
+            year=year,
+            games=games,
+            wins=wins,
+            losses=losses,
+            draws=draws,
+            winning_percentage=winning_percentage,
+            runs_scored=runs_scored,
+            runs_allowed=runs_allowed,
+            batting_average=batting_average,
+            home_runs=home_runs,
+            stolen_bases=stolen_bases,
+            earned_run_average=earned_run_average,
+        )
         result.append(row)
     
     return result
 
 
-def save_to_csv(all_rows, output_dir='output'):
-    """取得したチーム成績をCSVに保存する"""
-    if not all_rows:
-        print("保存するデータがありません。")
-        return None
-    
-    # ファイル名を準備（日付なし）
-    filename = prepare_csv_filename("04_team_stats.csv", output_dir)
-    filepath = os.path.join(output_dir, filename)
-    
-    # CSVに書き込み（keyを先頭列）
-    fieldnames = [
-        'key', 'team', 'year', 'games', 'wins', 'losses', 'draws',
-        'winning_percentage', 'runs_scored', 'runs_allowed',
-        'batting_average', 'home_runs', 'stolen_bases', 'earned_run_average'
-    ]
-    
-    with open(filepath, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(all_rows)
-    
-    print(f"\nCSVファイルを保存しました: {filepath}")
-    return filepath
-
-
 def main():
     """メイン処理"""
     # コマンドライン引数を解析
@@ -157,28 +153,42 @@ def main():
     print(f"チーム: {', '.join(team_names)}")
     print("=" * 50)
     
+    # 出力行はチームごとにチェックポイントの一時ファイルへ書き込み、最後に出力ファイルにまとめる
+    checkpoint = open_checkpoint('04_team_stats', team_names, {'rows': (TEAM_STATS_CSV, TeamStatsRow)})
+    if checkpoint.finished:
+        return
+    
     # 全チームの成績データを取得
-    all_rows = []
-    for team_name in team_names:
+    def scrape_team(team_name):
         print(f"\n--- {team_name} のデータを取得中 ---")
+        if checkpoint.is_completed(team_stats_url(team_name)):
+            print(f"{team_name}: 前回の実行で取得済みです")
+            return
         rows = scrape_team_stats(team_name)
         if rows:
-            all_rows.extend(rows)
+            checkpoint.write(team_name, team_stats_url(team_name), {'rows': rows})
             print(f"{team_name}: {len(rows)}件のチーム成績データを取得しました")
         else:
             print(f"{team_name}: チーム成績データが取得できませんでした")
         
         # サーバーに負荷をかけないように少し待機
-        time.sleep(1)
+        polite_wait()
     
-    if not all_rows:
+    # 複数チームは並行に取得する（出力の行順はチーム名の指定順）
+    run_for_teams(team_names, scrape_team)
+    
+    # HTTP通信の統計情報を表示
+    print()
+    print_http_stats()
+
+    if not checkpoint.count('rows'):
         print("\nチーム成績データが取得できませんでした。")
         return
     
-    print(f"\n合計取得したチーム成績行数: {len(all_rows)}件")
+    print(f"\n合計取得したチーム成績行数: {checkpoint.count('rows')}件")
     
     # CSVに保存
-    filepath = save_to_csv(all_rows)
+    filepath = checkpoint.finalize()['rows']
     
     print("\n" + "=" * 50)
     print("処理が完了しました！")
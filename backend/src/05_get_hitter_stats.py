@@ -1,23 +1,43 @@
 """
 打者成績一覧をスクレイピングしてCSVに出力するスクリプト
 """
-import sys
-import os
-import csv
-import importlib.util
-from datetime import datetime
-from bs4 import BeautifulSoup
-import time
+import importlib
 
 # 数字で始まるモジュール名をインポートするため、importlibを使用
-spec = importlib.util.spec_from_file_location("utils", os.path.join(os.path.dirname(__file__), "99_utils.py"))
-utils = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(utils)
+# 通常の import と同じく sys.modules に登録されるため、同一プロセスで複数のスクリプトを実行する場合（00_run_all）は
+# セッション・キャッシュを共有する
+utils = importlib.import_module("99_utils")
 get_html = utils.get_html
+record_failure = utils.record_failure
+make_pipeline = utils.make_pipeline
+make_soup = utils.make_soup
+print_http_stats = utils.print_http_stats
+polite_wait = utils.polite_wait
+run_for_teams = utils.run_for_teams
 extract_text = utils.extract_text
 load_player_lookup = utils.load_player_lookup
+load_team_years = utils.load_team_years
+load_previous_rows_by_year = utils.load_previous_rows_by_year
+get_open_seasons = utils.get_open_seasons
 parse_command_line_args = utils.parse_command_line_args
-prepare_csv_filename = utils.prepare_csv_filename
+open_checkpoint = utils.open_checkpoint
+
+
+# 打者成績ページで抽出処理が参照する領域（クラス名）。この領域のみツリーに構築する（make_soup の regions）
+HITTER_STATS_REGIONS = ('battingStatsDetailContainer', 'stats_all_player_table')
+
+# 出力行の型（row_types。列はkeyを先頭列）
+HitterStatsRow = utils.row_types.HitterStatsRow
+
+# 出力CSVファイル名と列
+HITTER_STATS_CSV = "05_hitter_stats.csv"
+HITTER_STATS_FIELDNAMES = list(HitterStatsRow.fieldnames)
+
+
+def hitter_stats_url(team_name, year):
+    """打者成績ページのURLを返す"""
+    # url = f"https://teams.one/teams/{team_name}/stats/batters_table?search_result%5Bgame_date%5D={year}&search_result%5Bgame_type%5D=&search_result%5Bopponent_team_name%5D=&search_result%5Btournament_name%5D=&search_result%5Bis_walk_game%5D=&search_result%5Bunreached%5D=true"
+    return f"https://teams.one/teams/{team_name}/stats/batters_table?search_result%5Bgame_date%5D={year}&search_result%5Bgame_type%5D=&search_result%5Bopponent_team_name%5D=&search_result%5Btournament_name%5D=&search_result%5Bis_walk_game%5D=&search_result%5Bunreached%5D=&search_result%5Bunreached%5D=true"
 
 
 def scrape_hitter_stats(team_name, year, player_lookup=None):
@@ -25,16 +45,24 @@ def scrape_hitter_stats(team_name, year, player_lookup=None):
     if player_lookup is None:
         player_lookup = {}
     
-    # url = f"https://teams.one/teams/{team_name}/stats/batters_table?search_result%5Bgame_date%5D={year}&search_result%5Bgame_type%5D=&search_result%5Bopponent_team_name%5D=&search_result%5Btournament_name%5D=&search_result%5Bis_walk_game%5D=&search_result%5Bunreached%5D=true"
-    url = f"https://teams.one/teams/{team_name}/stats/batters_table?search_result%5Bgame_date%5D={year}&search_result%5Bgame_type%5D=&search_result%5Bopponent_team_name%5D=&search_result%5Btournament_name%5D=&search_result%5Bis_walk_game%5D=&search_result%5Bunreached%5D=&search_result%5Bunreached%5D=true"
+    url = hitter_stats_url(team_name, year)
     print(f"  {year}年の打者成績を取得中: {url}")
     
     html = get_html(url)
     if html is None:
+        record_failure(url, 'hitter_stats', team_name, year=year)
         print(f"  {team_name} ({year}年): HTMLが取得できませんでした。")
         return []
     
-    soup = BeautifulSoup(html, 'html.parser')
+    return parse_hitter_stats(html, team_name, year, player_lookup)
+
+
+def parse_hitter_stats(html, team_name, year, player_lookup=None):
+    """打者成績ページのHTMLから情報を抽出する"""
+    if player_lookup is None:
+        player_lookup = {}
+    
+    soup = make_soup(html, regions=HITTER_STATS_REGIONS)
     
     # div.battingStatsDetailContainer > div.battingDetailContainer.longTableContainer.lessData.stats_all_player_tableがなければ処理終了
     container = soup.select_one('div.battingStatsDetailContainer > div.battingDetailContainer.longTableContainer.lessData.stats_all_player_table')
@@ -114,105 +142,117 @@ def scrape_hitter_stats(team_name, year, player_lookup=None):
         own_error = extract_text(tds[24]) if len(tds) > 24 else ""  # 25番目のtd
         caught_stealing = extract_text(tds[25]) if len(tds) > 25 else ""  # 26番目のtd
         
-        row = {
-            'key': row_key,
-            'team': team_name,
-            'year': str(year),
-            'player_number': player_number,
-            'player': player,
-            'games_played': games_played,
-            'batting_average': batting_average,
-            'plate_appearance': plate_appearance,
-            'at_bats': at_bats,
-            'hit': hit,
-            'hr': hr,
-            'rbi': rbi,
-            'run': run,
-            'stolen_base': stolen_base,
-            'on_base_percentage': on_base_percentage,
-            'slugging_percentage': slugging_percentage,
-            'average_in_scoring': average_in_scoring,
-            'ops': ops,
-            'double': double,
-            'triple': triple,
-            'total_bases': total_bases,
-            'strikeout': strikeout,
-            'walk': walk,
-            'hit_by_pitch': hit_by_pitch,
-            'sacrifice_bunt': sacrifice_bunt,
-            'sacrifice_fly': sacrifice_fly,
-            'double_play': double_play,
-            'opponent_error': opponent_error,
-            'own_error': own_error,
-            'caught_stealing': caught_stealing,
-        }
+        row = HitterStatsRow(
+            key=row_key,
+            team=team_name,
+            year=str(year),
+            player_number=player_number,
+            player=player,
+            games_played=games_played,
+            batting_average=batting_average,
+            plate_appearance=plate_appearance,
+            at_bats=at_bats,
+            hit=hit,
+            hr=hr,
+            rbi=rbi,
+            run=run,
+            stolen_base=stolen_base,
+            on_base_percentage=on_base_percentage,
+            slugging_percentage=slugging_percentage,
+            average_in_scoring=average_in_scoring,
+            ops=ops,
+            double=double,
+            triple=triple,
+            total_bases=total_bases,
+            strikeout=strikeout,
+            walk=walk,
+            hit_by_pitch=hit_by_pitch,
+            sacrifice_bunt=sacrifice_bunt,
+            sacrifice_fly=sacrifice_fly,
+            double_play=double_play,
+            opponent_error=opponent_error,
+            own_error=own_error,
+            caught_stealing=caught_stealing,
+        )
         result.append(row)
     
     return result
 
 
-def scrape_all_years_hitter_stats(team_name, test_mode=False, player_lookup=None):
-    """全年度の打者成績を取得する"""
+def scrape_all_years_hitter_stats(team_name, test_mode=False, player_lookup=None, previous_rows=None, open_years=None,
+                                  checkpoint=None):
+    """
+    全年度の打者成績を取得する
+
+    対象年度は 04_team_stats.csv にあるチームの年度（なければ実行日時の年から2016年まで）。
+    取得は1年ずつ順に行い、パースは --parse-workers が2以上ならプロセスプールで行う。
+
+    Args:
+        previous_rows: 前回の出力の年度ごとの行（load_previous_rows_by_year の戻り値）
+        open_years: 再取得する年度の集合。指定した場合、それ以外の年度（確定済みの年度）は
+                    previous_rows に行があれば取得せずに再利用する。Noneの場合は全年度を取得する
+        checkpoint: open_checkpoint() の戻り値（種類は 'rows'）。指定した場合は行を年度ごとにチェックポイントの
+                    一時ファイルへ書き込んで戻り値には含めず、完了済みの年度（--resume で再開した場合）は取得しない
+    """
     if player_lookup is None:
         player_lookup = {}
     
-    # 実行日時の年から開始
-    current_year = datetime.now().year
-    year = current_year
-    
     all_rows = []
     
-    while year >= 2016:
-        rows = scrape_hitter_stats(team_name, year, player_lookup)
-        if rows:
+    def is_reused(year):
+        return open_years is not None and year not in open_years and bool(previous_rows) and year in previous_rows
+    
+    def is_done(year):
+        return checkpoint is not None and checkpoint.is_completed(hitter_stats_url(team_name, year))
+    
+    def emit(year, rows):
+        if checkpoint is not None:
+            checkpoint.write(team_name, hitter_stats_url(team_name, year), {'rows': rows})
+        else:
             all_rows.extend(rows)
+    
+    def fetch(year):
+        if is_reused(year) or is_done(year):
+            return None
+        url = hitter_stats_url(team_name, year)
+        print(f"  {year}年の打者成績を取得中: {url}")
+        html = get_html(url)
+        # サーバーに負荷をかけないように少し待機
+        polite_wait()
+        if html is None:
+            record_failure(url, 'hitter_stats', team_name, year=year)
+            print(f"  {team_name} ({year}年): HTMLが取得できませんでした。")
+            return None
+        return html, team_name, year
+    
+    def write(year, rows):
+        if is_done(year):
+            return
+        if is_reused(year):
+            rows = previous_rows[year]
+            emit(year, rows)
+            print(f"  {team_name} ({year}年): 確定済みの年度のため前回の打者成績データ{len(rows)}件を再利用しました")
+            return
+        if rows is not None:
+            emit(year, rows)
+        if rows:
             print(f"  {team_name} ({year}年): {len(rows)}件の打者成績データを取得しました")
         else:
             print(f"  {team_name} ({year}年): 打者成績データが取得できませんでした")
-        
-        # テストモードの場合は1年分だけ取得して終了
-        if test_mode:
-            print(f"  テストモード: {year}年のデータのみ取得しました。")
-            break
-        
-        # サーバーに負荷をかけないように少し待機
-        time.sleep(1)
-        
-        # 年を1つ減らす
-        year -= 1
-    
-    return all_rows
-
-
-def save_to_csv(all_rows, output_dir='output'):
-    """取得した打者成績をCSVに保存する"""
-    if not all_rows:
-        print("保存するデータがありません。")
-        return None
     
-    # ファイル名を準備（日付なし）
-    filename = prepare_csv_filename("05_hitter_stats.csv", output_dir)
-    filepath = os.path.join(output_dir, filename)
+    # 実行日時の年から降順に処理
+    years = load_team_years(team_name)
+    if test_mode:
+        # テストモードの場合は1年分（実行日時の年）だけ取得する
+        years = years[:1]
     
-    # CSVに書き込み（keyを先頭列）
-    fieldnames = [
-        'key', 'team', 'year', 'player_number', 'player',
-        'games_played', 'batting_average', 'plate_appearance', 'at_bats',
-        'hit', 'hr', 'rbi', 'run', 'stolen_base',
-        'on_base_percentage', 'slugging_percentage', 'average_in_scoring', 'ops',
-        'double', 'triple', 'total_bases',
-        'strikeout', 'walk', 'hit_by_pitch',
-        'sacrifice_bunt', 'sacrifice_fly', 'double_play',
-        'opponent_error', 'own_error', 'caught_stealing'
-    ]
+    with make_pipeline(parse_hitter_stats, context={'player_lookup': player_lookup}, fetch_workers=1) as pipeline:
+        pipeline.run(years, fetch, write)
     
-    with open(filepath, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(all_rows)
+    if test_mode and years:
+        print(f"  テストモード: {years[0]}年のデータのみ取得しました。")
     
-    print(f"\nCSVファイルを保存しました: {filepath}")
-    return filepath
+    return all_rows
 
 
 def main():
@@ -225,33 +265,58 @@ def main():
     print(f"チーム: {', '.join(team_names)}")
     if test_mode:
         print("モード: テストモード（各チームについて1年分のみ取得）")
+    incremental = utils.RUN_OPTIONS['incremental']
+    if incremental:
+        print("モード: 差分取得（確定済みの年度は前回の出力を再利用）")
     print("=" * 50)
     
     # プレイヤー情報を読み込む
     player_lookup = load_player_lookup()
     
+    # 出力行は年度ごとにチェックポイントの一時ファイルへ書き込み、最後に出力ファイルにまとめる
+    checkpoint = open_checkpoint('05_hitter_stats', team_names, {'rows': (HITTER_STATS_CSV, HitterStatsRow)})
+    if checkpoint.finished:
+        return
+    
     # 全チームの打者成績データを取得
-    all_rows = []
-    for team_name in team_names:
+    def scrape_team(team_name):
         print(f"\n--- {team_name} のデータを取得中 ---")
-        rows = scrape_all_years_hitter_stats(team_name, test_mode=test_mode, player_lookup=player_lookup)
-        if rows:
-            all_rows.extend(rows)
-            print(f"{team_name}: 合計{len(rows)}件の打者成績データを取得しました")
+        previous_rows = None
+        open_years = None
+        if incremental:
+            # 差分取得モード: 実行日時の年と、前回の実行以降に試合が変更された年度のみ再取得する
+            previous_rows = load_previous_rows_by_year(HITTER_STATS_CSV, HitterStatsRow, team_name)
+            open_years = get_open_seasons(team_name)
+            if open_years is None:
+                print("  試合情報の前回の出力がないため、全年度を取得します")
+            else:
+                print(f"  再取得する年度: {', '.join(str(y) for y in sorted(open_years, reverse=True))}")
+        scrape_all_years_hitter_stats(team_name, test_mode=test_mode, player_lookup=player_lookup,
+                                   previous_rows=previous_rows, open_years=open_years, checkpoint=checkpoint)
+        row_count = checkpoint.count('rows', team_name)
+        if row_count:
+            print(f"{team_name}: 合計{row_count}件の打者成績データを取得しました")
         else:
             print(f"{team_name}: 打者成績データが取得できませんでした")
         
         # サーバーに負荷をかけないように少し待機
-        time.sleep(1)
+        polite_wait()
     
-    if not all_rows:
+    # 複数チームは並行に取得する（出力の行順はチーム名の指定順）
+    run_for_teams(team_names, scrape_team)
+    
+    # HTTP通信の統計情報を表示
+    print()
+    print_http_stats()
+
+    if not checkpoint.count('rows'):
         print("\n打者成績データが取得できませんでした。")
         return
     
-    print(f"\n合計取得した打者成績行数: {len(all_rows)}件")
+    print(f"\n合計取得した打者成績行数: {checkpoint.count('rows')}件")
     
     # CSVに保存
-    filepath = save_to_csv(all_rows)
+    filepath = checkpoint.finalize()['rows']
     
     print("\n" + "=" * 50)
     print("処理が完了しました！")
@@ -1,10 +1,7 @@
 """
 投手成績一覧をスクレイピングしてCSVに出力するスクリプト
 """
-import sys
 import os
-import csv
-from datetime import datetime
 import warnings
 
 # urllib3のOpenSSL警告を抑制
@@ -12,21 +9,39 @@ import warnings
 os.environ['PYTHONWARNINGS'] = 'ignore::UserWarning:urllib3'
 warnings.filterwarnings('ignore', category=UserWarning, module='urllib3')
 
-from bs4 import BeautifulSoup
-import time
-import importlib.util
+import importlib
 
 # 数字で始まるモジュール名をインポートするため、importlibを使用
-spec = importlib.util.spec_from_file_location("utils", os.path.join(os.path.dirname(__file__), "99_utils.py"))
-utils = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(utils)
+# 通常の import と同じく sys.modules に登録されるため、同一プロセスで複数のスクリプトを実行する場合（00_run_all）は
+# セッション・キャッシュを共有する
+utils = importlib.import_module("99_utils")
 get_html = utils.get_html
+record_failure = utils.record_failure
+make_pipeline = utils.make_pipeline
+make_soup = utils.make_soup
+print_http_stats = utils.print_http_stats
+polite_wait = utils.polite_wait
+run_for_teams = utils.run_for_teams
 extract_text = utils.extract_text
 load_player_lookup = utils.load_player_lookup
-prepare_csv_filename = utils.prepare_csv_filename
+load_team_years = utils.load_team_years
+load_previous_rows_by_year = utils.load_previous_rows_by_year
+get_open_seasons = utils.get_open_seasons
+open_checkpoint = utils.open_checkpoint
 parse_command_line_args = utils.parse_command_line_args
 
 
+# 投手成績ページで抽出処理が参照する領域（クラス名）。この領域のみツリーに構築する（make_soup の regions）
+PITCHER_STATS_REGIONS = ('pitchingStatsDetailContainer', 'stats_all_player_table')
+
+# 出力行の型（row_types。列はkeyを先頭列）
+PitcherStatsRow = utils.row_types.PitcherStatsRow
+
+# 出力CSVファイル名と列
+PITCHER_STATS_CSV = "06_pitcher_stats.csv"
+PITCHER_STATS_FIELDNAMES = list(PitcherStatsRow.fieldnames)
+
+
 def convert_innings_pitched_to_decimal(innings_pitched):
     """
     innings_pitched（例: "7回1/3"）を小数に変換する
@@ -164,21 +179,35 @@ def calculate_whip(hits_allowed, walks_allowed, innings_pitched):
     return f"{whip:.3f}"
 
 
+def pitcher_stats_url(team_name, year):
+    """投手成績ページのURLを返す"""
+    # url = f"https://teams.one/teams/{team_name}/stats/pitchers_table?search_result%5Bgame_date%5D={year}&search_result%5Bgame_type%5D=&search_result%5Bopponent_team_name%5D=&search_result%5Btournament_name%5D=&search_result%5Bis_walk_game%5D=&search_result%5Bunreached%5D=true"
+    return f"https://teams.one/teams/{team_name}/stats/pitchers_table?search_result%5Bgame_date%5D={year}&search_result%5Bgame_type%5D=&search_result%5Bopponent_team_name%5D=&search_result%5Btournament_name%5D=&search_result%5Bis_walk_game%5D=&search_result%5Bunreached%5D=&search_result%5Bunreached%5D=true"
+
+
 def scrape_pitcher_stats(team_name, year, player_lookup=None):
     """投手成績ページから情報を抽出する"""
     if player_lookup is None:
         player_lookup = {}
     
-    # url = f"https://teams.one/teams/{team_name}/stats/pitchers_table?search_result%5Bgame_date%5D={year}&search_result%5Bgame_type%5D=&search_result%5Bopponent_team_name%5D=&search_result%5Btournament_name%5D=&search_result%5Bis_walk_game%5D=&search_result%5Bunreached%5D=true"
-    url = f"https://teams.one/teams/{team_name}/stats/pitchers_table?search_result%5Bgame_date%5D={year}&search_result%5Bgame_type%5D=&search_result%5Bopponent_team_name%5D=&search_result%5Btournament_name%5D=&search_result%5Bis_walk_game%5D=&search_result%5Bunreached%5D=&search_result%5Bunreached%5D=true"
+    url = pitcher_stats_url(team_name, year)
     print(f"  {year}年の投手成績を取得中: {url}")
     
     html = get_html(url)
     if html is None:
+        record_failure(url, 'pitcher_stats', team_name, year=year)
         print(f"  {team_name} ({year}年): HTMLが取得できませんでした。")
         return []
     
-    soup = BeautifulSoup(html, 'html.parser')
+    return parse_pitcher_stats(html, team_name, year, player_lookup)
+
+
+def parse_pitcher_stats(html, team_name, year, player_lookup=None):
+    """投手成績ページのHTMLから情報を抽出する"""
+    if player_lookup is None:
+        player_lookup = {}
+    
+    soup = make_soup(html, regions=PITCHER_STATS_REGIONS)
     
     # div.pitchingStatsDetailContainer > div.pitchingDetailContainer.longTableContainer.lessData.stats_all_player_tableがなければ処理終了
     # 直接の子要素（>）ではなく、子孫要素（スペース）で検索する
@@ -268,103 +297,115 @@ def scrape_pitcher_stats(team_name, year, player_lookup=None):
         # WHIPを計算
         whip = calculate_whip(hits_allowed, walks_allowed, innings_pitched)
         
-        row = {
-            'key': row_key,
-            'team': team_name,
-            'year': str(year),
-            'player_number': player_number,
-            'player': player,
-            'games_played': games_played,
-            'wins': wins,
-            'holds': holds,
-            'saves': saves,
-            'losses': losses,
-            'win_percentage': win_percentage,
-            'era': era,
-            'innings_pitched': innings_pitched,
-            'pitches_thrown': pitches_thrown,
-            'runs_allowed': runs_allowed,
-            'earned_runs_allowed': earned_runs_allowed,
-            'complete_games': complete_games,
-            'shutouts': shutouts,
-            'hits_allowed': hits_allowed,
-            'home_runs_allowed': home_runs_allowed,
-            'strikeouts': strikeouts,
-            'strikeout_rate': strikeout_rate,
-            'walks_allowed': walks_allowed,
-            'hit_batters': hit_batters,
-            'balks': balks,
-            'wild_pitches': wild_pitches,
-            'k_bb': k_bb,
-            'whip': whip,
-        }
+        row = PitcherStatsRow(
+            key=row_key,
+            team=team_name,
+            year=str(year),
+            player_number=player_number,
+            player=player,
+            games_played=games_played,
+            wins=wins,
+            holds=holds,
+            saves=saves,
+            losses=losses,
+            win_percentage=win_percentage,
+            era=era,
+            innings_pitched=innings_pitched,
+            pitches_thrown=pitches_thrown,
+            runs_allowed=runs_allowed,
+            earned_runs_allowed=earned_runs_allowed,
+            complete_games=complete_games,
+            shutouts=shutouts,
+            hits_allowed=hits_allowed,
+            home_runs_allowed=home_runs_allowed,
+            strikeouts=strikeouts,
+            strikeout_rate=strikeout_rate,
+            walks_allowed=walks_allowed,
+            hit_batters=hit_batters,
+            balks=balks,
+            wild_pitches=wild_pitches,
+            k_bb=k_bb,
+            whip=whip,
+        )
         result.append(row)
     
     return result
 
 
-def scrape_all_years_pitcher_stats(team_name, test_mode=False, player_lookup=None):
-    """全年度の投手成績を取得する"""
+def scrape_all_years_pitcher_stats(team_name, test_mode=False, player_lookup=None, previous_rows=None, open_years=None,
+                                   checkpoint=None):
+    """
+    全年度の投手成績を取得する
+
+    対象年度は 04_team_stats.csv にあるチームの年度（なければ実行日時の年から2016年まで）。
+    取得は1年ずつ順に行い、パースは --parse-workers が2以上ならプロセスプールで行う。
+
+    Args:
+        previous_rows: 前回の出力の年度ごとの行（load_previous_rows_by_year の戻り値）
+        open_years: 再取得する年度の集合。指定した場合、それ以外の年度（確定済みの年度）は
+                    previous_rows に行があれば取得せずに再利用する。Noneの場合は全年度を取得する
+        checkpoint: open_checkpoint() の戻り値（種類は 'rows'）。指定した場合は行を年度ごとにチェックポイントの
+                    一時ファイルへ書き込んで戻り値には含めず、完了済みの年度（--resume で再開した場合）は取得しない
+    """
     if player_lookup is None:
         player_lookup = {}
     
-    # 実行日時の年から開始
-    current_year = datetime.now().year
-    year = current_year
-    
     all_rows = []
     
-    while year >= 2016:
-        rows = scrape_pitcher_stats(team_name, year, player_lookup)
-        if rows:
+    def is_reused(year):
+        return open_years is not None and year not in open_years and bool(previous_rows) and year in previous_rows
+    
+    def is_done(year):
+        return checkpoint is not None and checkpoint.is_completed(pitcher_stats_url(team_name, year))
+    
+    def emit(year, rows):
+        if checkpoint is not None:
+            checkpoint.write(team_name, pitcher_stats_url(team_name, year), {'rows': rows})
+        else:
             all_rows.extend(rows)
+    
+    def fetch(year):
+        if is_reused(year) or is_done(year):
+            return None
+        url = pitcher_stats_url(team_name, year)
+        print(f"  {year}年の投手成績を取得中: {url}")
+        html = get_html(url)
+        # サーバーに負荷をかけないように少し待機
+        polite_wait()
+        if html is None:
+            record_failure(url, 'pitcher_stats', team_name, year=year)
+            print(f"  {team_name} ({year}年): HTMLが取得できませんでした。")
+            return None
+        return html, team_name, year
+    
+    def write(year, rows):
+        if is_done(year):
+            return
+        if is_reused(year):
+            rows = previous_rows[year]
+            emit(year, rows)
+            print(f"  {team_name} ({year}年): 確定済みの年度のため前回の投手成績データ{len(rows)}件を再利用しました")
+            return
+        if rows is not None:
+            emit(year, rows)
+        if rows:
             print(f"  {team_name} ({year}年): {len(rows)}件の投手成績データを取得しました")
         else:
             print(f"  {team_name} ({year}年): 投手成績データが取得できませんでした")
-        
-        # テストモードの場合は1年分だけ取得して終了
-        if test_mode:
-            print(f"  テストモード: {year}年のデータのみ取得しました。")
-            break
-        
-        # サーバーに負荷をかけないように少し待機
-        time.sleep(1)
-        
-        # 年を1つ減らす
-        year -= 1
-    
-    return all_rows
-
-
-def save_to_csv(all_rows, output_dir='output'):
-    """取得した投手成績をCSVに保存する"""
-    if not all_rows:
-        print("保存するデータがありません。")
-        return None
     
-    # ファイル名を準備（日付なし）
-    filename = prepare_csv_filename("06_pitcher_stats.csv", output_dir)
-    filepath = os.path.join(output_dir, filename)
+    # 実行日時の年から降順に処理
+    years = load_team_years(team_name)
+    if test_mode:
+        # テストモードの場合は1年分（実行日時の年）だけ取得する
+        years = years[:1]
     
-    # CSVに書き込み（keyを先頭列）
-    fieldnames = [
-        'key', 'team', 'year', 'player_number', 'player',
-        'games_played', 'wins', 'holds', 'saves', 'losses', 'win_percentage',
-        'era', 'innings_pitched', 'pitches_thrown',
-        'runs_allowed', 'earned_runs_allowed',
-        'complete_games', 'shutouts',
-        'hits_allowed', 'home_runs_allowed',
-        'strikeouts', 'strikeout_rate', 'walks_allowed', 'hit_batters',
-        'balks', 'wild_pitches', 'k_bb', 'whip'
-    ]
+    with make_pipeline(parse_pitcher_stats, context={'player_lookup': player_lookup}, fetch_workers=1) as pipeline:
+        pipeline.run(years, fetch, write)
     
-    with open(filepath, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(all_rows)
+    if test_mode and years:
+        print(f"  テストモード: {years[0]}年のデータのみ取得しました。")
     
-    print(f"\nCSVファイルを保存しました: {filepath}")
-    return filepath
+    return all_rows
 
 
 def main():
@@ -377,33 +418,58 @@ def main():
     print(f"チーム: {', '.join(team_names)}")
     if test_mode:
         print("モード: テストモード（各チームについて1年分のみ取得）")
+    incremental = utils.RUN_OPTIONS['incremental']
+    if incremental:
+        print("モード: 差分取得（確定済みの年度は前回の出力を再利用）")
     print("=" * 50)
     
     # プレイヤー情報を読み込む
     player_lookup = load_player_lookup()
     
+    # 出力行は年度ごとにチェックポイントの一時ファイルへ書き込み、最後に出力ファイルにまとめる
+    checkpoint = open_checkpoint('06_pitcher_stats', team_names, {'rows': (PITCHER_STATS_CSV, PitcherStatsRow)})
+    if checkpoint.finished:
+        return
+    
     # 全チームの投手成績データを取得
-    all_rows = []
-    for team_name in team_names:
+    def scrape_team(team_name):
         print(f"\n--- {team_name} のデータを取得中 ---")
-        rows = scrape_all_years_pitcher_stats(team_name, test_mode=test_mode, player_lookup=player_lookup)
-        if rows:
-            all_rows.extend(rows)
-            print(f"{team_name}: 合計{len(rows)}件の投手成績データを取得しました")
+        previous_rows = None
+        open_years = None
+        if incremental:
+            # 差分取得モード: 実行日時の年と、前回の実行以降に試合が変更された年度のみ再取得する
+            previous_rows = load_previous_rows_by_year(PITCHER_STATS_CSV, PitcherStatsRow, team_name)
+            open_years = get_open_seasons(team_name)
+            if open_years is None:
+                print("  試合情報の前回の出力がないため、全年度を取得します")
+            else:
+                print(f"  再取得する年度: {', '.join(str(y) for y in sorted(open_years, reverse=True))}")
+        scrape_all_years_pitcher_stats(team_name, test_mode=test_mode, player_lookup=player_lookup,
+                                   previous_rows=previous_rows, open_years=open_years, checkpoint=checkpoint)
+        row_count = checkpoint.count('rows', team_name)
+        if row_count:
+            print(f"{team_name}: 合計{row_count}件の投手成績データを取得しました")
         else:
             print(f"{team_name}: 投手成績データが取得できませんでした")
         
         # サーバーに負荷をかけないように少し待機
-        time.sleep(1)
+        polite_wait()
     
-    if not all_rows:
+    # 複数チームは並行に取得する（出力の行順はチーム名の指定順）
+    run_for_teams(team_names, scrape_team)
+    
+    # HTTP通信の統計情報を表示
+    print()
+    print_http_stats()
+
+    if not checkpoint.count('rows'):
         print("\n投手成績データが取得できませんでした。")
         return
     
-    print(f"\n合計取得した投手成績行数: {len(all_rows)}件")
+    print(f"\n合計取得した投手成績行数: {checkpoint.count('rows')}件")
     
     # CSVに保存
-    filepath = save_to_csv(all_rows)
+    filepath = checkpoint.finalize()['rows']
     
     print("\n" + "=" * 50)
     print("処理が完了しました！")
@@ -2,33 +2,738 @@
 共通ユーティリティ関数
 """
 import os
+import sys
 import csv
 import re
-import requests
-from bs4 import BeautifulSoup
+import time
+import threading
+import itertools
+import contextvars
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 import importlib.util
 
-# 定数ファイルをインポート
-spec = importlib.util.spec_from_file_location("constants", os.path.join(os.path.dirname(__file__), "constants.py"))
-constants = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(constants)
+# requests・bs4 は読み込みに時間がかかるため、最初に使う関数の中でインポートする
+# （--help・引数エラーではどちらも読み込まず、リプレイ・キャッシュのみの実行では requests を読み込まない）
 
+# 同じディレクトリのモジュールは通常の import で読み込む（スクリプトとして実行した場合は src が sys.path の先頭にあり、
+# baseball-record コマンドから実行した場合は baseball_record パッケージが src を sys.path に追加する）。
+# 行の型（row_types）・パイプライン（pipeline）はプロセスプールのワーカーでも同じ名前で読み込まれる
+import constants
+import http_cache
+import html_archive
+import html_page
+import row_types
+import checkpoint
+import lookup_index
+import dead_letter
+import pipeline
 
-def get_html(url):
-    """URLからHTMLを取得する"""
+
+# 選択可能なHTMLパーサー（BeautifulSoup のツリービルダー名 -> 必要なモジュール）
+HTML_PARSERS = {
+    'lxml': 'lxml',
+    'html.parser': None,
+    'html5lib': 'html5lib',
+}
+
+
+def available_parsers():
+    """インストールされているHTMLパーサーの一覧を返す（速い順）"""
+    parsers = []
+    for name in ('lxml', 'html.parser', 'html5lib'):
+        module = HTML_PARSERS[name]
+        if module is not None and importlib.util.find_spec(module) is None:
+            continue
+        parsers.append(name)
+    return parsers
+
+
+def resolve_parser(name):
+    """
+    パーサー名を BeautifulSoup のツリービルダー名に解決する。
+    'auto' は利用可能なうち最も速いパーサー。未知・未インストールの場合は ValueError
+    """
+    if name == 'auto':
+        return available_parsers()[0]
+    if name not in HTML_PARSERS:
+        raise ValueError(f"未知のHTMLパーサーです: {name}（{', '.join(HTML_PARSERS)} のいずれかを指定してください）")
+    if name not in available_parsers():
+        raise ValueError(f"HTMLパーサー {name} がインストールされていません")
+    return name
+
+
+def get_parser():
+    """
+    使用するHTMLパーサーを返す。
+    --parser で指定されていない場合は、初回の呼び出し時に BASEBALL_HTML_PARSER から解決する
+    （import 時には解決しないため、不正な値でも import は失敗しない）
+    """
+    if RUN_OPTIONS['parser'] is None:
+        RUN_OPTIONS['parser'] = resolve_parser(constants.HTML_PARSER)
+    return RUN_OPTIONS['parser']
+
+
+def set_parser_option(name=None):
+    """
+    --parser の値（None の場合は BASEBALL_HTML_PARSER）を解決して RUN_OPTIONS['parser'] に設定する。
+    未知・未インストールのパーサーの場合はエラーを表示して終了する
+    """
+    source = '--parser' if name is not None else 'BASEBALL_HTML_PARSER'
+    try:
+        RUN_OPTIONS['parser'] = resolve_parser(name if name is not None else constants.HTML_PARSER)
+    except ValueError as e:
+        print(f"エラー: {source}: {e}")
+        sys.exit(1)
+
+
+# 列指向の出力形式（constants.COLUMNAR_FORMAT。'none' など未対応の値の場合は None で、書き出さない）
+COLUMNAR_FORMAT = constants.COLUMNAR_FORMAT if constants.COLUMNAR_FORMAT in row_types.COLUMNAR_EXTENSIONS else None
+
+
+# 実行時オプション（parse_command_line_args で設定）
+RUN_OPTIONS = {
+    'workers': constants.FETCH_WORKERS,
+    'parse_workers': constants.PARSE_WORKERS,
+    'incremental': False,
+    'replay': None,
+    'parser': None,  # get_parser で解決する
+    'partial_parse': constants.PARTIAL_PARSE_ENABLED,
+    'team_workers': constants.TEAM_WORKERS,
+    'resume': False,
+    'test': False,
+}
+
+# スクリプトごとのコマンドライン引数（00_run_all が複数のスクリプトを並行に実行する際に
+# sys.argv の代わりにスレッドごとに設定する。set_stage_argv で設定）
+_stage_argv = threading.local()
+
+# HTTPセッション（モジュール内で1つだけ生成し、全スクレイパーで共有する）
+_session = None
+_session_lock = threading.Lock()
+
+# HTTP通信の統計情報（print_http_stats で表示）
+_http_stats = {
+    'requests': 0,
+    'cache_hits': 0,
+    'not_modified': 0,
+    'retries': 0,
+    'failures': 0,
+    'replayed': 0,
+}
+_http_stats_lock = threading.Lock()
+
+# 処理中の作業単位（(呼び出しの番号, チーム名)。run_for_teams で設定し、取得スレッドにも引き継ぐ）と、
+# 作業単位ごとの統計情報
+_work_unit = contextvars.ContextVar('work_unit', default=None)
+_unit_stats = {}
+_unit_ids = itertools.count()
+
+
+def _accept_encoding():
+    """brotliが利用可能な場合のみ br をネゴシエーションする"""
+    try:
+        import brotli  # noqa: F401
+        return 'gzip, deflate, br'
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            return 'gzip, deflate, br'
+        except ImportError:
+            return 'gzip, deflate'
+
+
+def get_session():
+    """
+    keep-alive・コネクションプール設定済みのセッションを返す。
+    初回呼び出し時に生成し、以降は同じセッションを再利用する。
+    リトライはセッションでは行わない（_get_with_retries でレート制限に従ってリトライする）
+    """
+    global _session
+    if _session is not None:
+        return _session
+
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            adapter = HTTPAdapter(
+                pool_connections=constants.HTTP_POOL_SIZE,
+                pool_maxsize=constants.HTTP_POOL_SIZE,
+                max_retries=0,
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({
+                'User-Agent': constants.HTTP_USER_AGENT,
+                'Accept-Encoding': _accept_encoding(),
+                'Connection': 'keep-alive',
+            })
+            _session = session
+    return _session
+
+
+# HTTPキャッシュ・HTMLアーカイブ・取得失敗の記録は最初の取得時に生成する
+# （パース処理のワーカープロセスなど、取得しないプロセスでは生成しない）
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _get_store(name, create):
+    """name のオブジェクトを返す（初回のみ create() で生成する）"""
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = create()
+        return _stores[name]
+
+
+def get_cache():
+    """HTTPキャッシュを返す（constants.HTTP_CACHE_ENABLED が False の場合はNone）"""
+    def create():
+        if not constants.HTTP_CACHE_ENABLED:
+            return None
+        return http_cache.HttpCache(
+            constants.HTTP_CACHE_DIR,
+            ttl_rules=constants.HTTP_CACHE_TTL_RULES,
+            default_ttl=constants.HTTP_CACHE_DEFAULT_TTL,
+            settle_days=constants.HTTP_CACHE_GAME_SETTLE_DAYS,
+        )
+    return _get_store('cache', create)
+
+# リプレイ元（--replay 指定時のみ。ネットワークの代わりにここからページを返す）
+_replay = None
+
+
+def set_replay_dir(path):
+    """
+    リプレイモードを有効にする。以降の get_html はネットワークにアクセスせず、
+    path のアーカイブ（index.jsonl あり）またはフィクスチャディレクトリからページを返す。
+    """
+    set_replay_store(html_archive.open_store(path))
+    RUN_OPTIONS['replay'] = path
+
+
+def set_replay_store(store):
+    """リプレイ元を直接設定する（get_page(url) で html_page.HtmlPage を返すオブジェクト。None でリプレイモードを解除）"""
+    global _replay
+    _replay = store
+
+
+def polite_wait(seconds=1):
+    """サーバーに負荷をかけないように待機する（リプレイモードでは待機しない）"""
+    if _replay is None:
+        time.sleep(seconds)
+
+
+def get_archive():
+    """HTMLアーカイブを返す（constants.HTML_ARCHIVE_ENABLED が False の場合はNone）"""
+    def create():
+        if not constants.HTML_ARCHIVE_ENABLED:
+            return None
+        return html_archive.HtmlArchive(
+            constants.HTML_ARCHIVE_DIR,
+            segment_max_bytes=constants.HTML_ARCHIVE_SEGMENT_BYTES,
+        )
+    return _get_store('archive', create)
+
+
+def _archive_page(url, content, encoding, digest=None):
+    """取得したページをアーカイブに保存する（保存に失敗しても取得処理は続行する）"""
+    archive = get_archive()
+    if archive is None:
+        return
+    try:
+        archive.append(url, content, encoding, digest=digest)
+    except OSError as e:
+        print(f"警告: {url} のアーカイブへの保存に失敗しました: {e}")
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレートリミッター（スレッドセーフ）
+
+    待機中の要求はキー（チーム名など）ごとにまとめ、トークンをキーの間で順番に（ラウンドロビンで）割り当てる。
+    1つのキーから多数の要求があっても、他のキーの要求は1巡以内に処理される。
+
+    Args:
+        rate: 1秒あたりに補充するトークン数（リクエスト数）
+        burst: バケットの容量（連続して送信できる最大リクエスト数）
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.condition = threading.Condition()
+        # キー -> 待機中の要求数
+        self.waiting = {}
+        # 待機中の要求があるキー（先頭のキーの要求に次のトークンを割り当てる）
+        self.turns = deque()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, key=None):
+        """トークンを1つ取得する（取得できるまで待機する）"""
+        with self.condition:
+            if not self.waiting.get(key):
+                self.turns.append(key)
+            self.waiting[key] = self.waiting.get(key, 0) + 1
+            while True:
+                self._refill()
+                if self.turns[0] == key and self.tokens >= 1:
+                    self.tokens -= 1
+                    # 同じキーの次の要求は、他のキーの待機中の要求の後に回す
+                    self.turns.popleft()
+                    self.waiting[key] -= 1
+                    if self.waiting[key]:
+                        self.turns.append(key)
+                    self.condition.notify_all()
+                    return
+                self.condition.wait((1 - self.tokens) / self.rate if self.tokens < 1 else None)
+
+
+# ホスト名 -> TokenBucket
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def wait_for_host(url):
+    """
+    URLのホストに対するレート制限に従って待機する。
+    レート制限は全チーム（run_for_teams で並行に処理中のチームを含む）で共有し、チームの間で公平に割り当てる
+    """
+    if not constants.HTTP_RATE_PER_HOST or constants.HTTP_RATE_PER_HOST <= 0:
+        return
+    host = urlsplit(url).netloc
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(host)
+        if limiter is None:
+            limiter = TokenBucket(constants.HTTP_RATE_PER_HOST, constants.HTTP_RATE_BURST)
+            _rate_limiters[host] = limiter
+    started = time.monotonic()
+    limiter.acquire(_work_unit.get())
+    _count_unit('requests')
+    _count_unit('rate_wait', time.monotonic() - started)
+
+
+def _count_unit(key, amount=1):
+    """処理中の作業単位（チーム）の統計情報に加算する"""
+    unit = _work_unit.get()
+    if unit is None:
+        return
+    with _http_stats_lock:
+        stats = _unit_stats.get(unit)
+        if stats is not None:
+            stats[key] += amount
+
+
+def map_concurrent(func, items, workers=None):
+    """
+    itemsの各要素にfuncを並行して適用し、結果を入力順のリストで返す。
+
+    Args:
+        func: 各要素に適用する関数
+        items: 入力のリスト
+        workers: ワーカー数（省略時は --workers / constants.FETCH_WORKERS）
+
+    Returns:
+        list: funcの戻り値（itemsと同じ順序）
+    """
+    items = list(items)
+    if workers is None:
+        workers = RUN_OPTIONS['workers']
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as executor:
+        return list(executor.map(func, items))
+
+
+def make_pipeline(parse, context=None, fetch_workers=None, parse_workers=None):
+    """
+    取得・パース・書き込みのパイプライン（pipeline.Pipeline）を返す。
+
+    Args:
+        parse: パース関数（モジュールの最上位の関数）
+        context: パース関数に毎回渡すキーワード引数
+        fetch_workers: 取得のスレッド数（省略時は --workers / constants.FETCH_WORKERS）
+        parse_workers: パースのプロセス数（省略時は --parse-workers / constants.PARSE_WORKERS）
+    """
+    if fetch_workers is None:
+        fetch_workers = RUN_OPTIONS['workers']
+    if parse_workers is None:
+        parse_workers = RUN_OPTIONS['parse_workers']
+    return pipeline.Pipeline(parse, context=context, fetch_workers=fetch_workers, parse_workers=parse_workers)
+
+
+class PrefixedOutput:
+    """
+    並行処理中の標準出力。行単位でまとめて書き込み、output_prefix で設定した接頭辞（ステージ名・チーム名）を
+    各行に付ける（行の途中で他のスレッドの出力が混ざらないようにする）
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', '') + text
+        lines = buffer.split('\n')
+        self.local.buffer = lines.pop()
+        if lines:
+            prefix = _output_prefix.get()
+            with self.lock:
+                self.stream.write(''.join(f"{prefix}{line}\n" if line else "\n" for line in lines))
+                self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', ''):
+            self.write('\n')
+        with self.lock:
+            self.stream.flush()
+
+
+# 標準出力の各行に付ける接頭辞（output_prefix で設定）
+_output_prefix = contextvars.ContextVar('output_prefix', default='')
+
+
+@contextmanager
+def prefixed_output():
+    """with 文の間、標準出力を PrefixedOutput に置き換える（置き換え済みの場合は何もしない）"""
+    if isinstance(sys.stdout, PrefixedOutput):
+        yield
+        return
+    saved_stdout = sys.stdout
+    sys.stdout = PrefixedOutput(saved_stdout)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stdout = saved_stdout
+
+
+@contextmanager
+def output_prefix(label):
+    """with 文の間（このスレッドと、そこから起動した取得スレッド）の出力行に [label] を付ける"""
+    token = _output_prefix.set(f"{_output_prefix.get()}[{label}] ")
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        _output_prefix.reset(token)
+
+
+def run_for_teams(team_names, scrape_team):
+    """
+    チームごとの処理を並行に実行し、結果をチーム名の順に返す。
+
+    最大 RUN_OPTIONS['team_workers'] チームを同時に処理する。リクエストはホストごとのレートリミッター
+    （wait_for_host）を全チームで共有し、チームの間でラウンドロビンで割り当てるため、
+    ページ数の多いチームがあっても他のチームの処理は止まらない。
+    完了したチームから実行時間・ページ数を表示し、最後にチームごとの一覧を表示する。
+
+    Args:
+        team_names: チーム名のリスト
+        scrape_team: scrape_team(team_name) -> 結果
+    """
+    workers = max(1, min(RUN_OPTIONS['team_workers'], len(team_names)))
+    # 作業単位は呼び出しごとに区別する（00_run_all で並行に実行中の他のスクリプトも同じチームを処理するため）
+    run_id = next(_unit_ids)
+    timings = {}
+    team_stats = {}
+
+    def run(team_name):
+        unit = (run_id, team_name)
+        _work_unit.set(unit)
+        with _http_stats_lock:
+            _unit_stats[unit] = {'pages': 0, 'requests': 0, 'rate_wait': 0.0}
+        started = time.perf_counter()
+        try:
+            with output_prefix(team_name) if workers > 1 else nullcontext():
+                result = scrape_team(team_name)
+        finally:
+            timings[team_name] = time.perf_counter() - started
+            with _http_stats_lock:
+                team_stats[team_name] = stats = _unit_stats.pop(unit)
+        print(f"{team_name}: 完了（{timings[team_name]:.1f}秒, ページ {stats['pages']}件, "
+              f"リクエスト {stats['requests']}件, レート制限の待機 {stats['rate_wait']:.1f}秒）")
+        return result
+
+    if workers == 1:
+        results = [contextvars.copy_context().run(run, team_name) for team_name in team_names]
+    else:
+        with prefixed_output(), ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, run, team_name) for team_name in team_names]
+            results = [future.result() for future in futures]
+
+    if len(team_names) > 1:
+        print("\nチーム別の実行時間:")
+        for team_name in team_names:
+            stats = team_stats[team_name]
+            print(f"  {team_name}: {timings[team_name]:.1f}秒（ページ {stats['pages']}件, リクエスト {stats['requests']}件）")
+    return results
+
+
+def _retry_delay(attempt, response=None):
+    """
+    attempt 回目（0始まり）のリトライまでの待機時間（秒）を返す。
+    指数バックオフ（constants.HTTP_BACKOFF_FACTOR の 1, 2, 4 ... 倍）と Retry-After ヘッダーの長い方
+    """
+    delay = constants.HTTP_BACKOFF_FACTOR * (2 ** attempt)
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            from email.utils import parsedate_to_datetime
+            try:
+                when = parsedate_to_datetime(retry_after)
+                delay = max(delay, when.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return delay
+
+
+def _get_with_retries(session, url, headers):
+    """
+    URLを GET する。5xx / 429 / 接続エラー・タイムアウトは constants.HTTP_MAX_RETRIES 回までリトライする。
+    リトライも1回のリクエストとして、送信前にレート制限のトークンを取得する（wait_for_host）。
+    リトライを使い切った場合は最後のレスポンスを返す（接続エラー・タイムアウトの場合は例外を送出する）
+    """
+    import requests
+    attempt = 0
+    while True:
+        wait_for_host(url)
+        with _http_stats_lock:
+            _http_stats['requests'] += 1
+            if attempt:
+                _http_stats['retries'] += 1
+        response = None
+        try:
+            response = session.get(url, headers=headers, timeout=constants.HTTP_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= constants.HTTP_MAX_RETRIES:
+                raise
+        else:
+            if response.status_code not in constants.HTTP_RETRY_STATUS or attempt >= constants.HTTP_MAX_RETRIES:
+                return response
+            response.close()
+        time.sleep(_retry_delay(attempt, response))
+        attempt += 1
+
+
+def get_dead_letters():
+    """取得に失敗したページの記録を返す（record_failure で追加し、取得に成功したページは get_html で削除する）"""
+    return _get_store('dead_letters', lambda: dead_letter.DeadLetters(constants.DEAD_LETTER_PATH))
+
+# URL -> 直近の取得失敗のエラー内容（record_failure で記録に使う）
+_fetch_errors = {}
+
+
+def record_failure(url, kind, team_name, **context):
+    """
+    get_html で取得に失敗したページを記録する（retry_failed.py で再取得する）。リプレイモードでは記録しない
+
+    Args:
+        url: ページのURL
+        kind: ページの種類（'game' / 'game_list' / 'team_stats' / 'hitter_stats' / 'pitcher_stats'）
+        team_name: チーム名
+        context: 再取得した行のマージに使う情報（dead_letter.DeadLetters.record を参照）
+    """
+    if _replay is not None:
+        return
+    error = _fetch_errors.pop(url, None) or "HTMLが取得できませんでした"
+    get_dead_letters().record(url, kind, team_name, error, **context)
+
+
+# 取得したページの文字コードの判定（URLパターンごとに記憶する）
+_encodings = html_page.EncodingDetector()
+
+
+def get_html(url, max_age=None):
+    """
+    URLからHTMLを取得する（_fetch_html）。取得に成功したページは取得失敗の記録から削除する
+
+    本文はデコードせずに html_page.HtmlPage（本文の bytes と文字コード）で返す。
+    make_soup にはそのまま渡し、文字列が必要な場合のみ .text を使う。
+
+    Args:
+        url: 取得するURL
+        max_age: キャッシュの有効期間（秒）の上書き。0 を指定すると必ず再検証する
+    """
+    html = _fetch_html(url, max_age=max_age)
+    if html is not None and _replay is None:
+        get_dead_letters().discard(url)
+    return html
+
+
+def _fetch_html(url, max_age=None):
+    """
+    URLからHTMLを取得する（html_page.HtmlPage。取得に失敗した場合はNone）
+
+    キャッシュが有効期間内であればキャッシュから返し、期限切れの場合は
+    If-None-Match / If-Modified-Since を付けて再検証する（304ならキャッシュを使用）。
+    取得したページはHTMLアーカイブにも保存する（本文が前回と同じ場合は保存しない）。
+    文字コードはヘッダー・<meta>・URLパターンの記憶から決め、本文全体からの推定は最後の手段とする（html_page）。
+    リプレイモード（--replay）ではネットワーク・キャッシュを使わず、リプレイ元のページを返す。
+
+    Args:
+        url: 取得するURL
+        max_age: キャッシュの有効期間（秒）の上書き。0 を指定すると必ず再検証する
+    """
+    _count_unit('pages')
+    if _replay is not None:
+        html = _replay.get_page(url)
+        with _http_stats_lock:
+            _http_stats['replayed' if html is not None else 'failures'] += 1
+        if html is None:
+            print(f"エラー: {url} はリプレイ元にありません")
+        return html
+
+    cache = get_cache()
+    entry = cache.lookup(url) if cache is not None else None
+    if entry is not None and cache.is_fresh(entry, max_age=max_age):
+        with _http_stats_lock:
+            _http_stats['cache_hits'] += 1
+        content = cache.read_body(entry)
+        _archive_page(url, content, entry['encoding'], digest=entry['body'])
+        return html_page.HtmlPage(content, entry['encoding'])
+
+    session = get_session()
+    import requests
+    headers = cache.conditional_headers(entry) if entry is not None else {}
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _get_with_retries(session, url, headers)
+        if response.status_code == 304 and entry is not None:
+            with _http_stats_lock:
+                _http_stats['not_modified'] += 1
+            entry = cache.touch(entry)
+            content = cache.read_body(entry)
+            _archive_page(url, content, entry['encoding'], digest=entry['body'])
+            return html_page.HtmlPage(content, entry['encoding'])
         response.raise_for_status()
-        response.encoding = response.apparent_encoding
-        return response.text
+        page = _encodings.page(url, response.content, response.headers)
+        digest = None
+        if cache is not None:
+            digest = cache.store(url, page.content, page.encoding, response.headers)['body']
+        _archive_page(url, page.content, page.encoding, digest=digest)
+        return page
     except requests.RequestException as e:
+        with _http_stats_lock:
+            _http_stats['failures'] += 1
+        _fetch_errors[url] = str(e)
         print(f"エラー: {url} の取得に失敗しました: {e}")
         return None
 
 
+def reset_http_stats():
+    """HTTP通信の統計情報をリセットする（00_run_all で処理ごとに表示するため）"""
+    with _http_stats_lock:
+        for key in _http_stats:
+            _http_stats[key] = 0
+
+
+def get_http_stats():
+    """
+    HTTP通信の統計情報を返す。
+
+    Returns:
+        dict: requests（リクエスト数）, connections（新規接続数）,
+              reuse_rate（コネクション再利用率）, retries（リトライ回数）,
+              failures（取得失敗数）, cache_hits（キャッシュから返した件数）,
+              not_modified（304で再検証できた件数）, replayed（リプレイ元から返した件数）
+    """
+    connections = 0
+    if _session is not None:
+        for adapter in _session.adapters.values():
+            poolmanager = getattr(adapter, 'poolmanager', None)
+            if poolmanager is None:
+                continue
+            pools = poolmanager.pools
+            for pool_key in pools.keys():
+                pool = pools.get(pool_key)
+                if pool is not None:
+                    connections += pool.num_connections
+
+    with _http_stats_lock:
+        stats = dict(_http_stats)
+    stats['connections'] = connections
+    total = stats['requests']
+    stats['reuse_rate'] = (1 - connections / total) if total else 0.0
+    return stats
+
+
+def print_http_stats():
+    """HTTP通信の統計情報を表示する"""
+    stats = get_http_stats()
+    if _replay is not None:
+        print(f"HTTP統計: リプレイ {stats['replayed']}件, 失敗 {stats['failures']}件（ネットワークアクセスなし）")
+        return
+    print(
+        f"HTTP統計: リクエスト {stats['requests']}件, "
+        f"新規接続 {stats['connections']}件, "
+        f"接続再利用率 {stats['reuse_rate']:.1%}, "
+        f"リトライ {stats['retries']}回, "
+        f"失敗 {stats['failures']}件, "
+        f"キャッシュ {stats['cache_hits']}件, "
+        f"304 {stats['not_modified']}件"
+    )
+
+
+def region_strainer(regions):
+    """
+    指定したクラス名のいずれかを持つ要素（とその子孫）のみを残す SoupStrainer を返す。
+    パース中の class 属性は分割前の文字列のため、空白で分割して判定する。
+    """
+    from bs4 import SoupStrainer
+
+    regions = frozenset(regions)
+
+    def match_class(value):
+        if value is None:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return not regions.isdisjoint(classes)
+
+    return SoupStrainer(attrs={'class': match_class})
+
+
+def make_soup(html, regions=None):
+    """
+    HTMLをパースして BeautifulSoup オブジェクトを返す。
+    パーサーは --parser / BASEBALL_HTML_PARSER で選択する（抽出処理はパーサーに依存しない）。
+
+    Args:
+        html: HTML（get_html の html_page.HtmlPage または文字列。lxml には HtmlPage の bytes と文字コードを
+              そのまま渡し、lxml がデコードする）
+        regions: 抽出処理が参照する領域のクラス名。指定した場合、そのクラスを持つ要素と子孫のみを
+                 ツリーに構築する（セレクタの起点となる要素を含めること。html5lib では無視される）
+    """
+    from bs4 import BeautifulSoup
+
+    parser = get_parser()
+    options = {}
+    if isinstance(html, html_page.HtmlPage):
+        if parser == 'lxml' and html.encoding is not None:
+            # lxml は bytes を受け取り、指定した文字コードで自身がデコードする
+            html, options['from_encoding'] = html.content, html.encoding
+        else:
+            # html.parser・html5lib は文字列をパースするため、ここで1回だけデコードする
+            html = html.text
+    if regions is not None and RUN_OPTIONS['partial_parse'] and parser != 'html5lib':
+        options['parse_only'] = region_strainer(regions)
+    return BeautifulSoup(html, parser, **options)
+
+
 def extract_text(element, default=""):
     """要素からテキストを抽出する（要素がNoneの場合はデフォルト値を返す）"""
     if element is None:
@@ -69,107 +774,232 @@ def extract_start_time(soup):
     return time_text.strip()
 
 
-def load_player_lookup(csv_path=None):
+# 入力CSVの読み込み結果（(種別, パス) -> ((更新日時, サイズ), 値)）。00_run_all で複数の処理を実行する際に共有する
+_file_cache = {}
+_file_cache_lock = threading.Lock()
+
+
+def _read_cached(kind, csv_path, reader):
     """
-    選手情報CSVファイルを読み込み、key -> player_name の辞書を返す。
-    ファイルが存在しない・空の場合は空辞書を返す。
-    
+    ファイルの更新日時・サイズが前回と同じであれば前回の読み込み結果を返し、変わっていれば reader で読み込む。
+    返す値（辞書・索引）は呼び出し元で共有されるため変更しないこと。
+    """
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return reader(csv_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    key = (kind, os.path.abspath(csv_path))
+    with _file_cache_lock:
+        cached = _file_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    value = reader(csv_path)
+    with _file_cache_lock:
+        _file_cache[key] = (stamp, value)
+    return value
+
+
+def _index_cache_dir():
+    return constants.INDEX_CACHE_DIR if constants.INDEX_CACHE_ENABLED else None
+
+
+def load_player_index(csv_path=None):
+    """
+    選手情報CSVファイルの索引（lookup_index.PlayerIndex）を返す。
+    プロセス内では1回だけ作成して共有し、cache/index/ に保存した索引があればCSVを読み込まずに復元する。
+    ファイルが存在しない・空の場合は空の索引を返す。返す索引は呼び出し元で共有されるため変更しないこと。
+
     Args:
         csv_path: CSVファイルのパス（デフォルトは定数ファイルから取得）
-    
-    CSVの形式:
-    - key列がある場合: key列を直接使用
-    - key列がない場合: team列とplayer_number列からkeyを生成
     """
     if csv_path is None:
         csv_path = constants.PLAYERS_INFO_CSV_PATH
-    lookup = {}
-    if not os.path.exists(csv_path):
-        return lookup
-    
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            row = {k.strip(): (v or '').strip() for k, v in row.items()}
-            
-            # key列がある場合はそれを使用
-            key = row.get('key', '')
-            if not key:
-                # key列がない場合はteamとplayer_numberから生成
-                team = row.get('team', '')
-                pnum = row.get('player_number', '')
-                if team and pnum:
-                    key = f"{team}_{pnum}"
-            
-            pname = row.get('player_name', '')
-            if key:
-                lookup[key] = pname
-    
-    return lookup
+    return _read_cached('player_index', csv_path, lambda path: lookup_index.load_index(
+        lookup_index.PlayerIndex, path, _index_cache_dir()))
+
+
+def load_team_index(csv_path=None):
+    """
+    チーム情報CSVファイルの索引（lookup_index.TeamIndex）を返す（load_player_index を参照）
+
+    Args:
+        csv_path: CSVファイルのパス（デフォルトは定数ファイルから取得）
+    """
+    if csv_path is None:
+        csv_path = constants.TEAMS_INFO_CSV_PATH
+    return _read_cached('team_index', csv_path, lambda path: lookup_index.load_index(
+        lookup_index.TeamIndex, path, _index_cache_dir()))
+
+
+def load_player_lookup(csv_path=None):
+    """
+    key（${team}_${player_number}）-> player_name の辞書を返す（選手の索引の by_number）。
+    ファイルが存在しない・空の場合は空辞書を返す。
+
+    Args:
+        csv_path: CSVファイルのパス（デフォルトは定数ファイルから取得）
+    """
+    return load_player_index(csv_path).by_number
 
 
 def load_player_lookup_by_nickname(csv_path=None):
     """
-    選手情報CSVファイルを読み込み、${team}_${nickname} -> player_name の辞書を返す。
+    ${team}_${nickname} -> player_name の辞書を返す（選手の索引の by_nickname）。
     ファイルが存在しない・空の場合は空辞書を返す。
-    
+
     Args:
         csv_path: CSVファイルのパス（デフォルトは定数ファイルから取得）
-    
-    Returns:
-        dict: ${team}_${nickname} をキー、player_name を値とする辞書
     """
-    if csv_path is None:
-        csv_path = constants.PLAYERS_INFO_CSV_PATH
-    lookup = {}
-    if not os.path.exists(csv_path):
-        return lookup
-    
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            row = {k.strip(): (v or '').strip() for k, v in row.items()}
-            
-            team = row.get('team', '')
-            nickname = row.get('nickname', '')
-            player_name = row.get('player_name', '')
-            
-            if team and nickname:
-                key = f"{team}_{nickname}"
-                lookup[key] = player_name
-    
-    return lookup
+    return load_player_index(csv_path).by_nickname
 
 
 def load_teams_info(csv_path=None):
     """
-    チーム情報CSVファイルを読み込み、key -> team_name の辞書を返す。
+    key -> team_name の辞書を返す（チームの索引の by_key）。
     ファイルが存在しない・空の場合は空辞書を返す。
-    
+
     Args:
         csv_path: CSVファイルのパス（デフォルトは定数ファイルから取得）
-    
+    """
+    return load_team_index(csv_path).by_key
+
+
+def load_team_years(team_name, output_dir='output'):
+    """
+    04_team_stats.csv からチームの成績がある年度の一覧を降順で返す。
+    実行日時の年は（まだ試合がなくても）必ず含める。
+    ファイルが存在しない・該当チームの行がない場合は、実行日時の年から
+    constants.SEASON_START_YEAR までの全年度を返す。
+    """
+    from datetime import datetime
+
+    current_year = datetime.now().year
+    years = set()
+    csv_path = os.path.join(output_dir, constants.TEAM_STATS_CSV)
+    if os.path.exists(csv_path):
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                year = (row.get('year') or '').strip()
+                if row.get('team') == team_name and year.isdigit():
+                    years.add(int(year))
+
+    if not years:
+        return list(range(current_year, constants.SEASON_START_YEAR - 1, -1))
+
+    years.add(current_year)
+    return sorted(years, reverse=True)
+
+
+def load_changed_game_years(team_name, output_dir='output'):
+    """
+    最新の 01_game_info.csv と前回の出力（01_game_info_yyyymmdd.csv のうち最新のもの）を比較し、
+    追加・変更・削除された試合の年度の集合を返す。
+    比較できるファイルがない場合はNoneを返す（全年度が変更された可能性がある）。
+    """
+    import glob
+
+    name, ext = os.path.splitext(constants.GAME_INFO_CSV)
+    current_path = os.path.join(output_dir, constants.GAME_INFO_CSV)
+    snapshots = sorted(glob.glob(os.path.join(output_dir, f"{name}_[0-9]*{ext}")))
+    if not os.path.exists(current_path) or not snapshots:
+        return None
+
+    def read_games(csv_path):
+        games = {}
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row.get('team') == team_name:
+                    games[row.get('key', '')] = row
+        return games
+
+    current = read_games(current_path)
+    previous = read_games(snapshots[-1])
+
+    changed_years = set()
+    for key in set(current) | set(previous):
+        row = current.get(key) or previous.get(key)
+        if current.get(key) != previous.get(key):
+            date = row.get('date', '')
+            if len(date) >= 4 and date[:4].isdigit():
+                changed_years.add(int(date[:4]))
+    return changed_years
+
+
+def get_open_seasons(team_name, output_dir='output'):
+    """
+    再取得が必要な年度（実行日時の年と、前回の実行以降に試合が追加・変更された年度）の集合を返す。
+    判定できない場合はNoneを返す（全年度を再取得する）。
+    """
+    from datetime import datetime
+
+    changed_years = load_changed_game_years(team_name, output_dir)
+    if changed_years is None:
+        return None
+    return changed_years | {datetime.now().year}
+
+
+def load_previous_rows_by_year(base_filename, row_class, team_name, output_dir='output'):
+    """
+    前回出力したCSVから該当チームの行を読み込み、年度ごとにまとめて返す。
+    ファイルが存在しない場合は空の辞書を返す。
+
+    Args:
+        row_class: 行クラス（row_types）
+
     Returns:
-        dict: key をキー、team_name を値とする辞書
+        dict: year(int) -> 行のリスト
     """
-    if csv_path is None:
-        csv_path = constants.TEAMS_INFO_CSV_PATH
-    lookup = {}
+    rows_by_year = {}
+    csv_path = os.path.join(output_dir, base_filename)
     if not os.path.exists(csv_path):
-        return lookup
-    
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            row = {k.strip(): (v or '').strip() for k, v in row.items()}
-            
-            key = row.get('key', '')
-            team_name = row.get('team_name', '')
-            
-            if key and team_name:
-                lookup[key] = team_name
-    
-    return lookup
+        return rows_by_year
+    for row in row_types.iter_csv(csv_path, row_class):
+        if row.team == team_name and row.year is not None:
+            rows_by_year.setdefault(row.year, []).append(row)
+    return rows_by_year
+
+
+def _pop_option(args, name):
+    """
+    args から「name 値」形式のオプションを取り除き、値を返す（指定がなければNone）
+    """
+    import sys
+
+    if name not in args:
+        return None
+    idx = args.index(name)
+    if idx + 1 >= len(args):
+        print(f"エラー: {name} には値を指定してください")
+        sys.exit(1)
+    value = args[idx + 1]
+    del args[idx:idx + 2]
+    return value
+
+
+def _pop_int_option(args, name):
+    """
+    args から「name 値」形式のオプションを取り除き、整数値を返す（指定がなければNone）
+    """
+    import sys
+
+    value = _pop_option(args, name)
+    if value is None:
+        return None
+    if not value.isdigit() or int(value) < 1:
+        print(f"エラー: {name} には1以上の整数を指定してください（指定値: {value}）")
+        sys.exit(1)
+    return int(value)
+
+
+def set_stage_argv(argv):
+    """
+    現在のスレッドで parse_command_line_args が解析する引数を設定する（None で sys.argv に戻す）
+
+    Args:
+        argv: sys.argv と同じ形式のリスト（先頭はスクリプトのパス）
+    """
+    _stage_argv.argv = argv
 
 
 def parse_command_line_args(script_name, supports_test_mode=True):
@@ -180,12 +1010,21 @@ def parse_command_line_args(script_name, supports_test_mode=True):
         script_name: スクリプト名（使用方法の表示に使用）
         supports_test_mode: --testオプションをサポートするかどうか
     
+    引数は sys.argv（set_stage_argv で設定されている場合はその値）から読み取る。
+    
     Returns:
-        (team_names, test_mode) のタプル
+        (team_names, test_mode) のタプル（test_mode は RUN_OPTIONS['test'] にも設定される）
+        --workers N の値は RUN_OPTIONS['workers'] に、
+        --parse-workers N の値は RUN_OPTIONS['parse_workers'] に、
+        --team-workers N の値は RUN_OPTIONS['team_workers'] に、
+        --incremental の有無は RUN_OPTIONS['incremental'] に、
+        --resume の有無は RUN_OPTIONS['resume'] に、
+        --replay <dir> の値は RUN_OPTIONS['replay'] に、
+        --parser NAME の値（省略時は BASEBALL_HTML_PARSER）は RUN_OPTIONS['parser'] に設定される
     """
     import sys
     
-    args = sys.argv[1:]
+    args = list(getattr(_stage_argv, 'argv', None) or sys.argv)[1:]
     
     # --testオプションのチェック
     test_mode = False
@@ -193,12 +1032,49 @@ def parse_command_line_args(script_name, supports_test_mode=True):
         test_mode = '--test' in args
         if test_mode:
             args.remove('--test')
+    RUN_OPTIONS['test'] = test_mode
+    
+    # --workers オプション（並行取得数）のチェック
+    workers = _pop_int_option(args, '--workers')
+    if workers is not None:
+        RUN_OPTIONS['workers'] = workers
+    
+    # --parse-workers オプション（パースのプロセス数）のチェック
+    parse_workers = _pop_int_option(args, '--parse-workers')
+    if parse_workers is not None:
+        RUN_OPTIONS['parse_workers'] = parse_workers
+    
+    # --team-workers オプション（並行に処理するチーム数）のチェック
+    team_workers = _pop_int_option(args, '--team-workers')
+    if team_workers is not None:
+        RUN_OPTIONS['team_workers'] = team_workers
+    
+    # --incremental オプション（前回の出力にない試合・年度のみ取得）のチェック
+    if '--incremental' in args:
+        args.remove('--incremental')
+        RUN_OPTIONS['incremental'] = True
+    
+    # --resume オプション（前回中断した実行の続きから再開）のチェック
+    if '--resume' in args:
+        args.remove('--resume')
+        RUN_OPTIONS['resume'] = True
+    
+    # --replay オプション（ネットワークの代わりにアーカイブ・フィクスチャからページを取得）のチェック
+    replay_dir = _pop_option(args, '--replay')
+    if replay_dir is not None:
+        if not os.path.isdir(replay_dir):
+            print(f"エラー: --replay に指定したディレクトリが存在しません: {replay_dir}")
+            sys.exit(1)
+        set_replay_dir(replay_dir)
+    
+    # --parser オプション（HTMLパーサー）のチェック
+    set_parser_option(_pop_option(args, '--parser'))
     
     # チーム名を取得（複数対応）
     if len(args) < 1:
         print("エラー: チーム名を指定してください")
         test_help = " [--test]" if supports_test_mode else ""
-        print(f"使用方法: python {script_name} <チーム名> [<チーム名> ...]{test_help}")
+        print(f"使用方法: python {script_name} <チーム名> [<チーム名> ...]{test_help} [--workers N] [--parse-workers N] [--team-workers N] [--incremental] [--resume] [--replay <dir>] [--parser NAME]")
         print(f"例: python {script_name} orcas")
         print(f"例: python {script_name} orcas swallows-fan")
         if supports_test_mode:
@@ -216,6 +1092,41 @@ def parse_command_line_args(script_name, supports_test_mode=True):
     return team_names, test_mode
 
 
+def open_checkpoint(name, team_names, outputs, output_dir='output'):
+    """
+    出力行をチームごとの一時ファイルに書き出すチェックポイントを作成する（checkpoint.CsvCheckpoint）。
+    --resume が指定されている場合は、前回中断したチェックポイントから再開する。
+
+    Args:
+        name: チェックポイント名（スクリプト名）
+        team_names: チーム名のリスト（出力ファイルでの行順）
+        outputs: {出力の種類: (出力ファイル名, 行クラス)}（行クラスは row_types）
+        output_dir: 出力ディレクトリ
+    """
+    # 出力の内容が変わるオプション（前回と異なる場合は再開しない・完了済みとして扱わない）
+    options = {
+        'test': RUN_OPTIONS['test'],
+        'incremental': RUN_OPTIONS['incremental'],
+        'replay': os.path.abspath(RUN_OPTIONS['replay']) if RUN_OPTIONS['replay'] else None,
+    }
+    try:
+        cp = checkpoint.CsvCheckpoint(
+            name, team_names, outputs, output_dir=output_dir,
+            resume=RUN_OPTIONS['resume'], prepare_filename=prepare_csv_filename, columnar=COLUMNAR_FORMAT,
+            options=options,
+        )
+    except checkpoint.CheckpointMismatch as e:
+        print(f"エラー: {e}。同じオプションで --resume を指定するか、--resume を指定せずに最初から取得してください")
+        sys.exit(1)
+    if cp.finished:
+        outputs_text = ', '.join(path for path in cp.previous_outputs.values() if path) or 'なし'
+        print(f"再開: {name} は今日の同じオプションでの実行で完了済みのため、今回は何も取得しません"
+              f"（出力ファイル: {outputs_text}）")
+    elif cp.completed:
+        print(f"再開: {name} は前回の実行で {len(cp.completed)}ページが完了済みです（続きから取得します）")
+    return cp
+
+
 def prepare_csv_filename(base_filename, output_dir='output'):
     """
     CSVファイル名を準備する（日付なしのファイル名を返す）
@@ -0,0 +1,7 @@
+"""
+野球記録スクレイピングシステム（baseball_record パッケージ）
+
+src のスクリプトは同じディレクトリのモジュールを通常の import（import constants など）で読み込む。
+baseball-record コマンドでは、cli.main がサブコマンドのスクリプトを読み込む前に src を sys.path に追加する
+（パッケージの import 自体は sys.path を変更しない）。
+"""
@@ -0,0 +1,293 @@
+"""
+Supabase へのバッチ送信（load_to_supabase.py / update_supabase.py で使用）
+
+レコードを payload のバイト数でバッチに分け、1テーブルにつき複数のバッチを並行に送信する。
+
+    バッチサイズ   JSON にしたときのバイト数で決める。応答時間が目標（TARGET_SECONDS）より短ければ大きくし、
+                  長ければ小さくする（INITIAL_BATCH_BYTES から MIN_BATCH_BYTES〜MAX_BATCH_BYTES の範囲で調整）
+    413           バッチを半分に分けて送り直し、以降のバッチの上限を下げる
+    429・5xx     全テーブルの送信を一時停止し（指数バックオフ）、同じバッチを送り直す
+    タイムアウト   429 と同じく待ってから送り直し、以降のバッチを小さくする
+
+送信する関数は同じバッチを複数回送っても結果が変わらない（UPSERT・論理削除など）ものとすること。
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# バッチの payload のバイト数（初期値・下限・上限）
+INITIAL_BATCH_BYTES = 256 * 1024
+MIN_BATCH_BYTES = 16 * 1024
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+# 1バッチの最大行数
+MAX_BATCH_ROWS = 5000
+# 1バッチの応答時間の目標（秒）
+TARGET_SECONDS = 1.0
+# 1テーブルで並行に送信するバッチ数
+IN_FLIGHT = 4
+# 並行に処理するテーブル数
+TABLE_WORKERS = 3
+# 1バッチの再送の上限回数と、バックオフの待ち時間（秒。初回・上限）
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# 送り直すエラー（HTTPステータス、PostgreSQL の statement_timeout）
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+TIMEOUT_CODES = {"57014"}
+# 送り直す例外（httpx のタイムアウト・接続エラー。クラス名で判定する）
+TRANSIENT_ERRORS = ("Timeout", "ConnectError", "RemoteProtocolError", "ReadError", "WriteError")
+
+TOO_LARGE = "too_large"
+RETRY = "retry"
+TIMEOUT = "timeout"
+
+
+def json_size(item) -> int:
+    """レコードを JSON にしたときのバイト数（区切りの , を含む）"""
+    return len(json.dumps(item, ensure_ascii=False, default=str).encode("utf-8")) + 1
+
+
+def _status_code(exc: BaseException):
+    """例外の HTTPステータス・エラーコード（postgrest の APIError.code、httpx の response.status_code）"""
+    code = getattr(exc, "code", None)
+    if code is None:
+        response = getattr(exc, "response", None)
+        code = getattr(response, "status_code", None)
+    if isinstance(code, str) and code.isdigit() and len(code) == 3:
+        return int(code)
+    return code
+
+
+def classify(exc: BaseException) -> str | None:
+    """送り直すエラーの種類（TOO_LARGE / RETRY / TIMEOUT。送り直さないエラーは None）"""
+    code = _status_code(exc)
+    if code == 413:
+        return TOO_LARGE
+    if code in RETRY_STATUSES:
+        return RETRY
+    if code in TIMEOUT_CODES or isinstance(exc, TimeoutError):
+        return TIMEOUT
+    name = type(exc).__name__
+    if any(part in name for part in TRANSIENT_ERRORS):
+        return TIMEOUT if "Timeout" in name else RETRY
+    return None
+
+
+class BatchSizer:
+    """
+    バッチの payload のバイト数の調整（スレッドセーフ）
+
+    応答時間から目標の応答時間で送れるバイト数を見積もり、現在の値との中間にする（1回で最大2倍まで）。
+    """
+
+    def __init__(
+        self,
+        initial_bytes: int = INITIAL_BATCH_BYTES,
+        min_bytes: int = MIN_BATCH_BYTES,
+        max_bytes: int = MAX_BATCH_BYTES,
+        max_rows: int = MAX_BATCH_ROWS,
+        target_seconds: float = TARGET_SECONDS,
+    ):
+        self.lock = threading.Lock()
+        self.target_bytes = initial_bytes
+        self.min_bytes = min_bytes
+        self.ceiling = max_bytes
+        self.max_rows = max_rows
+        self.target_seconds = target_seconds
+
+    def take(self, sizes: list[int], start: int) -> int:
+        """start から始まるバッチの末尾の次の位置（1行以上、目標のバイト数・最大行数以内）"""
+        with self.lock:
+            limit = self.target_bytes
+        end = start
+        total = 0
+        stop = min(len(sizes), start + self.max_rows)
+        while end < stop and (end == start or total + sizes[end] <= limit):
+            total += sizes[end]
+            end += 1
+        return end
+
+    def observe(self, nbytes: int, seconds: float) -> None:
+        """送信できたバッチの大きさと応答時間を反映する"""
+        if seconds <= 0:
+            return
+        with self.lock:
+            estimate = min(nbytes * self.target_seconds / seconds, self.target_bytes * 2)
+            target = (self.target_bytes + estimate) / 2
+            self.target_bytes = int(max(self.min_bytes, min(target, self.ceiling)))
+
+    def shrink(self) -> None:
+        """タイムアウトしたため以降のバッチを半分にする"""
+        with self.lock:
+            self.target_bytes = max(self.min_bytes, self.target_bytes // 2)
+
+    def too_large(self, nbytes: int) -> None:
+        """413 になったバッチより小さくする（以降のバッチの上限も下げる）"""
+        with self.lock:
+            self.ceiling = max(self.min_bytes, min(self.ceiling, nbytes // 2))
+            self.target_bytes = min(self.target_bytes, self.ceiling)
+
+
+class Backoff:
+    """429・5xx・タイムアウトの後、すべての送信を一時停止する（スレッドセーフ。プロセスで共有）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.resume_at = 0.0
+
+    def wait(self) -> None:
+        while True:
+            with self.lock:
+                delay = self.resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def pause(self, attempt: int) -> float:
+        """attempt 回目の再送の前に待つ（指数バックオフ、ゆらぎあり）。待つ秒数を返す"""
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt) * (0.5 + random.random() / 2)
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + delay)
+        return delay
+
+
+_backoff = Backoff()
+
+
+class UploadStats:
+    """送信の統計（行数・リクエスト数・再送回数・経過秒数）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.requests = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+    def add(self, other: UploadStats) -> None:
+        self.rows += other.rows
+        self.requests += other.requests
+        self.retries += other.retries
+        self.seconds += other.seconds
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _send_chunk(send, chunk: list, nbytes: int, sizer: BatchSizer, stats: UploadStats, label: str) -> list:
+    """
+    バッチを送信し、[(バッチ, 送信関数の戻り値)] を返す（413 で分割した場合は複数）。
+    送り直せないエラー・再送の上限を超えた場合は例外を送出する
+    """
+    attempt = 0
+    while True:
+        _backoff.wait()
+        started = time.perf_counter()
+        with stats.lock:
+            stats.requests += 1
+        try:
+            result = send(chunk)
+        except Exception as e:
+            kind = classify(e)
+            if kind == TOO_LARGE and len(chunk) > 1:
+                sizer.too_large(nbytes)
+                mid = len(chunk) // 2
+                half = nbytes // 2
+                return (_send_chunk(send, chunk[:mid], half, sizer, stats, label)
+                        + _send_chunk(send, chunk[mid:], nbytes - half, sizer, stats, label))
+            if kind is None or kind == TOO_LARGE or attempt >= MAX_RETRIES:
+                raise
+            if kind == TIMEOUT:
+                sizer.shrink()
+            delay = _backoff.pause(attempt)
+            attempt += 1
+            with stats.lock:
+                stats.retries += 1
+            print(f"再送: {label} {len(chunk)} 件（{e}。{delay:.1f}秒待機, {attempt}回目）")
+            continue
+        sizer.observe(nbytes, time.perf_counter() - started)
+        return [(chunk, result)]
+
+
+def upload(
+    items: list,
+    send,
+    on_done=None,
+    label: str = "",
+    size=json_size,
+    in_flight: int = IN_FLIGHT,
+    sizer: BatchSizer | None = None,
+) -> UploadStats:
+    """
+    items をバッチに分けて send(バッチ) で並行に送信する。
+
+    Args:
+        items: 送信するレコード（または key などの値）
+        send: バッチを送信する関数（戻り値は on_done に渡す）
+        on_done: 送信できたバッチごとに on_done(バッチ, send の戻り値) を呼び出す（呼び出し元のスレッドで順に呼び出す）
+        label: 再送時の表示名（テーブル名など）
+        size: レコードの payload のバイト数を返す関数
+        in_flight: 並行に送信するバッチ数
+        sizer: バッチサイズの調整（省略時は初期値から調整する）
+    """
+    stats = UploadStats()
+    if not items:
+        return stats
+    sizes = [size(item) for item in items]
+    sizer = sizer or BatchSizer()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=in_flight) as executor:
+        pending = set()
+        start = 0
+        try:
+            while start < len(items) or pending:
+                while start < len(items) and len(pending) < in_flight:
+                    end = sizer.take(sizes, start)
+                    pending.add(executor.submit(
+                        _send_chunk, send, items[start:end], sum(sizes[start:end]), sizer, stats, label
+                    ))
+                    start = end
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for chunk, result in future.result():
+                        stats.rows += len(chunk)
+                        if on_done is not None:
+                            on_done(chunk, result)
+        except BaseException:
+            # 送信中のバッチの完了は待つが、結果は記録しない（次回の実行で送り直す）
+            for future in pending:
+                future.cancel()
+            raise
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def run_tables(tables: list, load_table, workers: int = TABLE_WORKERS) -> list:
+    """
+    テーブルごとの処理 load_table(テーブルの設定) を並行に実行し、結果を tables の順に返す
+    （例外が発生したテーブルの結果はその例外）
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(load_table, table) for table in tables]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+    return results
+
+
+def format_throughput(table: str, stats: UploadStats) -> str:
+    """サマリーに表示するテーブルごとのスループット"""
+    return (
+        f"  {table:32s} {stats.rows:7d} 行 {stats.seconds:7.2f}秒 {stats.rows_per_second:9.1f} 行/秒"
+        f"（リクエスト {stats.requests} 回, 再送 {stats.retries} 回）"
+    )
@@ -0,0 +1,124 @@
+"""
+文字コードの判定・デコードの比較ベンチマーク
+
+リプレイ元（HTMLアーカイブまたはフィクスチャディレクトリ）の各ページについて、従来の処理
+（apparent_encoding による本文全体からの文字コードの推定 → 文字列にデコード → パース）と、
+現在の処理（ヘッダー・<meta>・URLパターンの記憶による判定 → bytes のままパース）の1ページあたりの時間を
+段階ごとに表示する。両方の処理でパースしたツリーが一致することも確認する。ネットワークにはアクセスしない。
+
+使用方法: python src/bench_encoding.py --replay <dir> [--repeat N] [--parser NAME]
+"""
+import os
+import sys
+import time
+import importlib
+
+utils = importlib.import_module("99_utils")
+html_page = utils.html_page
+
+
+def read_pages(replay_dir):
+    """リプレイ元のページを (URL, 本文) のリストで返す（フィクスチャディレクトリの場合はURLの代わりに相対パス）"""
+    store = utils.html_archive.open_store(replay_dir)
+    if isinstance(store, utils.html_archive.HtmlArchive):
+        return [(record['url'], content) for record, content in store.iter_records()]
+    pages = []
+    for dirpath, _, filenames in os.walk(replay_dir):
+        for filename in sorted(filenames):
+            if filename.endswith('.html'):
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as f:
+                    pages.append(('http://' + os.path.relpath(path, replay_dir), f.read()))
+    return pages
+
+
+def run_before(pages):
+    """従来の処理（段階ごとの合計秒数と、パースしたツリーの文字列）"""
+    from requests.compat import chardet
+
+    timings = {'detect': 0.0, 'decode': 0.0, 'parse': 0.0}
+    trees = []
+    for _, content in pages:
+        started = time.perf_counter()
+        encoding = chardet.detect(content)['encoding'] or 'utf-8'
+        detected = time.perf_counter()
+        html = content.decode(encoding, errors='replace')
+        decoded = time.perf_counter()
+        soup = utils.make_soup(html)
+        parsed = time.perf_counter()
+        timings['detect'] += detected - started
+        timings['decode'] += decoded - detected
+        timings['parse'] += parsed - decoded
+        trees.append(str(soup))
+    return timings, trees
+
+
+def run_after(pages):
+    """現在の処理（段階ごとの合計秒数と、パースしたツリーの文字列。文字コードの記憶は実行ごとに空にする）"""
+    detector = html_page.EncodingDetector()
+    timings = {'detect': 0.0, 'decode': 0.0, 'parse': 0.0}
+    trees = []
+    for url, content in pages:
+        started = time.perf_counter()
+        page = detector.page(url, content)
+        detected = time.perf_counter()
+        soup = utils.make_soup(page)
+        parsed = time.perf_counter()
+        timings['detect'] += detected - started
+        timings['parse'] += parsed - detected
+        trees.append(str(soup))
+    return timings, trees, detector.stats
+
+
+def _fastest(best, timings):
+    return timings if best is None else {k: min(best[k], v) for k, v in timings.items()}
+
+
+def main():
+    """メイン処理"""
+    args = sys.argv[1:]
+    repeat = utils._pop_int_option(args, '--repeat') or 5
+    replay_dir = utils._pop_option(args, '--replay')
+    parser = utils._pop_option(args, '--parser')
+    if replay_dir is None or not os.path.isdir(replay_dir) or args:
+        print("使用方法: python src/bench_encoding.py --replay <dir> [--repeat N] [--parser NAME]")
+        sys.exit(1)
+    utils.set_parser_option(parser)
+    utils.RUN_OPTIONS['partial_parse'] = False
+
+    pages = read_pages(replay_dir)
+    if not pages:
+        print(f"ページがありません: {replay_dir}")
+        sys.exit(1)
+    total_bytes = sum(len(content) for _, content in pages)
+    print(f"リプレイ元: {replay_dir}（{len(pages)}ページ, 平均 {total_bytes / len(pages) / 1024:.1f}KB）")
+    print(f"パーサー: {utils.get_parser()}（各{repeat}回実行し、段階ごとに最速の結果を表示）")
+    print("=" * 70)
+
+    # 実行中の負荷の変動が両方に同じように影響するように、従来・現在の処理を交互に実行する
+    before = after = None
+    for _ in range(repeat):
+        timings, before_trees = run_before(pages)
+        before = _fastest(before, timings)
+        timings, after_trees, sources = run_after(pages)
+        after = _fastest(after, timings)
+
+    def per_page_ms(seconds):
+        return seconds / len(pages) * 1000
+
+    print(f"{'1ページあたり（ミリ秒）':24s}{'判定':>10s}{'デコード':>10s}{'パース':>10s}{'合計':>10s}")
+    for label, timings in (("従来（apparent_encoding）", before), ("現在（bytes のまま）", after)):
+        total = sum(timings.values())
+        print(f"{label:24s}" + "".join(
+            f"{per_page_ms(timings[k]):10.3f}" for k in ('detect', 'decode', 'parse')
+        ) + f"{per_page_ms(total):10.3f}")
+    saved = sum(before.values()) - sum(after.values())
+    ratio = saved / sum(before.values()) if sum(before.values()) else 0
+    print(f"削減: 1ページあたり {per_page_ms(saved):.3f}ミリ秒（{ratio:.1%}）")
+    print("文字コードの判定方法: " + ", ".join(f"{k} {v}件" for k, v in sources.items()))
+    mismatches = sum(1 for b, a in zip(before_trees, after_trees) if b != a)
+    print(f"パース結果: {'一致' if not mismatches else f'不一致 {mismatches}ページ'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+HTMLパーサーの比較ベンチマーク
+
+リプレイ元（HTMLアーカイブまたはフィクスチャディレクトリ）のページに対して、01〜06 の抽出処理を
+インストールされている各パーサーで全体パース・部分パース（抽出処理が参照する領域のみ）それぞれ実行し、
+1秒あたりの処理ページ数・ピークメモリと、html.parser（全体パース）との出力の一致を表示する。
+ネットワークにはアクセスせず、ページは初回の読み込み後メモリ上に保持するため、パースと抽出のみを計測する。
+
+使用方法: python src/bench_parsers.py <チーム名> [<チーム名> ...] --replay <dir> [--repeat N]
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+import importlib
+from contextlib import redirect_stdout
+
+# 各スクリプトの抽出処理をインポート（数字で始まるモジュール名は importlib を使用）
+import game_pages
+team_stats = importlib.import_module("04_get_team_stats")
+hitter_stats = importlib.import_module("05_get_hitter_stats")
+pitcher_stats = importlib.import_module("06_get_pitcher_stats")
+utils = game_pages.utils
+
+
+class _MemoryStore:
+    """リプレイ元のページをメモリ上に保持し、取得回数を数える"""
+
+    def __init__(self, store):
+        self.store = store
+        self.pages = {}
+        self.count = 0
+
+    def get_page(self, url, at=None):
+        self.count += 1
+        if url not in self.pages:
+            self.pages[url] = self.store.get_page(url)
+        return self.pages[url]
+
+
+def run_workload(team_names, player_lookup, player_lookup_by_nickname, teams_info):
+    """01〜06 の抽出処理を実行し、出力行を返す"""
+    results = []
+    for team_name in team_names:
+        game_rows = game_pages.scrape_all_game_pages(
+            team_name, False, player_lookup, player_lookup_by_nickname, teams_info, game_pages.ALL_KINDS
+        )
+        results.append(game_rows)
+        results.append(team_stats.scrape_team_stats(team_name))
+        results.append(hitter_stats.scrape_all_years_hitter_stats(team_name, player_lookup=player_lookup))
+        results.append(pitcher_stats.scrape_all_years_pitcher_stats(team_name, player_lookup=player_lookup))
+    return results
+
+
+def main():
+    """メイン処理"""
+    args = sys.argv[1:]
+    repeat = utils._pop_int_option(args, '--repeat') or 3
+    replay_dir = utils._pop_option(args, '--replay')
+    if replay_dir is None or not os.path.isdir(replay_dir) or not args:
+        print("使用方法: python src/bench_parsers.py <チーム名> [<チーム名> ...] --replay <dir> [--repeat N]")
+        sys.exit(1)
+    team_names = args
+
+    store = _MemoryStore(utils.html_archive.open_store(replay_dir))
+    utils.set_replay_store(store)
+    utils.RUN_OPTIONS['workers'] = 1
+    utils.RUN_OPTIONS['parse_workers'] = 1
+
+    player_lookup = utils.load_player_lookup()
+    player_lookup_by_nickname = utils.load_player_lookup_by_nickname()
+    teams_info = utils.load_teams_info()
+
+    parsers = utils.available_parsers()
+    print(f"リプレイ元: {replay_dir}")
+    print(f"チーム: {', '.join(team_names)}")
+    print(f"パーサー: {', '.join(parsers)}（各{repeat}回実行し、最速の結果を表示）")
+    print("=" * 70)
+
+    modes = [(parser, partial)
+             for parser in ['html.parser'] + [p for p in parsers if p != 'html.parser']
+             for partial in (False, True)]
+    baseline = None
+    baseline_elapsed = None
+    for parser, partial in modes:
+        utils.RUN_OPTIONS['parser'] = parser
+        utils.RUN_OPTIONS['partial_parse'] = partial
+        best = None
+        for _ in range(repeat):
+            store.count = 0
+            started = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                results = run_workload(team_names, player_lookup, player_lookup_by_nickname, teams_info)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        pages = store.count
+
+        # ピークメモリは計測のオーバーヘッドが大きいため、時間計測とは別に1回だけ実行して測る
+        tracemalloc.start()
+        with redirect_stdout(io.StringIO()):
+            run_workload(team_names, player_lookup, player_lookup_by_nickname, teams_info)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if baseline is None:
+            baseline = results
+            baseline_elapsed = best
+        same = "一致" if results == baseline else "不一致"
+        mode = "部分" if partial else "全体"
+        print(
+            f"{parser:12s} {mode} {pages:6d}ページ {best:8.3f}秒 "
+            f"{pages / best if best else 0:9.1f}ページ/秒 "
+            f"x{baseline_elapsed / best if best else 0:5.2f} "
+            f"ピークメモリ {peak / 1024:8.0f}KB  出力: {same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
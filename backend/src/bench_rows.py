@@ -0,0 +1,100 @@
+"""
+出力行のメモリ使用量の比較ベンチマーク
+
+出力CSVのスキーマごとに、行を辞書で保持した場合と行クラス（row_types。__slots__）で保持した場合の
+1万行あたりのメモリ使用量（行の入れ物と、行クラスが数値の列を変換して作成した値。抽出した文字列は両者で共通のため含めない）と、
+作成・CSV書き込み（csv.DictWriter / row_types.write_csv）の処理時間を表示する。ネットワークにはアクセスしない。
+
+使用方法: python src/bench_rows.py [--rows N]
+"""
+import io
+import sys
+import csv
+import time
+import tracemalloc
+import importlib
+
+# 数字で始まるモジュール名をインポートするため、importlibを使用
+utils = importlib.import_module("99_utils")
+row_types = utils.row_types
+
+# 計測するスキーマ（出力ファイル名 -> 行クラス）
+SCHEMAS = {
+    utils.constants.GAME_INFO_CSV: row_types.GameInfoRow,
+    "02_game_hitter_stats.csv": row_types.GameHitterStatsRow,
+    "03_game_pitcher_stats.csv": row_types.GamePitcherStatsRow,
+    utils.constants.TEAM_STATS_CSV: row_types.TeamStatsRow,
+    "05_hitter_stats.csv": row_types.HitterStatsRow,
+    "06_pitcher_stats.csv": row_types.PitcherStatsRow,
+}
+
+
+def sample_value(row_class, name, i):
+    """計測用の値（数値の列は抽出時と同じく数値の文字列）"""
+    if name in row_class.int_fields:
+        return str(i % 1000)
+    if name in row_class.float_fields:
+        return f".{i % 1000:03d}"
+    return f"{name}_{i}"
+
+
+def measure_memory(build):
+    """build() が作成した行のリストのメモリ使用量（バイト）"""
+    tracemalloc.start()
+    rows = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return current
+
+
+def measure_time(func):
+    """func() の処理時間（秒）と戻り値"""
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    """メイン処理"""
+    args = sys.argv[1:]
+    row_count = utils._pop_int_option(args, '--rows') or 10000
+    per = 10000 / row_count
+
+    print(f"{'スキーマ':<28}{'列数':>5}{'辞書(KB)':>11}{'行クラス(KB)':>14}{'削減率':>8}"
+          f"{'作成(ms)':>16}{'書き込み(ms)':>18}")
+    for base_filename, row_class in SCHEMAS.items():
+        fieldnames = row_class.fieldnames
+        # 値の文字列は行ごとに別のオブジェクトとし、計測の前に作成しておく
+        # （抽出処理と同じく、列名と値をキーワード引数で渡して行を作成する）
+        fields = [{name: sample_value(row_class, name, i) for name in fieldnames} for i in range(row_count)]
+
+        def build_dicts():
+            return [dict(**row_fields) for row_fields in fields]
+
+        def build_rows():
+            return [row_class(**row_fields) for row_fields in fields]
+
+        dict_bytes = measure_memory(build_dicts)
+        slot_bytes = measure_memory(build_rows)
+        dict_time, dict_rows = measure_time(build_dicts)
+        slot_time, slot_rows = measure_time(build_rows)
+
+        def write_dicts():
+            writer = csv.DictWriter(io.StringIO(newline=''), fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(dict_rows)
+
+        dict_write, _ = measure_time(write_dicts)
+        slot_write, _ = measure_time(lambda: row_types.write_csv(io.StringIO(newline=''), slot_rows, fieldnames))
+
+        print(f"{base_filename:<28}{len(fieldnames):>5}"
+              f"{dict_bytes * per / 1024:>11.0f}{slot_bytes * per / 1024:>14.0f}"
+              f"{1 - slot_bytes / dict_bytes:>8.0%}"
+              f"{dict_time * 1000 * per:>8.1f} -> {slot_time * 1000 * per:<5.1f}"
+              f"{dict_write * 1000 * per:>10.1f} -> {slot_write * 1000 * per:<5.1f}")
+    print(f"\n（{row_count}行で計測し、1万行あたりに換算。メモリは行の入れ物と変換した数値）")
+
+
+if __name__ == "__main__":
+    main()
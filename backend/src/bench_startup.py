@@ -0,0 +1,95 @@
+"""
+起動時のインポート時間の計測
+
+baseball-record の各サブコマンドを、重い処理を伴わない引数（--help・引数の誤り）で -X importtime を付けた
+別のプロセスとして実行し、インポートにかかった時間の合計と時間のかかったモジュールを表示する。
+合計（インタープリタ自体の site を除く）が予算を超えたコマンドがある場合、または重いモジュール
+（requests・bs4・supabase など）を読み込んだコマンドがある場合は終了コード 1 で終了する。ネットワークにはアクセスしない。
+
+使用方法: python src/bench_startup.py [--budget MS] [--top N]
+"""
+import os
+import re
+import sys
+import subprocess
+
+# 起動時に読み込まないモジュール（実際に取得・パース・登録を行う関数の中でインポートする）
+HEAVY_MODULES = ('requests', 'urllib3', 'bs4', 'lxml', 'supabase', 'pyarrow')
+
+# 起動時のインポート時間の予算（ミリ秒）
+DEFAULT_BUDGET_MS = 60
+
+# 計測するコマンド（表示名 -> cli.py の引数）
+COMMANDS = {
+    'baseball-record --help': ['--help'],
+    'scrape --help': ['scrape', '--help'],
+    'scrape（チーム名なし）': ['scrape'],
+    'retry --help': ['retry', '--help'],
+    'load --help': ['load', '--help'],
+    'update --help': ['update', '--help'],
+}
+
+_IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure(cli_args):
+    """
+    cli.py を -X importtime 付きで実行し、最上位のインポート（モジュール名 -> 累積マイクロ秒）と
+    読み込まれた全モジュール名を返す
+    """
+    cli_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', cli_path, *cli_args],
+        capture_output=True, text=True, encoding='utf-8', errors='replace',
+    )
+    top_level = {}
+    modules = set()
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match is None:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        modules.add(name)
+        if len(indent) == 1:
+            top_level[name] = top_level.get(name, 0) + cumulative
+    return top_level, modules
+
+
+def main():
+    """メイン処理"""
+    args = sys.argv[1:]
+    budget_ms = DEFAULT_BUDGET_MS
+    top = 5
+    while args:
+        arg = args.pop(0)
+        if arg == '--budget' and args and args[0].isdigit():
+            budget_ms = int(args.pop(0))
+        elif arg == '--top' and args and args[0].isdigit():
+            top = int(args.pop(0))
+        else:
+            print("使用方法: python src/bench_startup.py [--budget MS] [--top N]")
+            sys.exit(1)
+
+    over_budget = []
+    for label, cli_args in COMMANDS.items():
+        top_level, modules = measure(cli_args)
+        site_us = top_level.pop('site', 0)
+        total_ms = sum(top_level.values()) / 1000
+        heavy = sorted(name for name in modules if name.split('.')[0] in HEAVY_MODULES and '.' not in name)
+        status = "OK" if total_ms <= budget_ms and not heavy else "超過"
+        if status != "OK":
+            over_budget.append(label)
+        print(f"{label:<28}{total_ms:>8.1f}ms（site {site_us / 1000:.1f}ms を除く） {status}")
+        for name, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:top]:
+            print(f"    {name:<32}{cumulative / 1000:>8.1f}ms")
+        if heavy:
+            print(f"    重いモジュールを読み込んでいます: {', '.join(heavy)}")
+
+    print(f"\n（予算 {budget_ms}ms。インポート時間は -X importtime の最上位のモジュールの累積時間の合計）")
+    if over_budget:
+        print(f"予算を超えたコマンド: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
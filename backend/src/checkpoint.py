@@ -0,0 +1,231 @@
+"""
+CSV出力のチェックポイント
+
+各スクリプトの出力行を、取得した順にチームごとの一時ファイルへ書き出し（メモリに溜めない）、
+最後にチーム名の順に連結して一時ファイルから出力ファイルへリネームする。
+途中で中断しても、それまでに書き出した行と完了したページのURLが残るため、--resume で続きから再開できる。
+
+    output/.checkpoint/<名前>/
+        journal.jsonl          先頭行は実行オプション（options）、以降は完了したページ
+                               （1行1件: team, url, 書き込み後の一時ファイルのサイズ）
+        <チーム名>.<種類>.csv   チームごと・出力の種類ごとの一時ファイル（ヘッダーなし）
+        complete.json          出力ファイルへの書き出しが完了した場合のみ作成（チーム・実行オプション・完了日）
+
+ジャーナルは一時ファイルへの書き込みの後に追記するため、ジャーナルに記録されたページの行は必ず一時ファイルにある。
+再開時は、最後に記録されたサイズより後ろ（ジャーナルへの記録前に中断した行）を切り捨てる。
+実行オプション（--test・--incremental など出力の内容が変わるもの）が前回と異なる場合は再開しない（CheckpointMismatch）。
+完了済みとして扱うのは、同じチーム・同じ実行オプションで同じ日に完了した場合のみ（翌週の実行などでは取得し直す）。
+"""
+import os
+import csv
+import json
+import shutil
+import threading
+from datetime import date
+
+# 出力行の型モジュール（99_utils と同じく src から読み込む）
+import row_types
+
+
+class CheckpointMismatch(ValueError):
+    """再開しようとしたチェックポイントの実行オプションが今回の実行と異なる"""
+
+
+class CsvCheckpoint:
+    """
+    チェックポイント付きのCSV出力
+
+    Args:
+        name: チェックポイント名（スクリプトごとに一意）
+        team_names: 処理するチーム名のリスト（出力ファイルでの行順）
+        outputs: {出力の種類: (出力ファイル名, 行クラス)}（行クラスは row_types）
+        output_dir: 出力ディレクトリ
+        resume: 前回中断したチェックポイントから再開するかどうか（Falseの場合は前回のものを削除する）
+        prepare_filename: 出力ファイル名を準備する関数（既存ファイルの退避。prepare_csv_filename）
+        columnar: 出力CSVと同じ値を書き出す列指向のファイルの形式（'parquet' / 'arrow'。Noneの場合は書き出さない）
+        options: 出力の内容が変わる実行オプション（JSON にできる辞書。再開時に前回と一致するか確認する）
+
+    Raises:
+        CheckpointMismatch: resume=True で、前回のジャーナルの実行オプションが options と異なる場合
+    """
+
+    def __init__(self, name, team_names, outputs, output_dir='output', resume=False, prepare_filename=None,
+                 columnar=None, options=None):
+        self.name = name
+        self.team_names = list(team_names)
+        self.options = dict(options or {})
+        self.outputs = outputs
+        self.output_dir = output_dir
+        self.prepare_filename = prepare_filename
+        self.columnar = columnar
+        self.dir = os.path.join(output_dir, '.checkpoint', name)
+        self.journal_path = os.path.join(self.dir, 'journal.jsonl')
+        self.complete_path = os.path.join(self.dir, 'complete.json')
+        self.lock = threading.Lock()
+        # URL -> チーム名（完了したページ）
+        self.completed = {}
+        # (チーム名, 出力の種類) -> 行数
+        self.counts = {}
+        self.finished = False
+        # 完了済みの場合の前回の出力 {出力の種類: 出力ファイルのパス}
+        self.previous_outputs = {}
+        self._files = {}
+        self._journal = None
+
+        if resume and self._is_complete():
+            # 今日、同じチーム・同じ実行オプションで出力ファイルの書き出しまで完了している
+            self.finished = True
+            return
+        if resume and os.path.exists(self.journal_path):
+            self._restore()
+        else:
+            # 前回の一時ファイル・ジャーナル・complete.json を削除して最初から取得する
+            shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir, exist_ok=True)
+        if os.path.exists(self.complete_path):
+            # 再開しない完了済みの記録（別の日・別のオプションで完了したもの）
+            os.remove(self.complete_path)
+        write_header = not os.path.exists(self.journal_path) or os.path.getsize(self.journal_path) == 0
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        if write_header:
+            self._journal.write(json.dumps({'options': self.options}, ensure_ascii=False) + '\n')
+            self._journal.flush()
+
+    def _is_complete(self):
+        if not os.path.exists(self.complete_path):
+            return False
+        try:
+            with open(self.complete_path, 'r', encoding='utf-8') as f:
+                complete = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (complete.get('teams') != self.team_names or complete.get('options') != self.options
+                or complete.get('date') != date.today().isoformat()):
+            return False
+        self.previous_outputs = complete.get('outputs') or {}
+        return True
+
+    def _part_path(self, team_name, kind):
+        return os.path.join(self.dir, f"{team_name}.{kind}.csv")
+
+    def _restore(self):
+        """ジャーナルから完了したページを読み込み、一時ファイルを最後に記録したサイズに切り詰める"""
+        sizes = {}
+        valid_bytes = 0
+        with open(self.journal_path, 'rb') as f:
+            header = None
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 書き込み途中で中断した行
+                    break
+                valid_bytes += len(line)
+                if header is None:
+                    header = record
+                    if header.get('options') != self.options:
+                        raise CheckpointMismatch(
+                            f"{self.name} の前回の実行オプション {header.get('options')} が今回 {self.options} と異なります"
+                        )
+                    continue
+                self.completed[record['url']] = record['team']
+                for kind, (size, count) in record['sizes'].items():
+                    sizes[(record['team'], kind)] = size
+                    self.counts[(record['team'], kind)] = count
+        with open(self.journal_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+        for team_name in self.team_names:
+            for kind in self.outputs:
+                path = self._part_path(team_name, kind)
+                if os.path.exists(path):
+                    with open(path, 'r+b') as f:
+                        f.truncate(sizes.get((team_name, kind), 0))
+
+    def _writer(self, team_name, kind):
+        key = (team_name, kind)
+        if key not in self._files:
+            f = open(self._part_path(team_name, kind), 'a', encoding='utf-8', newline='')
+            self._files[key] = (f, csv.writer(f))
+        return self._files[key]
+
+    def is_completed(self, url):
+        """前回までに（または今回）完了したページかどうか"""
+        return url in self.completed
+
+    def write(self, team_name, url, rows_by_kind):
+        """
+        1ページ分の行を一時ファイルに書き込み、ページの完了をジャーナルに記録する
+
+        Args:
+            team_name: チーム名
+            url: ページのURL（再開時に取得済みかどうかの判定に使う）
+            rows_by_kind: {出力の種類: 行のリスト}（指定のない種類は0行）
+        """
+        with self.lock:
+            sizes = {}
+            for kind in self.outputs:
+                f, writer = self._writer(team_name, kind)
+                rows = rows_by_kind.get(kind, [])
+                fieldnames = self.outputs[kind][1].fieldnames
+                writer.writerows(row_types.row_values(row, fieldnames) for row in rows)
+                f.flush()
+                count = self.counts.get((team_name, kind), 0) + len(rows)
+                self.counts[(team_name, kind)] = count
+                sizes[kind] = (f.tell(), count)
+            self._journal.write(json.dumps({'team': team_name, 'url': url, 'sizes': sizes}, ensure_ascii=False) + '\n')
+            self._journal.flush()
+            self.completed[url] = team_name
+
+    def count(self, kind, team_name=None):
+        """書き込んだ行数（team_name を省略した場合は全チームの合計）"""
+        if team_name is not None:
+            return self.counts.get((team_name, kind), 0)
+        return sum(self.counts.get((name, kind), 0) for name in self.team_names)
+
+    def finalize(self):
+        """
+        チームごとの一時ファイルをチーム名の順に連結して出力ファイルを作成する。
+        出力ディレクトリ内の一時ファイルに書き出してからリネームするため、出力ファイルが途中まで書かれた状態にはならない。
+
+        Returns:
+            {出力の種類: 出力ファイルのパス}（行がない種類はNone）
+        """
+        for f, _ in self._files.values():
+            f.close()
+        self._files = {}
+        self._journal.close()
+
+        filepaths = {}
+        for kind, (base_filename, row_class) in self.outputs.items():
+            if not self.count(kind):
+                print(f"{base_filename}: 保存するデータがありません。")
+                filepaths[kind] = None
+                continue
+            tmp_path = os.path.join(self.output_dir, f".{base_filename}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as out:
+                csv.writer(out).writerow(row_class.fieldnames)
+                for team_name in self.team_names:
+                    path = self._part_path(team_name, kind)
+                    if os.path.exists(path):
+                        with open(path, 'r', encoding='utf-8', newline='') as part:
+                            shutil.copyfileobj(part, out)
+                out.flush()
+                os.fsync(out.fileno())
+            filename = self.prepare_filename(base_filename, self.output_dir) if self.prepare_filename else base_filename
+            filepath = os.path.join(self.output_dir, filename)
+            os.replace(tmp_path, filepath)
+            print(f"\nCSVファイルを保存しました: {filepath}")
+            filepaths[kind] = filepath
+            if self.columnar:
+                columnar_path = row_types.write_columnar(filepath, row_class, self.columnar)
+                if columnar_path:
+                    print(f"列指向のファイルを保存しました: {columnar_path}")
+
+        # 一時ファイルは削除し、完了したことを記録する（--resume で再実行した場合は何もしない）
+        for name in os.listdir(self.dir):
+            os.remove(os.path.join(self.dir, name))
+        with open(self.complete_path, 'w', encoding='utf-8') as f:
+            json.dump({'teams': self.team_names, 'options': self.options, 'date': date.today().isoformat(),
+                       'outputs': filepaths}, f, ensure_ascii=False)
+        self.finished = True
+        return filepaths
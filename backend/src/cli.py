@@ -0,0 +1,96 @@
+"""
+コマンドラインインターフェース（baseball-record コマンド）
+
+    baseball-record scrape <チーム名> [<チーム名> ...] [オプション]   全スクレイピングスクリプトを実行する（00_run_all.py）
+    baseball-record retry [<チーム名> ...] [オプション]              取得に失敗したページのみ再取得する（retry_failed.py）
+    baseball-record load                                             Supabase に一括投入する（load_to_supabase.py）
+    baseball-record update                                           Supabase を差分更新する（update_supabase.py）
+
+各サブコマンドの引数はスクリプトを直接実行する場合と同じ。<サブコマンド> --help でスクリプトの説明を表示する
+（説明はスクリプトをインポートせずにソースの docstring から読むため、キャッシュ・アーカイブのディレクトリなどは作成しない）。
+サブコマンドのスクリプトは選択されたものだけを実行時にインポートするため、--help や引数の誤りでは
+requests・bs4・supabase を読み込まない。
+
+インストール: cd backend && pip install -e .（編集可能インストールが必須）
+どのディレクトリから実行しても、input/ output/ cache/ は backend 直下のものを使用する。backend の位置は
+インストールされたパッケージ（src）の場所から決めるため、通常のインストール（pip install .）では実行できない。
+"""
+import os
+import sys
+import ast
+import importlib
+import importlib.util
+
+# src ディレクトリとプロジェクトルート（backend。src の親ディレクトリ）
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+
+# サブコマンド -> (モジュール名, 説明)
+COMMANDS = {
+    'scrape': ('00_run_all', '全スクレイピングスクリプトを実行する'),
+    'retry': ('retry_failed', '取得に失敗したページのみ再取得する'),
+    'load': ('load_to_supabase', 'Supabase に初回の一括投入を行う'),
+    'update': ('update_supabase', 'Supabase を差分更新する'),
+}
+
+
+def print_usage(file=None):
+    """使用方法を表示する"""
+    file = file or sys.stdout
+    print("使用方法: baseball-record <サブコマンド> [引数...]", file=file)
+    print("\nサブコマンド:", file=file)
+    for command, (module_name, description) in COMMANDS.items():
+        print(f"  {command:<8}{description}（{module_name}.py）", file=file)
+    print("\n<サブコマンド> --help でサブコマンドの説明を表示します", file=file)
+
+
+def read_docstring(module_name):
+    """モジュールをインポートせずにソースから docstring を読む（見つからない場合は None）"""
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or not spec.origin or not os.path.isfile(spec.origin):
+        return None
+    with open(spec.origin, 'r', encoding='utf-8') as f:
+        return ast.get_docstring(ast.parse(f.read()))
+
+
+def main(argv=None):
+    """メイン処理（終了コードを返す）"""
+    args = sys.argv[1:] if argv is None else list(argv)
+    if not args or args[0] in ('-h', '--help'):
+        print_usage(sys.stdout if args else sys.stderr)
+        return 0 if args else 1
+    command = args[0]
+    if command not in COMMANDS:
+        print(f"エラー: 未知のサブコマンドです: {command}", file=sys.stderr)
+        print_usage(sys.stderr)
+        return 1
+
+    module_name, description = COMMANDS[command]
+    # スクリプトは同じディレクトリのモジュールを通常の import で読み込むため、src を sys.path の先頭に追加する
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    if args[1:] in (['-h'], ['--help']):
+        print(read_docstring(module_name) or description)
+        return 0
+    # 編集可能インストールでない場合、PROJECT_ROOT は site-packages になり input/ output/ を使用できない
+    if not os.path.isfile(os.path.join(PROJECT_ROOT, 'pyproject.toml')):
+        print(f"エラー: backend のディレクトリが見つかりません（{PROJECT_ROOT}）。"
+              "backend で pip install -e . を実行してください", file=sys.stderr)
+        return 1
+
+    module = importlib.import_module(module_name)
+    # スクリプトを直接実行した場合と同じく、sys.argv[1:] をサブコマンドの引数にする。
+    # スクリプトはプロジェクトルートで実行するため、--replay のディレクトリは移動前に絶対パスにする
+    args = args[1:]
+    if '--replay' in args:
+        idx = args.index('--replay')
+        if idx + 1 < len(args):
+            args[idx + 1] = os.path.abspath(args[idx + 1])
+    os.chdir(PROJECT_ROOT)
+    sys.argv = [f"baseball-record {command}"] + args
+    result = module.main()
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,3 +21,102 @@ TEAMS_INFO_CSV = '00_teams_info.csv'
 
 # チーム情報CSVファイルのパス
 TEAMS_INFO_CSV_PATH = os.path.join(INPUT_DIR, TEAMS_INFO_CSV)
+
+# 選手・チームの索引の保存先（入力CSVの内容が変わるまで再利用する。BASEBALL_INDEX_CACHE=0 で無効化できる）
+INDEX_CACHE_DIR = os.path.join('cache', 'index')
+INDEX_CACHE_ENABLED = os.environ.get('BASEBALL_INDEX_CACHE', '1') != '0'
+
+# 試合情報CSVファイル名（出力）
+GAME_INFO_CSV = '01_game_info.csv'
+
+# チーム成績CSVファイル名（出力）
+TEAM_STATS_CSV = '04_team_stats.csv'
+
+# 列指向の出力形式（'parquet' / 'arrow'。既定の 'none' は書き出さない）
+# BASEBALL_COLUMNAR_FORMAT で指定し、pyarrow がインストールされている場合のみ、
+# 出力CSVと同じ値を同じ名前（拡張子のみ異なる）で書き出す（pyarrow はオプションの依存関係 columnar）
+COLUMNAR_FORMAT = os.environ.get('BASEBALL_COLUMNAR_FORMAT', 'none')
+
+# 取得に失敗したページの記録ファイル（retry_failed.py で再取得する）
+DEAD_LETTER_PATH = os.path.join(OUTPUT_DIR, 'failed_urls.jsonl')
+
+# 成績を取得する最も古い年度（04_team_stats.csv がない場合に使用）
+SEASON_START_YEAR = 2016
+
+# HTTP通信設定
+# プールサイズとリトライ回数は環境変数で上書き可能
+HTTP_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# タイムアウト（秒）
+HTTP_TIMEOUT = 10
+
+# ホストごとに保持するコネクション数
+HTTP_POOL_SIZE = int(os.environ.get('BASEBALL_HTTP_POOL_SIZE', '10'))
+
+# リトライ回数（5xx / 429 / タイムアウト）
+HTTP_MAX_RETRIES = int(os.environ.get('BASEBALL_HTTP_MAX_RETRIES', '3'))
+
+# 指数バックオフの係数（0.5, 1.0, 2.0 ... 秒と待機時間が伸びる）
+HTTP_BACKOFF_FACTOR = 0.5
+
+# リトライ対象のステータスコード
+HTTP_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# HTTPキャッシュ設定
+# BASEBALL_HTTP_CACHE=0 でキャッシュを無効化できる
+HTTP_CACHE_ENABLED = os.environ.get('BASEBALL_HTTP_CACHE', '1') != '0'
+
+# キャッシュディレクトリ
+HTTP_CACHE_DIR = os.path.join('cache', 'http')
+
+# URL種別ごとの有効期間（秒）。先頭から順に評価し、最初に一致したものを使用する
+# None は不変（試合日から HTTP_CACHE_GAME_SETTLE_DAYS 日経過した試合詳細ページは再取得しない）
+# 0 は毎回 If-None-Match / If-Modified-Since で再検証する
+HTTP_CACHE_TTL_RULES = [
+    (r'/teams/[^/]+/game/[^/?]+$', None),   # 試合詳細
+    (r'/teams/[^/]+/game(\?|$)', 0),        # 試合一覧
+    (r'/teams/[^/]+/stats', 0),             # 成績
+]
+
+# どのルールにも一致しないURLの有効期間（秒）
+HTTP_CACHE_DEFAULT_TTL = 0
+
+# 試合詳細ページを不変とみなすまでの日数（試合後の成績入力・修正を待つ）
+HTTP_CACHE_GAME_SETTLE_DAYS = 14
+
+# HTMLアーカイブ設定
+# 取得したページを archive に WARC 形式で保存する（BASEBALL_HTML_ARCHIVE=0 で無効化できる）
+# 本文は HTTPキャッシュ（cache/http）と重複するため、定期実行で引き継ぐ cache の外に置く
+HTML_ARCHIVE_ENABLED = os.environ.get('BASEBALL_HTML_ARCHIVE', '1') != '0'
+
+# アーカイブディレクトリ
+HTML_ARCHIVE_DIR = 'archive'
+
+# 1セグメントファイルの最大サイズ（バイト）
+HTML_ARCHIVE_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# 並行取得設定
+# 試合詳細ページを同時に取得するワーカー数（--workers で上書き可能）
+FETCH_WORKERS = int(os.environ.get('BASEBALL_FETCH_WORKERS', '4'))
+
+# 複数チームを指定した場合に並行に処理するチーム数（--team-workers で上書き可能）
+# リクエストレートはチーム数に関わらず HTTP_RATE_PER_HOST で制限され、チームの間で公平に割り当てる
+TEAM_WORKERS = int(os.environ.get('BASEBALL_TEAM_WORKERS', '4'))
+
+# ホストごとのリクエストレート上限（トークンバケット）
+# 1秒あたりのリクエスト数と、連続して送信できる最大リクエスト数
+HTTP_RATE_PER_HOST = float(os.environ.get('BASEBALL_HTTP_RATE_PER_HOST', '2.0'))
+HTTP_RATE_BURST = 2
+
+# パースを並列に行うプロセス数（--parse-workers で上書き可能）
+# 1 の場合はプロセスプールを使わず取得スレッドでパースする。キャッシュ・リプレイ時はCPUコア数まで増やすと速くなる
+PARSE_WORKERS = int(os.environ.get('BASEBALL_PARSE_WORKERS', '1'))
+
+# HTMLパーサー設定
+# BeautifulSoup のツリービルダー（'lxml' / 'html.parser' / 'html5lib'）。--parser で上書き可能
+# 'auto' は lxml がインストールされていれば lxml、なければ html.parser を使用する
+HTML_PARSER = os.environ.get('BASEBALL_HTML_PARSER', 'auto')
+
+# 部分パース設定
+# 抽出処理が参照する領域（クラス名で指定）のみツリーに構築する（BASEBALL_PARTIAL_PARSE=0 で無効化できる）
+PARTIAL_PARSE_ENABLED = os.environ.get('BASEBALL_PARTIAL_PARSE', '1') != '0'
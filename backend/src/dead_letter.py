@@ -0,0 +1,94 @@
+"""
+取得に失敗したページの記録（デッドレター）
+
+取得に失敗したページのURLを、種類（試合詳細・試合一覧・チーム成績・年度別成績）・チーム名・エラー・
+失敗回数とともに JSON Lines のファイルに保存する。retry_failed.py はこの記録をもとに失敗したページのみを再取得し、
+既存の出力ファイルに行をマージする。取得に成功したページは記録から削除する。
+
+    {"url": ..., "kind": "game", "team": "orcas", "error": "...", "attempts": 2,
+     "first_failed_at": "2026-01-24T09:00:00", "last_failed_at": "...", "context": {"after": ...}}
+"""
+import os
+import json
+import threading
+from datetime import datetime
+
+
+class DeadLetters:
+    """
+    取得に失敗したページの記録（スレッドセーフ）。初回の参照時に読み込み、変更のたびにファイル全体を書き直す
+
+    Args:
+        path: 記録ファイルのパス（失敗したページがなくなった場合は削除する）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        # URL -> 記録（初回の参照時に読み込む）
+        self._records = None
+
+    @property
+    def records(self):
+        with self.lock:
+            if self._records is None:
+                records = {}
+                if os.path.exists(self.path):
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            line = line.strip()
+                            if line:
+                                record = json.loads(line)
+                                records[record['url']] = record
+                self._records = records
+            return self._records
+
+    def _save(self):
+        if not self.records:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in self.records.values():
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def record(self, url, kind, team_name, error, **context):
+        """
+        取得に失敗したページを記録する（記録済みの場合は失敗回数を加算する）
+
+        Args:
+            url: ページのURL
+            kind: ページの種類（'game' / 'game_list' / 'team_stats' / 'hitter_stats' / 'pitcher_stats'）
+            team_name: チーム名
+            error: エラーの内容
+            context: 再取得した行のマージに使う情報（試合の直前の試合のURL、年度など）
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.lock:
+            record = self.records.get(url)
+            if record is None:
+                record = {'url': url, 'kind': kind, 'team': team_name, 'attempts': 0, 'first_failed_at': now}
+                self.records[url] = record
+            record['error'] = error
+            record['attempts'] += 1
+            record['last_failed_at'] = now
+            record['context'] = context
+            self._save()
+
+    def discard(self, url):
+        """取得に成功したページを記録から削除する"""
+        with self.lock:
+            if self.records.pop(url, None) is not None:
+                self._save()
+
+    def list(self, kind=None, team_names=None):
+        """記録の一覧（kind・team_names を指定した場合はその種類・チームのみ）"""
+        with self.lock:
+            return [
+                dict(record) for record in self.records.values()
+                if (kind is None or record['kind'] == kind)
+                and (not team_names or record['team'] in team_names)
+            ]
@@ -0,0 +1,875 @@
+"""
+試合ページ（一覧・詳細）の共通抽出処理
+
+試合一覧 /teams/{team}/game?page=N をたどり、各試合詳細ページを1回だけ取得・パースして
+試合情報（01）・試合別打者成績（02）・試合別投手成績（03）を同時に抽出する。
+単体で実行すると3つのCSVをまとめて出力する。
+
+使用方法: python src/game_pages.py <チーム名> [<チーム名> ...] [--test] [--workers N] [--parse-workers N] [--team-workers N] [--incremental] [--resume] [--replay <dir>] [--parser NAME]
+
+--incremental を指定すると、前回出力したCSVに含まれる試合は再取得せずに前回の行を再利用する。
+一覧ページは新しい試合から順に並ぶため、全件が既知のページに到達した時点でページ送りを終了する。
+
+出力行は試合ごとに一時ファイルへ書き込み（checkpoint.py）、最後に出力ファイルへまとめる。
+--resume を指定すると、前回中断した実行で取得済みの試合は再取得せずに続きから取得する。
+"""
+import os
+import importlib
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+
+# 数字で始まるモジュール名をインポートするため、importlibを使用
+# 通常の import と同じく sys.modules に登録されるため、同一プロセスで複数のスクリプトを実行する場合（00_run_all）は
+# セッション・キャッシュを共有する
+utils = importlib.import_module("99_utils")
+get_html = utils.get_html
+record_failure = utils.record_failure
+make_soup = utils.make_soup
+make_pipeline = utils.make_pipeline
+run_for_teams = utils.run_for_teams
+open_checkpoint = utils.open_checkpoint
+print_http_stats = utils.print_http_stats
+extract_text = utils.extract_text
+extract_date = utils.extract_date
+extract_start_time = utils.extract_start_time
+parse_command_line_args = utils.parse_command_line_args
+load_player_lookup = utils.load_player_lookup
+load_player_lookup_by_nickname = utils.load_player_lookup_by_nickname
+load_teams_info = utils.load_teams_info
+
+# 出力CSVファイル名
+GAME_INFO_CSV = utils.constants.GAME_INFO_CSV
+GAME_HITTER_STATS_CSV = "02_game_hitter_stats.csv"
+GAME_PITCHER_STATS_CSV = "03_game_pitcher_stats.csv"
+
+# 出力行の型（row_types。列はkeyを先頭列）
+row_types = utils.row_types
+GameInfoRow = row_types.GameInfoRow
+GameHitterStatsRow = row_types.GameHitterStatsRow
+GamePitcherStatsRow = row_types.GamePitcherStatsRow
+
+# 出力CSVの列
+GAME_INFO_FIELDNAMES = list(GameInfoRow.fieldnames)
+GAME_HITTER_STATS_FIELDNAMES = list(GameHitterStatsRow.fieldnames)
+GAME_PITCHER_STATS_FIELDNAMES = list(GamePitcherStatsRow.fieldnames)
+
+# 種別ごとに抽出処理が参照する領域（クラス名）。この領域のみツリーに構築する（make_soup の regions）
+GAME_PAGE_REGIONS = {
+    'games': ('gameInfo01', 'gameInfo02', 'place', 'score', 'result', 'scoreboard', 'gameDetailInfo01'),
+    'hitters': ('gameInfo01', 'stats_batting'),
+    'pitchers': ('gameInfo01', 'stats_pitching'),
+}
+
+# 試合一覧ページで参照する領域
+GAME_LIST_REGIONS = ('contentList',)
+
+# 抽出対象の種別
+ALL_KINDS = ('games', 'hitters', 'pitchers')
+
+
+def extract_game_id(url):
+    """game_id: url を'/'で分割したときに 'game' の次の要素"""
+    if not url:
+        return ""
+    parts = url.split("/")
+    if "game" in parts:
+        idx = parts.index("game")
+        if idx + 1 < len(parts):
+            return parts[idx + 1]
+    return ""
+
+
+def extract_inning_scores(soup, class_name):
+    """イニングスコアを抽出する"""
+    row = soup.select_one(f'tr.{class_name}')
+    if row is None:
+        return ""
+    
+    # 2番目以降の子要素を取得
+    cells = row.find_all(['td', 'th'])[1:]  # 最初の要素をスキップ
+    scores = []
+    for cell in cells:
+        score = cell.get_text(strip=True)
+        if score:  # 空白でなければ結合
+            scores.append(score)
+    
+    return "_".join(scores) if scores else ""
+
+
+def extract_game_detail(soup, detail_class):
+    """試合詳細情報を抽出する（勝ち投手、負け投手、ホームラン）"""
+    detail_elem = soup.select_one(f'.gameDetailInfo01 > .{detail_class} > .nameBlock > a')
+    if detail_elem is None:
+        return ""
+    return detail_elem.get_text(strip=True)
+
+
+def convert_player_name(nickname, team_name, player_lookup):
+    """
+    ニックネームとチーム名からplayer_nameに変換する
+    
+    Args:
+        nickname: 取得したニックネーム
+        team_name: チーム名
+        player_lookup: ${team}_${nickname} -> player_name の辞書
+    
+    Returns:
+        player_name（一致した場合）、または元のnickname（一致しない場合）
+    """
+    if not nickname:
+        return ""
+    
+    key = f"{team_name}_{nickname}"
+    return player_lookup.get(key, nickname)
+
+
+def parse_game_info(soup, url, team_name, player_lookup=None, teams_info=None):
+    """試合詳細ページ（パース済み）から試合情報を抽出する"""
+    
+    # type: .gameInfo01 .category > spanの値
+    type_elem = soup.select_one('.gameInfo01 .category > span')
+    game_type = extract_text(type_elem)
+    
+    # date: .gameInfo01 .dateの値(yyyymmdd形式)
+    date = extract_date(soup)
+    
+    # start_time: .gameInfo01 .date .timeの値
+    start_time = extract_start_time(soup)
+    
+    # place: p.place > aの値、なければp.placeの直接のテキスト
+    place_elem = soup.select_one('p.place > a')
+    place = extract_text(place_elem)
+    if not place:
+        place_elem = soup.select_one('p.place')
+        place = extract_text(place_elem)
+    
+    # top_team: .gameInfo02 > .rowの最初の子要素(divタグ)の孫要素であるspanタグの値
+    # bottom_team: .gameInfo02 > .rowの最後の子要素(divタグ)の孫要素であるspanタグの値
+    row_elem = soup.select_one('.gameInfo02 > .row')
+    top_team = ""
+    bottom_team = ""
+    if row_elem:
+        # 直接の子要素（divタグ）を取得
+        children = row_elem.find_all('div', recursive=False)
+        
+        if children:
+            # 最初の子要素（divタグ）の孫要素であるspanタグを取得
+            first_div = children[0]
+            top_team_elem = first_div.find('span')
+            top_team = extract_text(top_team_elem)
+            
+            # 最後の子要素（divタグ）の孫要素であるspanタグを取得
+            if len(children) > 1:
+                last_div = children[-1]
+                bottom_team_elem = last_div.find('span')
+                bottom_team = extract_text(bottom_team_elem)
+    
+    # top_team_score: p.scoreの最初の子要素の値
+    score_elem = soup.select_one('p.score')
+    top_team_score = ""
+    bottom_team_score = ""
+    if score_elem:
+        score_children = score_elem.find_all(recursive=False)
+        if len(score_children) >= 1:
+            top_team_score = extract_text(score_children[0])
+        if len(score_children) >= 2:
+            bottom_team_score = extract_text(score_children[-1])
+    
+    # result: p.resultの値
+    result_elem = soup.select_one('p.result')
+    result = extract_text(result_elem)
+    
+    # top_inning_score_1〜9: table.scoreboard.table tbody .topInningの子要素であるtdタグから取得
+    top_inning_row = soup.select_one('table.scoreboard.table tbody .topInning')
+    top_inning_score_1 = ""
+    top_inning_score_2 = ""
+    top_inning_score_3 = ""
+    top_inning_score_4 = ""
+    top_inning_score_5 = ""
+    top_inning_score_6 = ""
+    top_inning_score_7 = ""
+    top_inning_score_8 = ""
+    top_inning_score_9 = ""
+    
+    if top_inning_row:
+        # 子要素であるtdタグを取得
+        td_elements = top_inning_row.find_all('td', recursive=False)
+        # 2番目から10番目のtdタグを取得（インデックスは1から9）
+        top_inning_score_1 = extract_text(td_elements[1]) if len(td_elements) > 1 else ""
+        top_inning_score_2 = extract_text(td_elements[2]) if len(td_elements) > 2 else ""
+        top_inning_score_3 = extract_text(td_elements[3]) if len(td_elements) > 3 else ""
+        top_inning_score_4 = extract_text(td_elements[4]) if len(td_elements) > 4 else ""
+        top_inning_score_5 = extract_text(td_elements[5]) if len(td_elements) > 5 else ""
+        top_inning_score_6 = extract_text(td_elements[6]) if len(td_elements) > 6 else ""
+        top_inning_score_7 = extract_text(td_elements[7]) if len(td_elements) > 7 else ""
+        top_inning_score_8 = extract_text(td_elements[8]) if len(td_elements) > 8 else ""
+        top_inning_score_9 = extract_text(td_elements[9]) if len(td_elements) > 9 else ""
+    
+    # bottom_inning_score_1〜9: table.scoreboard.table tbody .bottomInningの子要素であるtdタグから取得
+    bottom_inning_row = soup.select_one('table.scoreboard.table tbody .bottomInning')
+    bottom_inning_score_1 = ""
+    bottom_inning_score_2 = ""
+    bottom_inning_score_3 = ""
+    bottom_inning_score_4 = ""
+    bottom_inning_score_5 = ""
+    bottom_inning_score_6 = ""
+    bottom_inning_score_7 = ""
+    bottom_inning_score_8 = ""
+    bottom_inning_score_9 = ""
+    
+    if bottom_inning_row:
+        # 子要素であるtdタグを取得
+        td_elements = bottom_inning_row.find_all('td', recursive=False)
+        # 2番目から10番目のtdタグを取得（インデックスは1から9）
+        bottom_inning_score_1 = extract_text(td_elements[1]) if len(td_elements) > 1 else ""
+        bottom_inning_score_2 = extract_text(td_elements[2]) if len(td_elements) > 2 else ""
+        bottom_inning_score_3 = extract_text(td_elements[3]) if len(td_elements) > 3 else ""
+        bottom_inning_score_4 = extract_text(td_elements[4]) if len(td_elements) > 4 else ""
+        bottom_inning_score_5 = extract_text(td_elements[5]) if len(td_elements) > 5 else ""
+        bottom_inning_score_6 = extract_text(td_elements[6]) if len(td_elements) > 6 else ""
+        bottom_inning_score_7 = extract_text(td_elements[7]) if len(td_elements) > 7 else ""
+        bottom_inning_score_8 = extract_text(td_elements[8]) if len(td_elements) > 8 else ""
+        bottom_inning_score_9 = extract_text(td_elements[9]) if len(td_elements) > 9 else ""
+    
+    # win_pitcher: .gameDetailInfo01 > .win > .nameBlock > aの値
+    win_pitcher_nickname = extract_game_detail(soup, 'win')
+    win_pitcher = convert_player_name(win_pitcher_nickname, team_name, player_lookup) if player_lookup else win_pitcher_nickname
+    
+    # lose_pitcher: .gameDetailInfo01 > .lose > .nameBlock > aの値
+    lose_pitcher_nickname = extract_game_detail(soup, 'lose')
+    lose_pitcher = convert_player_name(lose_pitcher_nickname, team_name, player_lookup) if player_lookup else lose_pitcher_nickname
+    
+    # save_pitcher: .gameDetailInfo01 > .save > .nameBlock > aの値
+    save_pitcher_nickname = extract_game_detail(soup, 'save')
+    save_pitcher = convert_player_name(save_pitcher_nickname, team_name, player_lookup) if player_lookup else save_pitcher_nickname
+    
+    # hr_player: .gameDetailInfo01 > .hr > .nameBlock > aの値
+    hr_player_nickname = extract_game_detail(soup, 'hr')
+    hr_player = convert_player_name(hr_player_nickname, team_name, player_lookup) if player_lookup else hr_player_nickname
+    
+    # top_or_bottom: team列のチーム名をもとに00_teams_info.csvのkeyと突合し、
+    # team_nameの値がtop_teamと同じであれば「top」、bottom_teamと同じであれば「bottom」を格納
+    top_or_bottom = ""
+    if teams_info and team_name in teams_info:
+        team_name_value = teams_info[team_name]
+        if team_name_value == top_team:
+            top_or_bottom = "top"
+        elif team_name_value == bottom_team:
+            top_or_bottom = "bottom"
+    
+    # key: ${team}_${date}_${start_time}_${game_id}
+    game_id = extract_game_id(url)
+
+    key = f"{team_name or ''}_{date or ''}_{start_time or ''}_{game_id or ''}"
+    
+    return GameInfoRow(
+        key=key,
+        team=team_name,
+        url=url,
+        type=game_type,
+        date=date,
+        start_time=start_time,
+        place=place,
+        top_or_bottom=top_or_bottom,
+        top_team=top_team,
+        top_team_score=top_team_score,
+        bottom_team=bottom_team,
+        bottom_team_score=bottom_team_score,
+        result=result,
+        top_inning_score_1=top_inning_score_1,
+        top_inning_score_2=top_inning_score_2,
+        top_inning_score_3=top_inning_score_3,
+        top_inning_score_4=top_inning_score_4,
+        top_inning_score_5=top_inning_score_5,
+        top_inning_score_6=top_inning_score_6,
+        top_inning_score_7=top_inning_score_7,
+        top_inning_score_8=top_inning_score_8,
+        top_inning_score_9=top_inning_score_9,
+        bottom_inning_score_1=bottom_inning_score_1,
+        bottom_inning_score_2=bottom_inning_score_2,
+        bottom_inning_score_3=bottom_inning_score_3,
+        bottom_inning_score_4=bottom_inning_score_4,
+        bottom_inning_score_5=bottom_inning_score_5,
+        bottom_inning_score_6=bottom_inning_score_6,
+        bottom_inning_score_7=bottom_inning_score_7,
+        bottom_inning_score_8=bottom_inning_score_8,
+        bottom_inning_score_9=bottom_inning_score_9,
+        win_pitcher=win_pitcher,
+        lose_pitcher=lose_pitcher,
+        save_pitcher=save_pitcher,
+        hr_player=hr_player,
+    )
+
+
+def calculate_inning(cell_value, translation_value):
+    """
+    イニング数を計算する
+    - cell_value: tdの値（①）
+    - translation_value: span.translation_missingの値（②）
+    - ②が「1」の場合、0.3を①に足す
+    - ②が「2」の場合、0.6を①に足す
+    - ①が「0」の場合は何もしない
+    """
+    try:
+        base_value = float(cell_value) if cell_value else 0.0
+    except (ValueError, TypeError):
+        return cell_value  # 数値に変換できない場合は元の値を返す
+    
+    # ①が「0」の場合は何もしない
+    if base_value == 0.0:
+        return cell_value
+    
+    # ②の値を確認
+    if translation_value == "1":
+        result = base_value + 0.3
+        # 整数部が変わらない場合は .0 を付ける（例: 5.3）
+        return f"{result:.1f}" if result != int(result) else f"{int(result)}.{3}"
+    elif translation_value == "2":
+        result = base_value + 0.6
+        return f"{result:.1f}" if result != int(result) else f"{int(result)}.{6}"
+    else:
+        # translation_valueがない、または想定外の値の場合は元の値
+        return cell_value
+
+
+def parse_game_hitter_stats(soup, url, team_name, player_lookup=None):
+    """
+    試合別成績ページ（パース済み）から打者成績を抽出する。
+    1試合につき、打者ごとの行（GameHitterStatsRow のリスト）を返す。
+    player: ${team}_${player_number} で 01_players_info.csv の key と突合し、
+            一致すれば player_name、一致しなければ WEB 上の表示名を用いる。
+    """
+    if player_lookup is None:
+        player_lookup = {}
+
+    # team, date, start_time: 01_get_game_info.py と同じ
+    team = team_name
+    date = extract_date(soup)
+    start_time = extract_start_time(soup)
+
+    game_id = extract_game_id(url)
+
+    # table.stats_batting.table > tbody > tr
+    table = soup.select_one('table.stats_batting.table')
+    if table is None:
+        return []
+
+    tbody = table.find('tbody')
+    if tbody is None:
+        return []
+
+    rows = tbody.find_all('tr')
+    result = []
+
+    for tr in rows:
+        tds = tr.find_all('td')
+        if len(tds) < 2:
+            continue
+
+        def cell(i, use_a=False):
+            """i は 1-indexed（1番目〜25番目）。use_a=True のときは a タグのテキストを使用。"""
+            idx = i - 1
+            if idx < 0 or idx >= len(tds):
+                return ""
+            el = tds[idx]
+            if use_a:
+                a = el.find('a')
+                return a.get_text(strip=True) if a else el.get_text(strip=True)
+            return el.get_text(strip=True)
+
+        pnum = cell(1)
+        web_display = cell(2, use_a=True)
+        lookup_key = f"{team}_{pnum}"
+        player = player_lookup.get(lookup_key, web_display)
+
+        # key: 背番号がある場合は ${team}_${date}_${start_time}_${game_id}_${player_number}
+        #      背番号がない場合は ${team}_${date}_${start_time}_${game_id}_${player}（名前がキー）
+        pnum_or_name = pnum if pnum and pnum != "-" else player
+        row_key = f"{team}_{date}_{start_time}_{game_id}_{pnum_or_name}"
+
+        row = GameHitterStatsRow(
+            key=row_key,
+            team=team,
+            url=url,
+            date=date,
+            start_time=start_time,
+            player_number=pnum,
+            player=player,
+            entry=cell(3),
+            order=cell(4),
+            position=cell(5),
+            plate_apperance=cell(6),
+            at_bat=cell(7),
+            hit=cell(8),
+            hr=cell(9),
+            rbi=cell(10),
+            run=cell(11),
+            stolen_base=cell(12),
+            double=cell(13),
+            triple=cell(14),
+            at_bat_in_scoring=cell(15),
+            hit_in_scoring=cell(16),
+            strikeout=cell(17),
+            walk=cell(18),
+            hit_by_pitch=cell(19),
+            sacrifice_bunt=cell(20),
+            sacrifice_fly=cell(21),
+            double_play=cell(22),
+            oponent_error=cell(23),
+            own_error=cell(24),
+            caught_stealing=cell(25),
+        )
+        result.append(row)
+
+    return result
+
+
+def parse_game_pitcher_stats(soup, url, team_name, player_lookup=None):
+    """
+    試合別成績ページ（パース済み）から投手成績を抽出する。
+    1試合につき、投手ごとの行（GamePitcherStatsRow のリスト）を返す。
+    player: ${team}_${player_number} で 01_players_info.csv の key と突合し、
+            一致すれば player_name、一致しなければ WEB 上の表示名を用いる。
+    """
+    if player_lookup is None:
+        player_lookup = {}
+
+    # team, date, start_time: 01_get_game_info.py と同じ
+    team = team_name
+    date = extract_date(soup)
+    start_time = extract_start_time(soup)
+
+    game_id = extract_game_id(url)
+
+    # table.stats_pitching.table > tbody > tr
+    table = soup.select_one('table.stats_pitching.table')
+    if table is None:
+        return []
+
+    tbody = table.find('tbody')
+    if tbody is None:
+        return []
+
+    rows = tbody.find_all('tr')
+    result = []
+
+    for tr in rows:
+        tds = tr.find_all('td')
+        if len(tds) < 2:
+            continue
+
+        def cell(i, use_a=False):
+            """i は 1-indexed（1番目〜17番目）。use_a=True のときは a タグのテキストを使用。"""
+            idx = i - 1
+            if idx < 0 or idx >= len(tds):
+                return ""
+            el = tds[idx]
+            if use_a:
+                a = el.find('a')
+                return a.get_text(strip=True) if a else el.get_text(strip=True)
+            return el.get_text(strip=True)
+
+        pnum = cell(1)
+        web_display = cell(2, use_a=True)
+        lookup_key = f"{team}_{pnum}"
+        player = player_lookup.get(lookup_key, web_display)
+
+        # key: 背番号がある場合は ${team}_${date}_${start_time}_${game_id}_${player_number}
+        #      背番号がない場合は ${team}_${date}_${start_time}_${game_id}_${player}（名前がキー）
+        pnum_or_name = pnum if pnum and pnum != "-" else player
+        row_key = f"{team}_{date}_{start_time}_{game_id}_{pnum_or_name}"
+
+        # inningの計算（特殊処理）
+        inning_cell = tds[3] if len(tds) > 3 else None
+        inning_base = ""
+        translation_value = ""
+        if inning_cell:
+            inning_base = inning_cell.get_text(strip=True)
+            translation_span = inning_cell.find('span', class_='translation_missing')
+            if translation_span:
+                translation_value = translation_span.get_text(strip=True)
+        inning = calculate_inning(inning_base, translation_value)
+
+        row = GamePitcherStatsRow(
+            key=row_key,
+            team=team,
+            url=url,
+            date=date,
+            start_time=start_time,
+            player_number=pnum,
+            player=player,
+            result=cell(3),
+            inning=inning,
+            pitches=cell(5),
+            runs_allowed=cell(6),
+            earned_runs=cell(7),
+            complete_game=cell(8),
+            shotout=cell(9),
+            hits_allowed=cell(10),
+            hr_allowed=cell(11),
+            strikeouts=cell(12),
+            walks_allowed=cell(13),
+            hit_batsmen=cell(14),
+            balks=cell(15),
+            wild_pitches=cell(16),
+            order=cell(17),
+        )
+        result.append(row)
+
+    return result
+
+
+def parse_game_page(html, url, team_name, player_lookup=None, player_lookup_by_nickname=None,
+                    teams_info=None, kinds=ALL_KINDS):
+    """
+    試合詳細ページのHTMLを1回だけパースし、試合情報・打者成績・投手成績を抽出する。
+
+    Args:
+        html: 試合詳細ページのHTML
+        url: 試合詳細ページのURL
+        team_name: チーム名
+        player_lookup: ${team}_${player_number} -> player_name の辞書（打者・投手成績用）
+        player_lookup_by_nickname: ${team}_${nickname} -> player_name の辞書（試合情報用）
+        teams_info: key -> team_name の辞書（試合情報用）
+        kinds: 抽出する種別（'games', 'hitters', 'pitchers' の組み合わせ）
+
+    Returns:
+        (game_info, hitter_rows, pitcher_rows) のタプル。kindsに含まれない種別は None / [] となる。
+    """
+    regions = set()
+    for kind in kinds:
+        regions.update(GAME_PAGE_REGIONS[kind])
+    soup = make_soup(html, regions=regions)
+
+    game_info = None
+    if 'games' in kinds:
+        game_info = parse_game_info(soup, url, team_name, player_lookup_by_nickname, teams_info)
+    hitter_rows = []
+    if 'hitters' in kinds:
+        hitter_rows = parse_game_hitter_stats(soup, url, team_name, player_lookup)
+    pitcher_rows = []
+    if 'pitchers' in kinds:
+        pitcher_rows = parse_game_pitcher_stats(soup, url, team_name, player_lookup)
+
+    return game_info, hitter_rows, pitcher_rows
+
+
+def scrape_game_page(url, team_name, player_lookup=None, player_lookup_by_nickname=None,
+                     teams_info=None, kinds=ALL_KINDS, max_age=None):
+    """
+    試合詳細ページを取得し、試合情報・打者成績・投手成績を抽出する（引数は parse_game_page を参照）。
+
+    Args:
+        max_age: HTTPキャッシュの有効期間（秒）の上書き（get_html を参照）
+
+    Returns:
+        (game_info, hitter_rows, pitcher_rows) のタプル。取得に失敗した場合は (None, [], [])
+    """
+    html = get_html(url, max_age=max_age)
+    if html is None:
+        return None, [], []
+    return parse_game_page(html, url, team_name, player_lookup, player_lookup_by_nickname, teams_info, kinds)
+
+
+def iter_game_urls(team_name, test_mode=False, failed_pages=None):
+    """
+    試合一覧ページをたどり、ページごとに試合詳細ページのURLのリストを返すジェネレーター。
+    テストモードの場合は page=1 の最初の1件のみ返す。
+    failed_pages にリストを指定した場合は、取得に失敗した一覧ページのURLを追加する。
+    """
+    base_url = f"https://teams.one/teams/{team_name}/game"
+    page = 1
+
+    while True:
+        url = f"{base_url}?page={page}"
+        print(f"ページ {page} を取得中: {url}")
+
+        html = get_html(url)
+        if html is None:
+            # 以降のページは retry_failed.py でこのページから取得し直す
+            record_failure(url, 'game_list', team_name, page=page)
+            if failed_pages is not None:
+                failed_pages.append(url)
+            break
+
+        soup = make_soup(html, regions=GAME_LIST_REGIONS)
+
+        # ul.contentListがなければ処理終了
+        content_list = soup.select_one('ul.contentList')
+        if content_list is None:
+            print(f"ページ {page}: ul.contentListが見つかりません。処理を終了します。")
+            break
+
+        # ul.contentList > li > aのhrefのリンク先を取得
+        links = content_list.select('li > a')
+        if not links:
+            print(f"ページ {page}: リンクが見つかりません。処理を終了します。")
+            break
+
+        print(f"ページ {page}: {len(links)}件の試合を取得します")
+
+        hrefs = []
+        for link in links:
+            href = link.get('href')
+            if not href:
+                continue
+
+            # 相対URLの場合は絶対URLに変換
+            if not href.startswith('http'):
+                href = urljoin(base_url, href)
+            hrefs.append(href)
+
+        # テストモードの場合は page=1 の最初の1件だけ処理する
+        if test_mode:
+            yield hrefs[:1]
+            print("テストモード: page=1 の最初の1件の試合明細のみ処理しました。")
+            break
+
+        yield hrefs
+        page += 1
+
+
+def load_previous_game_rows(output_dir='output'):
+    """
+    前回出力したCSV（01〜03）を読み込み、試合詳細ページのURLごとに行をまとめて返す。
+    ファイルが存在しない場合は空の辞書を返す。
+
+    Returns:
+        dict: {'games': {url: row}, 'hitters': {url: [rows]}, 'pitchers': {url: [rows]},
+               'urls': {team: [url, ...]}}（urls は前回の出力順）
+    """
+    previous = {'games': {}, 'hitters': {}, 'pitchers': {}, 'urls': {}}
+
+    def read_rows(base_filename, row_class):
+        filepath = os.path.join(output_dir, base_filename)
+        if not os.path.exists(filepath):
+            return []
+        return row_types.iter_csv(filepath, row_class)
+
+    for row in read_rows(GAME_INFO_CSV, GameInfoRow):
+        url = row.url
+        if not url:
+            continue
+        previous['games'][url] = row
+        previous['urls'].setdefault(row.team, []).append(url)
+    for row in read_rows(GAME_HITTER_STATS_CSV, GameHitterStatsRow):
+        previous['hitters'].setdefault(row.url, []).append(row)
+    for row in read_rows(GAME_PITCHER_STATS_CSV, GamePitcherStatsRow):
+        previous['pitchers'].setdefault(row.url, []).append(row)
+
+    return previous
+
+
+def is_game_settled(game_row):
+    """
+    試合が確定済み（再取得不要）かどうかを判定する。
+    結果が未入力の試合や、試合日から constants.HTTP_CACHE_GAME_SETTLE_DAYS 日以内の試合
+    （成績の入力・修正がありうる試合）は未確定とみなす。
+    """
+    if not game_row or not game_row.get('result'):
+        return False
+    try:
+        game_date = datetime.strptime(game_row.get('date', ''), '%Y%m%d')
+    except ValueError:
+        return False
+    settle_days = utils.constants.HTTP_CACHE_GAME_SETTLE_DAYS
+    return datetime.now() - game_date >= timedelta(days=settle_days)
+
+
+def scrape_all_game_pages(team_name, test_mode=False, player_lookup=None, player_lookup_by_nickname=None,
+                          teams_info=None, kinds=ALL_KINDS, previous=None, checkpoint=None, stop_early=True,
+                          failed_pages=None):
+    """
+    全ページの試合詳細ページをたどり、試合情報・打者成績・投手成績をまとめて取得する。
+    各試合詳細ページの取得・パースは1回のみ。
+
+    Args:
+        previous: load_previous_game_rows() の戻り値。指定した場合は差分取得モードとなり、
+                  確定済みの既知の試合は取得せずに前回の行を再利用する。
+                  既知の試合は、前回の出力のうち kinds のすべての出力（01〜03 のCSV）に行がある試合
+                  （確定済みかどうかは 01_game_info.csv の行で判定する。01 のみにあり 02・03 に行がない試合は取得し直す）。
+                  全件が確定済みの既知の試合であるページに到達した時点でページ送りを終了し、
+                  それより古い試合は前回の行をそのまま引き継ぐ。
+        checkpoint: open_checkpoint() の戻り値（種類は 'games' / 'hitters' / 'pitchers'）。
+                    指定した場合は行を試合ごとにチェックポイントの一時ファイルへ書き込んで戻り値には含めず、
+                    チェックポイントで完了済みの試合（--resume で再開した場合）は取得しない。
+        stop_early: 差分取得モードで、全件が確定済みの既知の試合であるページに到達した時点でページ送りを終了するかどうか
+                    （False の場合は最後のページまでたどる。retry_failed.py で途中のページから取得し直す場合）
+        failed_pages: リストを指定した場合は、取得に失敗した一覧ページのURLを追加する
+                      （途中のページで終了したかどうかの判定に使う。リプレイモードでも追加される）
+
+    Returns:
+        (games, hitter_rows, pitcher_rows) のタプル（いずれも一覧ページのリンク順。checkpoint 指定時は空）
+    """
+    games = []
+    hitter_rows = []
+    pitcher_rows = []
+
+    def emit(href, game_rows, hitters, pitchers):
+        """1試合分の行を出力する"""
+        if checkpoint is not None:
+            checkpoint.write(team_name, href, {'games': game_rows, 'hitters': hitters, 'pitchers': pitchers})
+            return
+        games.extend(game_rows)
+        hitter_rows.extend(hitters)
+        pitcher_rows.extend(pitchers)
+
+    def is_done(href):
+        """チェックポイントで完了済みの試合かどうか"""
+        return checkpoint is not None and checkpoint.is_completed(href)
+
+    def add_previous(href):
+        """前回の行を再利用する"""
+        emit(
+            href,
+            [previous['games'][href]] if 'games' in kinds and href in previous['games'] else [],
+            previous['hitters'].get(href, []) if 'hitters' in kinds else [],
+            previous['pitchers'].get(href, []) if 'pitchers' in kinds else [],
+        )
+
+    def is_known(href):
+        """前回の出力のすべての種類（kinds）に行がある試合かどうか"""
+        return href in previous['games'] and all(href in previous[kind] for kind in kinds if kind != 'games')
+
+    def needs_fetch(href):
+        if previous is None:
+            return True
+        return not is_known(href) or not is_game_settled(previous['games'].get(href))
+
+    def fetch(href):
+        if not needs_fetch(href) or is_done(href):
+            return None
+        print(f"  試合詳細を取得中: {href}")
+        # 差分取得モードで再取得する既知の試合は、キャッシュを使わず必ず再検証する
+        max_age = 0 if previous is not None and href in previous['games'] else None
+        html = get_html(href, max_age=max_age)
+        if html is None:
+            # 再取得した行は retry_failed.py で一覧ページの直前の試合の後ろに挿入する
+            record_failure(href, 'game', team_name, after=after.get(href))
+            return None
+        return html, href, team_name
+
+    seen = set()
+    reused_count = 0
+    # 試合詳細ページのURL -> 一覧ページで直前にある試合のURL（先頭の試合はNone）
+    after = {}
+    last_href = None
+
+    def write(href, result):
+        nonlocal reused_count
+        seen.add(href)
+        if is_done(href):
+            return
+        if result is None:
+            # 未取得（確定済み）または取得失敗した既知の試合は前回の行を使う
+            if previous is not None and href in previous['games']:
+                add_previous(href)
+                reused_count += 1
+            return
+        game_info, hitters, pitchers = result
+        emit(href, [game_info] if game_info else [], hitters, pitchers)
+
+    context = {
+        'player_lookup': player_lookup,
+        'player_lookup_by_nickname': player_lookup_by_nickname,
+        'teams_info': teams_info,
+        'kinds': kinds,
+    }
+    # 詳細ページを並行して取得し、パースは --parse-workers が2以上ならプロセスプールで行う。
+    # 結果はリンク順に write に渡される。取得間隔はホストごとのレートリミッターで制御する
+    with make_pipeline(parse_game_page, context=context) as pipeline:
+        for hrefs in iter_game_urls(team_name, test_mode=test_mode, failed_pages=failed_pages):
+            for href in hrefs:
+                after[href] = last_href
+                last_href = href
+            pipeline.run(hrefs, fetch, write)
+
+            if stop_early and previous is not None and hrefs and not any(needs_fetch(href) for href in hrefs):
+                print("  このページの試合はすべて取得済みです。ページ送りを終了します。")
+                break
+
+    if previous is not None and not test_mode:
+        # 今回たどらなかった古いページの試合は前回の行をそのまま引き継ぐ
+        for href in previous['urls'].get(team_name, []):
+            if href not in seen:
+                seen.add(href)
+                if is_done(href):
+                    continue
+                add_previous(href)
+                reused_count += 1
+        print(f"  差分取得: 前回の行を再利用した試合 {reused_count}件")
+
+    return games, hitter_rows, pitcher_rows
+
+
+def main():
+    """メイン処理"""
+    # コマンドライン引数を解析
+    team_names, test_mode = parse_command_line_args('src/game_pages.py', supports_test_mode=True)
+
+    print("=" * 50)
+    print("試合情報・試合別打者成績・試合別投手成績のスクレイピングを開始します")
+    print(f"チーム: {', '.join(team_names)}")
+    if test_mode:
+        if len(team_names) > 1:
+            print("モード: テストモード（各チームについてpage=1の最初の1件の試合明細ずつ）")
+        else:
+            print("モード: テストモード（page=1 の最初の1件の試合明細のみ）")
+    print("=" * 50)
+
+    # プレイヤー情報・チーム情報を読み込む
+    player_lookup = load_player_lookup()
+    player_lookup_by_nickname = load_player_lookup_by_nickname()
+    teams_info = load_teams_info()
+
+    # 差分取得モードの場合は前回の出力を読み込む（出力時にリネームされる前に読む）
+    previous = None
+    if utils.RUN_OPTIONS['incremental']:
+        previous = load_previous_game_rows()
+        print(f"差分取得モード: 前回の出力から {len(previous['games'])}件の試合を読み込みました")
+
+    # 出力行は試合ごとにチェックポイントの一時ファイルへ書き込み、最後に出力ファイルにまとめる
+    checkpoint = open_checkpoint('game_pages', team_names, {
+        'games': (GAME_INFO_CSV, GameInfoRow),
+        'hitters': (GAME_HITTER_STATS_CSV, GameHitterStatsRow),
+        'pitchers': (GAME_PITCHER_STATS_CSV, GamePitcherStatsRow),
+    })
+    if checkpoint.finished:
+        return
+
+    def scrape_team(team_name):
+        print(f"\n--- {team_name} のデータを取得中 ---")
+        scrape_all_game_pages(
+            team_name, test_mode=test_mode, player_lookup=player_lookup,
+            player_lookup_by_nickname=player_lookup_by_nickname, teams_info=teams_info,
+            previous=previous, checkpoint=checkpoint)
+        print(f"{team_name}: 試合 {checkpoint.count('games', team_name)}件, "
+              f"打者成績 {checkpoint.count('hitters', team_name)}件, "
+              f"投手成績 {checkpoint.count('pitchers', team_name)}件を取得しました")
+
+    # 複数チームは並行に取得する（出力の行順はチーム名の指定順）
+    run_for_teams(team_names, scrape_team)
+
+    # HTTP通信の統計情報を表示
+    print()
+    print_http_stats()
+
+    if not checkpoint.count('games'):
+        print("\n試合データが取得できませんでした。")
+        return
+
+    print(f"\n合計: 試合 {checkpoint.count('games')}件, 打者成績 {checkpoint.count('hitters')}件, "
+          f"投手成績 {checkpoint.count('pitchers')}件")
+
+    filepaths = checkpoint.finalize()
+
+    print("\n" + "=" * 50)
+    print("処理が完了しました！")
+    for filepath in filepaths.values():
+        if filepath:
+            print(f"出力ファイル: {filepath}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+取得したHTMLの圧縮アーカイブ（WARC形式）
+
+get_html で取得したページを追記専用のアーカイブに保存する。パーサーの修正や列の追加時に、
+再クロールせずにローカルのHTMLを再パースしてバックフィルするために使用する。
+
+    archive/segments/pages-00000.warc.gz          レコード（1レコード = 1 gzipメンバー）
+    archive/index.jsonl                           URL・取得日時・セグメント内の位置の索引
+
+各レコードは WARC/1.0 の resource レコードで、gzipメンバーごとに独立して圧縮しているため、
+索引のオフセットからそのレコードだけを展開できる（warcio などの既存ツールでも読める）。
+同じURLの本文が前回と同じ場合は追記しない。
+
+--replay で使用するフィクスチャ用に、URLごとのHTMLファイルを並べたディレクトリ（HtmlDirectory）も扱う。
+
+    <ディレクトリ>/teams.one/teams/orcas/game%3Fpage%3D1.html
+    <ディレクトリ>/teams.one/teams/orcas/game/12345.html
+    <ディレクトリ>/teams.one/teams/orcas/stats/batters_table%3F<クエリ文字列のsha256>.html
+
+使用方法: python src/html_archive.py [--url <URL>] [--export <出力ディレクトリ>] [--dir <アーカイブディレクトリ>]
+"""
+import os
+import sys
+import gzip
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, quote
+
+import html_page
+
+
+def _payload(data):
+    """展開したWARCレコードから本文を取り出す"""
+    header, _, rest = data.partition(b"\r\n\r\n")
+    for line in header.split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b'content-length':
+            return rest[:int(value.strip())]
+    return rest[:-4]
+
+
+class HtmlArchive:
+    """
+    追記専用のHTMLアーカイブ（スレッドセーフ）
+
+    Args:
+        archive_dir: アーカイブディレクトリ
+        segment_max_bytes: 1セグメントの最大サイズ（超えると次のセグメントに切り替える）
+    """
+
+    def __init__(self, archive_dir, segment_max_bytes=64 * 1024 * 1024):
+        self.archive_dir = archive_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.index_path = os.path.join(archive_dir, 'index.jsonl')
+        self.lock = threading.Lock()
+        # URL -> 索引レコードのリスト（取得日時順）
+        self._index = None
+        # 追記先のセグメント名
+        self._segment = None
+
+    def _segment_path(self, segment):
+        return os.path.join(self.archive_dir, 'segments', segment)
+
+    def _load_index(self):
+        """索引を読み込む（初回のみ）"""
+        if self._index is not None:
+            return self._index
+        index = {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 書き込み途中で中断された行は無視する
+                        continue
+                    index.setdefault(record['url'], []).append(record)
+        except OSError:
+            pass
+        self._index = index
+        return index
+
+    def _current_segment(self):
+        """追記先のセグメント名を返す"""
+        segments_dir = os.path.join(self.archive_dir, 'segments')
+        os.makedirs(segments_dir, exist_ok=True)
+        segments = sorted(name for name in os.listdir(segments_dir) if name.endswith('.warc.gz'))
+        if segments:
+            latest = segments[-1]
+            if os.path.getsize(self._segment_path(latest)) < self.segment_max_bytes:
+                return latest
+            number = int(latest[len('pages-'):-len('.warc.gz')]) + 1
+        else:
+            number = 0
+        return f"pages-{number:05d}.warc.gz"
+
+    def append(self, url, content, encoding, digest=None):
+        """
+        ページを追記し、索引レコードを返す。本文が前回と同じ場合は追記せずに前回のレコードを返す。
+
+        Args:
+            url: URL
+            content: 本文（bytes）
+            encoding: 本文の文字コード
+            digest: 本文のsha256（計算済みの場合）
+        """
+        import uuid
+
+        if digest is None:
+            digest = hashlib.sha256(content).hexdigest()
+
+        with self.lock:
+            index = self._load_index()
+            records = index.get(url)
+            if records and records[-1]['sha256'] == digest:
+                return records[-1]
+
+            now = datetime.now(timezone.utc)
+            header = (
+                "WARC/1.0\r\n"
+                "WARC-Type: resource\r\n"
+                f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+                f"WARC-Date: {now.strftime('%Y-%m-%dT%H:%M:%SZ')}\r\n"
+                f"WARC-Target-URI: {url}\r\n"
+                f"WARC-Payload-Digest: sha256:{digest}\r\n"
+                f"Content-Type: text/html; charset={encoding}\r\n"
+                f"Content-Length: {len(content)}\r\n"
+                "\r\n"
+            ).encode('utf-8')
+            data = gzip.compress(header + content + b"\r\n\r\n", compresslevel=9)
+
+            if self._segment is None:
+                self._segment = self._current_segment()
+            segment = self._segment
+            with open(self._segment_path(segment), 'ab') as f:
+                offset = f.tell()
+                f.write(data)
+                if f.tell() >= self.segment_max_bytes:
+                    self._segment = None
+
+            record = {
+                'url': url,
+                'fetched_at': now.timestamp(),
+                'segment': segment,
+                'offset': offset,
+                'length': len(data),
+                'sha256': digest,
+                'encoding': encoding,
+            }
+            # セグメントへの書き込みが終わってから索引に追記する（中断時に索引が壊れたレコードを指さないように）
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            index.setdefault(url, []).append(record)
+            return record
+
+    def lookup(self, url, at=None):
+        """
+        URLの索引レコードを返す。存在しない場合はNone
+
+        Args:
+            url: URL
+            at: 取得日時（UNIX時間）。指定した場合はその時点以前で最新のレコードを返す
+        """
+        with self.lock:
+            records = self._load_index().get(url, [])
+            for record in reversed(records):
+                if at is None or record['fetched_at'] <= at:
+                    return record
+        return None
+
+    def read(self, record):
+        """索引レコードの本文（bytes）を返す"""
+        with open(self._segment_path(record['segment']), 'rb') as f:
+            f.seek(record['offset'])
+            data = f.read(record['length'])
+        return _payload(gzip.decompress(data))
+
+    def get_page(self, url, at=None):
+        """URLのページ（html_page.HtmlPage。デコードしない）を返す。アーカイブにない場合はNone"""
+        record = self.lookup(url, at=at)
+        if record is None:
+            return None
+        return html_page.HtmlPage(self.read(record), record['encoding'])
+
+    def get_html(self, url, at=None):
+        """URLのHTML（文字列）を返す。アーカイブにない場合はNone"""
+        page = self.get_page(url, at=at)
+        return page.text if page is not None else None
+
+    def urls(self):
+        """アーカイブに含まれるURLの一覧を返す"""
+        with self.lock:
+            return list(self._load_index().keys())
+
+    def iter_records(self, latest_only=True):
+        """
+        アーカイブのレコードをセグメント内の順に (索引レコード, 本文) で返す。
+
+        Args:
+            latest_only: True の場合はURLごとに最新のレコードのみ返す
+        """
+        with self.lock:
+            index = self._load_index()
+            if latest_only:
+                records = [records[-1] for records in index.values()]
+            else:
+                records = [record for records in index.values() for record in records]
+        records.sort(key=lambda r: (r['segment'], r['offset']))
+
+        handle = None
+        segment = None
+        try:
+            for record in records:
+                if record['segment'] != segment:
+                    if handle is not None:
+                        handle.close()
+                    segment = record['segment']
+                    handle = open(self._segment_path(segment), 'rb')
+                handle.seek(record['offset'])
+                yield record, _payload(gzip.decompress(handle.read(record['length'])))
+        finally:
+            if handle is not None:
+                handle.close()
+
+    def stats(self):
+        """アーカイブの統計情報（URL数・レコード数・合計サイズ）を返す"""
+        with self.lock:
+            index = self._load_index()
+            records = sum(len(r) for r in index.values())
+        size = 0
+        segments_dir = os.path.join(self.archive_dir, 'segments')
+        if os.path.isdir(segments_dir):
+            for name in os.listdir(segments_dir):
+                size += os.path.getsize(os.path.join(segments_dir, name))
+        return {'urls': len(index), 'records': records, 'bytes': size}
+
+
+def url_to_relpath(url):
+    """
+    URLをフィクスチャディレクトリ内の相対パスに変換する。
+    クエリ文字列はファイル名にエスケープして含める（長い場合はクエリ文字列のsha256の先頭16文字）。
+    """
+    parts = urlsplit(url)
+    path = parts.path.strip('/') or 'index'
+    if parts.query:
+        query = quote('?' + parts.query, safe='')
+        if len(query) > 100:
+            query = '%3F' + hashlib.sha256(parts.query.encode('utf-8')).hexdigest()[:16]
+        path += query
+    return os.path.join(parts.netloc, *path.split('/')) + '.html'
+
+
+class HtmlDirectory:
+    """
+    URLごとのHTMLファイルを並べたディレクトリ（--replay 用のフィクスチャ）
+
+    Args:
+        root_dir: ディレクトリ
+        encoding: HTMLファイルの文字コード
+    """
+
+    def __init__(self, root_dir, encoding='utf-8'):
+        self.root_dir = root_dir
+        self.encoding = encoding
+
+    def get_page(self, url, at=None):
+        """URLのページ（html_page.HtmlPage。デコードしない）を返す。ファイルがない場合はNone"""
+        try:
+            with open(os.path.join(self.root_dir, url_to_relpath(url)), 'rb') as f:
+                return html_page.HtmlPage(f.read(), self.encoding)
+        except OSError:
+            return None
+
+    def get_html(self, url, at=None):
+        """URLのHTML（文字列）を返す。ファイルがない場合はNone"""
+        page = self.get_page(url, at=at)
+        return page.text if page is not None else None
+
+
+def open_store(path):
+    """
+    ディレクトリをページの取得元として開く。
+    index.jsonl があればアーカイブ（HtmlArchive）、なければフィクスチャ（HtmlDirectory）として扱う。
+    """
+    if os.path.exists(os.path.join(path, 'index.jsonl')):
+        return HtmlArchive(path)
+    return HtmlDirectory(path)
+
+
+def export_directory(archive, output_dir):
+    """アーカイブの各URLの最新のページをフィクスチャディレクトリに書き出し、件数を返す"""
+    count = 0
+    for record, content in archive.iter_records():
+        path = os.path.join(output_dir, url_to_relpath(record['url']))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content.decode(record['encoding'], errors='replace').encode('utf-8'))
+        count += 1
+    return count
+
+
+def main():
+    """
+    アーカイブの統計情報を表示する
+    （--url を指定した場合はそのページのHTMLを出力し、--export を指定した場合はフィクスチャディレクトリに書き出す）
+    """
+    args = sys.argv[1:]
+    archive_dir = None
+    url = None
+    export_dir = None
+    while args:
+        arg = args.pop(0)
+        if arg == '--dir' and args:
+            archive_dir = args.pop(0)
+        elif arg == '--url' and args:
+            url = args.pop(0)
+        elif arg == '--export' and args:
+            export_dir = args.pop(0)
+        else:
+            print("使用方法: python src/html_archive.py [--url <URL>] [--export <出力ディレクトリ>] [--dir <アーカイブディレクトリ>]")
+            sys.exit(1)
+
+    if archive_dir is None:
+        import constants
+        archive_dir = constants.HTML_ARCHIVE_DIR
+
+    archive = HtmlArchive(archive_dir)
+    if url is not None:
+        html = archive.get_html(url)
+        if html is None:
+            print(f"エラー: {url} はアーカイブにありません")
+            sys.exit(1)
+        print(html)
+        return
+
+    if export_dir is not None:
+        count = export_directory(archive, export_dir)
+        print(f"{count}件のページを {export_dir} に書き出しました")
+        return
+
+    stats = archive.stats()
+    print(f"アーカイブ: {archive_dir}")
+    print(f"URL数: {stats['urls']}件, レコード数: {stats['records']}件, サイズ: {stats['bytes'] / 1024 / 1024:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
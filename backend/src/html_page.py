@@ -0,0 +1,139 @@
+"""
+取得したページの本文（bytes）と文字コード
+
+get_html は本文をデコードせずに HtmlPage（本文の bytes と文字コード）で返し、make_soup は bytes のまま
+パーサーに渡す（デコードはパーサーが1回だけ行う）。文字列が必要な場合のみ HtmlPage.text でデコードする。
+
+文字コードは次の順に決める（本文全体を走査する文字コードの推定は、いずれでも決まらない場合のみ行う）。
+
+    1. Content-Type ヘッダーの charset
+    2. 本文の先頭の <meta charset="..."> / <meta http-equiv="Content-Type" content="...; charset=...">
+    3. 同じURLパターン（ホストと、数字を除いたパス）のページで前回決まった文字コード
+    4. 本文からの推定（requests の apparent_encoding と同じ charset_normalizer / chardet）
+
+1〜4 で決まった文字コードはURLパターンごとに記憶する（試合詳細ページなどは同じパターンになる）。
+"""
+import re
+import codecs
+import threading
+from urllib.parse import urlsplit
+
+# <meta> を探す本文の先頭のバイト数
+META_SCAN_BYTES = 4096
+
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([^"\';\s]+)', re.IGNORECASE)
+_META_CHARSET = re.compile(rb'<meta[^>]*?charset\s*=\s*["\']?\s*([A-Za-z0-9_.:\-]+)', re.IGNORECASE)
+_DIGITS = re.compile(r'\d+')
+
+
+class HtmlPage:
+    """
+    ページの本文（bytes）と文字コード
+
+    Args:
+        content: 本文
+        encoding: 本文の文字コード（normalize_encoding で正規化する。不明な文字コードの場合は None）
+    """
+
+    __slots__ = ('content', 'encoding', '_text')
+
+    def __init__(self, content, encoding):
+        self.content = content
+        self.encoding = normalize_encoding(encoding)
+        self._text = None
+
+    @property
+    def text(self):
+        """本文の文字列（初回の参照時にデコードする。文字コードが不明な場合は UTF-8）"""
+        if self._text is None:
+            self._text = self.content.decode(self.encoding or 'utf-8', errors='replace')
+        return self._text
+
+    def __len__(self):
+        return len(self.content)
+
+    def __repr__(self):
+        return f"HtmlPage({len(self.content)} bytes, encoding={self.encoding!r})"
+
+
+def normalize_encoding(name):
+    """
+    文字コード名を正規化する（不明な文字コードの場合は None）。
+    lxml（libxml2）は Python のコーデック名（euc_jp・utf_8 など）を受け付けないため、
+    コーデック名の _ を - にした名前（euc-jp・utf-8・iso-2022-jp など）にする
+    """
+    if not name:
+        return None
+    try:
+        codec = codecs.lookup(name.strip()).name
+    except LookupError:
+        return None
+    label = codec.replace('_', '-')
+    if label.startswith('iso2022-'):
+        label = 'iso-2022-' + label[len('iso2022-'):]
+    return label
+
+
+def charset_from_headers(headers):
+    """Content-Type ヘッダーの charset を返す（指定がない場合は None。requests の ISO-8859-1 の既定値は使わない）"""
+    content_type = (headers or {}).get('Content-Type') or ''
+    match = _HEADER_CHARSET.search(content_type)
+    return normalize_encoding(match.group(1)) if match else None
+
+
+def charset_from_meta(content):
+    """本文の先頭の <meta> で宣言された charset を返す（宣言がない場合は None）"""
+    match = _META_CHARSET.search(content, 0, META_SCAN_BYTES)
+    return normalize_encoding(match.group(1).decode('ascii')) if match else None
+
+
+def sniff_encoding(content):
+    """本文全体から文字コードを推定する（requests の apparent_encoding と同じ処理）"""
+    from requests.compat import chardet
+
+    if chardet is None:
+        return 'utf-8'
+    return normalize_encoding(chardet.detect(content)['encoding']) or 'utf-8'
+
+
+def url_pattern(url):
+    """文字コードを記憶する単位（ホストと、数字を # に置き換えたパス）"""
+    parts = urlsplit(url)
+    return parts.netloc + _DIGITS.sub('#', parts.path)
+
+
+class EncodingDetector:
+    """
+    ページの文字コードを決め、URLパターンごとに記憶する（スレッドセーフ）
+
+    stats には文字コードを決めた方法ごとの件数（header / meta / pattern / sniff）を数える。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_pattern = {}
+        self.stats = {'header': 0, 'meta': 0, 'pattern': 0, 'sniff': 0}
+
+    def detect(self, url, content, headers=None):
+        """ページの文字コードを返す"""
+        pattern = url_pattern(url)
+        encoding = charset_from_headers(headers)
+        source = 'header'
+        if encoding is None:
+            encoding = charset_from_meta(content)
+            source = 'meta'
+        if encoding is None:
+            with self.lock:
+                encoding = self.by_pattern.get(pattern)
+            source = 'pattern'
+        if encoding is None:
+            encoding = sniff_encoding(content)
+            source = 'sniff'
+        with self.lock:
+            self.by_pattern[pattern] = encoding
+            self.stats[source] += 1
+        return encoding
+
+    def page(self, url, content, headers=None):
+        """本文の文字コードを決めて HtmlPage を返す"""
+        return HtmlPage(content, self.detect(url, content, headers))
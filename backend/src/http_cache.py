@@ -0,0 +1,171 @@
+"""
+HTTPレスポンスのディスクキャッシュ
+
+URLごとのメタデータ（ETag / Last-Modified / 取得日時）と、
+gzip圧縮した本文をコンテンツハッシュで保存する。
+
+    cache/http/urls/ab/<URLのsha256>.json     メタデータ
+    cache/http/bodies/cd/<本文のsha256>.gz    本文（同一内容は1ファイルのみ）
+"""
+import os
+import re
+import gzip
+import json
+import time
+import hashlib
+from datetime import datetime, timedelta
+
+
+def _sha256(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def _atomic_write(path, data):
+    """一時ファイルに書き込んでからリネームする（並行実行・中断時の破損防止）"""
+    import tempfile
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _game_date_from_body(body):
+    """試合詳細ページの本文から試合日（.gameInfo01 .date）を取得する"""
+    text = body.decode('utf-8', errors='ignore') if isinstance(body, bytes) else body
+    idx = text.find('gameInfo01')
+    if idx < 0:
+        return None
+    match = re.search(r'(\d{4})/(\d{1,2})/(\d{1,2})', text[idx:idx + 2000])
+    if match is None:
+        return None
+    try:
+        return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+
+
+class HttpCache:
+    """
+    URLをキーにしたディスクキャッシュ。
+
+    Args:
+        cache_dir: キャッシュディレクトリ
+        ttl_rules: (URLパターン, 有効期間（秒）) のリスト。None は不変
+        default_ttl: どのルールにも一致しない場合の有効期間（秒）
+        settle_days: 不変ルールのページを不変とみなすまでの試合日からの日数
+    """
+
+    def __init__(self, cache_dir, ttl_rules=(), default_ttl=0, settle_days=14):
+        self.cache_dir = cache_dir
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in ttl_rules]
+        self.default_ttl = default_ttl
+        self.settle_days = settle_days
+
+    def _meta_path(self, url):
+        digest = _sha256(url)
+        return os.path.join(self.cache_dir, 'urls', digest[:2], f"{digest}.json")
+
+    def _body_path(self, body_hash):
+        return os.path.join(self.cache_dir, 'bodies', body_hash[:2], f"{body_hash}.gz")
+
+    def ttl_for(self, url):
+        """URLに対応する有効期間（秒）を返す。None は不変"""
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def lookup(self, url):
+        """キャッシュエントリ（メタデータ）を返す。存在しない場合はNone"""
+        path = self._meta_path(url)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url or not os.path.exists(self._body_path(entry.get('body', ''))):
+            return None
+        return entry
+
+    def is_fresh(self, entry, max_age=None):
+        """
+        エントリが再検証なしで使用できるかどうかを返す。
+
+        Args:
+            entry: lookup() の戻り値
+            max_age: 有効期間（秒）の上書き。0 を指定すると常に再検証する
+        """
+        ttl = self.ttl_for(entry['url']) if max_age is None else max_age
+        if ttl is None:
+            return bool(entry.get('settled'))
+        return time.time() - entry.get('fetched_at', 0) < ttl
+
+    def conditional_headers(self, entry):
+        """条件付きGET用のリクエストヘッダーを返す"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read_body(self, entry):
+        """エントリの本文（bytes）を返す"""
+        with gzip.open(self._body_path(entry['body']), 'rb') as f:
+            return f.read()
+
+    def _is_settled(self, url, content):
+        """不変ルールのページについて、試合日から一定日数が経過しているかを判定する"""
+        if self.ttl_for(url) is not None:
+            return False
+        game_date = _game_date_from_body(content)
+        if game_date is None:
+            return False
+        return datetime.now() - game_date >= timedelta(days=self.settle_days)
+
+    def store(self, url, content, encoding, headers):
+        """
+        レスポンスを保存し、保存したエントリを返す。
+
+        Args:
+            url: URL
+            content: 本文（bytes）
+            encoding: 本文の文字コード
+            headers: レスポンスヘッダー
+        """
+        body_hash = _sha256(content)
+        body_path = self._body_path(body_hash)
+        if not os.path.exists(body_path):
+            _atomic_write(body_path, gzip.compress(content))
+
+        entry = {
+            'url': url,
+            'body': body_hash,
+            'encoding': encoding,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'settled': self._is_settled(url, content),
+        }
+        self._write_meta(url, entry)
+        return entry
+
+    def touch(self, entry):
+        """304応答を受けた際に取得日時を更新する"""
+        settled = entry.get('settled') or self._is_settled(entry['url'], self.read_body(entry))
+        entry = dict(entry, fetched_at=time.time(), settled=settled)
+        self._write_meta(entry['url'], entry)
+        return entry
+
+    def _write_meta(self, url, entry):
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        _atomic_write(self._meta_path(url), data)
@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
 """
 CSV を読み込み、Supabase の野球記録テーブルに投入するスクリプト。
+投入した行は同期済みの行の記録（cache/supabase_sync/。sync_manifest.py）に保存し、
+以降の update_supabase.py では内容が変わった行のみ送信する。
+バッチは payload のバイト数と応答時間で大きさを調整し、テーブルごと・テーブル内の複数のバッチを並行に送信する（batch_upload.py）。
+
+トランザクションテーブルはステージングテーブルに投入し、すべて投入できてから DB 関数で1つのトランザクションで入れ替える
+（ddl/staging_swap.sql）。投入中もフロントエンドからは前回の内容が読め、途中で失敗した場合は公開中のテーブルを変更しない。
 
 実行時カレントディレクトリはどこでも可（スクリプト配置から backend を基準にパス解決）。
 .env はプロジェクトルートまたは backend に SUPABASE_URL と SUPABASE_SERVICE_KEY を設定すること。
@@ -8,271 +14,113 @@ CSV を読み込み、Supabase の野球記録テーブルに投入するスク
 
 from __future__ import annotations
 
-import csv
 import os
 import sys
+from collections import Counter
 from datetime import datetime, timezone
 from pathlib import Path
 
-from dotenv import load_dotenv
-from supabase import create_client
+import batch_upload
+import supabase_tables
+import sync_manifest
 
 # backend ディレクトリ = このスクリプトの親の親（backend/src/load_to_supabase.py → backend）
 BACKEND_DIR = Path(__file__).resolve().parent.parent
-INPUT_DIR = BACKEND_DIR / "input"
-OUTPUT_DIR = BACKEND_DIR / "output"
-BATCH_SIZE = 500
-
-# テーブル名 -> (CSV パス, 整数カラム, 小数カラム)
-# 実際のCSVヘッダーに準拠（plate_apperance, oponent_error, shotout 等）
-LOAD_CONFIG = [
-    ("master_teams_info", INPUT_DIR / "00_teams_info.csv", [], []),
-    ("master_players_info", INPUT_DIR / "01_players_info.csv", ["player_number"], []),
-    (
-        "transaction_game_info",
-        OUTPUT_DIR / "01_game_info.csv",
-        [
-            "top_team_score",
-            "bottom_team_score",
-            "top_inning_score_1",
-            "top_inning_score_2",
-            "top_inning_score_3",
-            "top_inning_score_4",
-            "top_inning_score_5",
-            "top_inning_score_6",
-            "top_inning_score_7",
-            "top_inning_score_8",
-            "top_inning_score_9",
-            "bottom_inning_score_1",
-            "bottom_inning_score_2",
-            "bottom_inning_score_3",
-            "bottom_inning_score_4",
-            "bottom_inning_score_5",
-            "bottom_inning_score_6",
-            "bottom_inning_score_7",
-            "bottom_inning_score_8",
-            "bottom_inning_score_9",
-        ],
-        [],
-    ),
-    (
-        "transaction_game_hitter_stats",
-        OUTPUT_DIR / "02_game_hitter_stats.csv",
-        [
-            "player_number",
-            "order",
-            "plate_apperance",
-            "at_bat",
-            "hit",
-            "hr",
-            "rbi",
-            "run",
-            "stolen_base",
-            "double",
-            "triple",
-            "at_bat_in_scoring",
-            "hit_in_scoring",
-            "strikeout",
-            "walk",
-            "hit_by_pitch",
-            "sacrifice_bunt",
-            "sacrifice_fly",
-            "double_play",
-            "oponent_error",
-            "own_error",
-            "caught_stealing",
-        ],
-        [],
-    ),
-    (
-        "transaction_game_pitcher_stats",
-        OUTPUT_DIR / "03_game_pitcher_stats.csv",
-        [
-            "player_number",
-            "pitches",
-            "runs_allowed",
-            "earned_runs",
-            "hits_allowed",
-            "hr_allowed",
-            "strikeouts",
-            "walks_allowed",
-            "hit_batsmen",
-            "balks",
-            "wild_pitches",
-            "order",
-        ],
-        [],
-    ),
-    (
-        "transaction_team_stats",
-        OUTPUT_DIR / "04_team_stats.csv",
-        ["year", "games", "wins", "losses", "draws", "runs_scored", "runs_allowed", "home_runs", "stolen_bases"],
-        ["winning_percentage", "batting_average", "earned_run_average"],
-    ),
-    (
-        "transaction_hitter_stats",
-        OUTPUT_DIR / "05_hitter_stats.csv",
-        [
-            "year",
-            "player_number",
-            "games_played",
-            "plate_appearance",
-            "at_bats",
-            "hit",
-            "hr",
-            "rbi",
-            "run",
-            "stolen_base",
-            "double",
-            "triple",
-            "total_bases",
-            "strikeout",
-            "walk",
-            "hit_by_pitch",
-            "sacrifice_bunt",
-            "sacrifice_fly",
-            "double_play",
-            "opponent_error",
-            "own_error",
-            "caught_stealing",
-        ],
-        ["batting_average", "on_base_percentage", "slugging_percentage", "average_in_scoring", "ops"],
-    ),
-    (
-        "transaction_pitcher_stats",
-        OUTPUT_DIR / "06_pitcher_stats.csv",
-        [
-            "year",
-            "player_number",
-            "games_played",
-            "wins",
-            "holds",
-            "saves",
-            "losses",
-            "pitches_thrown",
-            "runs_allowed",
-            "earned_runs_allowed",
-            "complete_games",
-            "shutouts",
-            "hits_allowed",
-            "home_runs_allowed",
-            "strikeouts",
-            "walks_allowed",
-            "hit_batters",
-            "balks",
-            "wild_pitches",
-        ],
-        ["win_percentage", "era", "strikeout_rate", "k_bb", "whip"],
-    ),
-]
-
-
-def _to_int(s: str | None) -> int | None:
-    if s is None or (isinstance(s, str) and s.strip() in ("", "-", ".")):
-        return None
-    try:
-        return int(float(s))
-    except (ValueError, TypeError):
-        return None
-
-
-def _to_num(s: str | None) -> float | None:
-    if s is None or (isinstance(s, str) and s.strip() in ("", "-")):
-        return None
-    t = s.strip()
-    if t == ".":
+# 同期済みの行の記録（update_supabase.py と共通）
+MANIFEST_DIR = BACKEND_DIR / "cache" / "supabase_sync"
+# ステージングテーブルの作成・投入・入れ替え・削除を行う DB 関数（ddl/staging_swap.sql）
+CREATE_STAGING_FUNCTION = "create_staging_table"
+STAGE_FUNCTION = "stage_records"
+SWAP_FUNCTION = "swap_staging_tables"
+DROP_STAGING_FUNCTION = "drop_staging_tables"
+
+# 同期するテーブル・読み込みは一括投入と差分更新で共通（supabase_tables.py）
+LOAD_CONFIG = supabase_tables.LOAD_CONFIG
+MASTER_TABLES = supabase_tables.MASTER_TABLES
+
+
+def _upsert_batched(client, table: str, records: list[dict]) -> batch_upload.UploadStats:
+    """レコードをバッチでUPSERT。削除フラグと日時を自動付与（マスターテーブル用。手動追加レコードを保護）"""
+    now = datetime.now(timezone.utc).isoformat()
+    for rec in records:
+        rec["delete_flg"] = 0
+        rec["created_dt"] = now
+        rec["updated_dt"] = now
+    return batch_upload.upload(records, lambda chunk: client.table(table).upsert(chunk).execute(), label=table)
+
+
+def _check_unique_keys(table: str, records: list[dict]) -> None:
+    """key が重複する行があればエラーにする（ステージングテーブルへの登録では重複した key の行は無視されるため）"""
+    duplicates = [key for key, count in Counter(rec.get("key") for rec in records).items() if count > 1]
+    if duplicates:
+        sample = ", ".join(str(key) for key in duplicates[:5])
+        more = " ..." if len(duplicates) > 5 else ""
+        raise ValueError(f"{table} に key が重複する行があります（{len(duplicates)} 件: {sample}{more}）")
+
+
+def _stage_batched(client, table: str, records: list[dict]) -> batch_upload.UploadStats:
+    """
+    ステージングテーブルを作り直し、レコードをバッチで登録する（トランザクションテーブル用）。
+    日時は入れ替え時に DB 側で設定する。同じ key の再送は無視されるため、タイムアウト後に再送してもよい。
+    key の重複は事前に確認し、再送なしで登録件数が送信した行数に満たない場合もエラーにする
+    """
+    _check_unique_keys(table, records)
+    client.rpc(CREATE_STAGING_FUNCTION, {"p_table": table}).execute()
+    for rec in records:
+        rec["delete_flg"] = 0
+    counts = {"staged": 0}
+
+    def on_done(chunk, response):
+        counts["staged"] += response.data or 0
+
+    stats = batch_upload.upload(
+        records,
+        lambda chunk: client.rpc(STAGE_FUNCTION, {"p_table": table, "p_records": chunk}).execute(),
+        on_done=on_done,
+        label=table,
+    )
+    # 再送したバッチは前回の送信で登録済みの行が 0 件として数えられるため、不足は再送がない場合のみ確認できる
+    if not stats.retries and counts["staged"] != len(records):
+        raise RuntimeError(f"{table} のステージングテーブルに登録できた行が {counts['staged']} / {len(records)} 件です")
+    return stats
+
+
+def _load_table(client, url: str, config: tuple) -> tuple[list[dict], batch_upload.UploadStats] | None:
+    """
+    1テーブルを投入する（batch_upload.run_tables から並行に呼び出す）。スキップした場合は None。
+    トランザクションテーブルはステージングテーブルへの投入のみ行う（入れ替えは main ですべて投入できてから）
+    """
+    table, csv_path, int_cols, num_cols = config
+    if not csv_path.exists():
+        print(f"スキップ: {csv_path} が存在しません", file=sys.stderr)
         return None
-    try:
-        return float(t)
-    except (ValueError, TypeError):
+    records = supabase_tables.read_records(csv_path, set(int_cols), set(num_cols))
+    if not records:
+        print(f"スキップ: {table} ({csv_path}) にデータ行がありません", file=sys.stderr)
         return None
+    sync_manifest.add_row_hashes(records)
+    if table in MASTER_TABLES:
+        # マスターテーブルはUPSERT（手動追加レコードを保護）
+        stats = _upsert_batched(client, table, records)
+        print(f"UPSERT: {table} {stats.rows} 件")
+        _save_manifest(url, table, records)
+    else:
+        stats = _stage_batched(client, table, records)
+        print(f"ステージング: {table} {stats.rows} 件")
+    return records, stats
 
 
-def _cell(v: str) -> str | None:
-    if v is None:
-        return None
-    s = v.strip()
-    return s if s else None
-
-
-def _row_to_record(
-    headers: list[str],
-    row: list[str],
-    int_cols: set[str],
-    num_cols: set[str],
-) -> dict:
-    out = {}
-    for i, h in enumerate(headers):
-        raw = row[i].strip() if i < len(row) else ""
-        val: str | int | float | None
-        if h in int_cols:
-            val = _to_int(raw) if raw else None
-        elif h in num_cols:
-            val = _to_num(raw) if raw else None
-        else:
-            val = _cell(raw) if raw else None
-        out[h] = val
-    return out
-
-
-def _read_csv(path: Path, int_cols: set[str], num_cols: set[str]) -> list[dict]:
-    """CSV を読み込む。key は先頭列としてCSVに含まれる想定。"""
-    records = []
-    with open(path, encoding="utf-8-sig", newline="") as f:
-        r = csv.reader(f)
-        raw_headers = next(r, None)
-        if not raw_headers:
-            return records
-        headers = [c.strip() for c in raw_headers]
-        for row in r:
-            if not row:
-                continue
-            rec = _row_to_record(headers, row, int_cols, num_cols)
-            records.append(rec)
-    return records
-
-
-# マスターテーブルは手動管理レコードが存在するため削除しない
-MASTER_TABLES = {"master_teams_info", "master_players_info"}
-
-
-def _delete_all(client, table: str) -> None:
-    """テーブルの全レコードを削除する（トランザクションテーブル専用）。"""
-    client.table(table).delete().in_("delete_flg", [0, 1]).execute()
-
-
-def _upsert_batched(client, table: str, records: list[dict]) -> int:
-    """レコードをバッチでUPSERT（マスターテーブル用）。"""
-    now = datetime.now(timezone.utc)
-    n = 0
-    for i in range(0, len(records), BATCH_SIZE):
-        chunk = records[i : i + BATCH_SIZE]
-        for rec in chunk:
-            rec["delete_flg"] = 0
-            rec["created_dt"] = now.isoformat()
-            rec["updated_dt"] = now.isoformat()
-        client.table(table).upsert(chunk).execute()
-        n += len(chunk)
-    return n
-
-
-def _insert_batched(client, table: str, records: list[dict]) -> int:
-    """レコードをバッチで投入。削除フラグと日時を自動付与。"""
-    now = datetime.now(timezone.utc)
-    n = 0
-    for i in range(0, len(records), BATCH_SIZE):
-        chunk = records[i : i + BATCH_SIZE]
-        # 各レコードに削除フラグと日時を追加
-        for rec in chunk:
-            rec["delete_flg"] = 0
-            rec["created_dt"] = now.isoformat()
-            rec["updated_dt"] = now.isoformat()
-        client.table(table).insert(chunk).execute()
-        n += len(chunk)
-    return n
+def _save_manifest(url: str, table: str, records: list[dict]) -> None:
+    """同期済みの行の記録をテーブルの全件で置き換える"""
+    manifest = sync_manifest.SyncManifest(MANIFEST_DIR / f"{table}.json", url)
+    manifest.replace(records)
+    manifest.save()
 
 
 def main() -> int:
+    # dotenv・supabase は実行時にのみインポートする（supabase は読み込みに時間がかかるため、設定を確認してから）
+    from dotenv import load_dotenv
+
     load_dotenv()
     url = os.environ.get("SUPABASE_URL", "").strip()
     key = os.environ.get("SUPABASE_SERVICE_KEY", "").strip()
@@ -280,31 +128,45 @@ def main() -> int:
         print("SUPABASE_URL と SUPABASE_SERVICE_KEY を .env に設定してください。", file=sys.stderr)
         return 1
 
+    from supabase import create_client
+
     client = create_client(url, key)
 
-    for table, csv_path, int_cols, num_cols in LOAD_CONFIG:
-        if not csv_path.exists():
-            print(f"スキップ: {csv_path} が存在しません", file=sys.stderr)
-            continue
-        int_s = set(int_cols)
-        num_s = set(num_cols)
-        records = _read_csv(csv_path, int_s, num_s)
-        if not records:
-            print(f"スキップ: {table} ({csv_path}) にデータ行がありません", file=sys.stderr)
-            continue
+    # テーブル間に依存関係はないため並行に投入する
+    results = batch_upload.run_tables(LOAD_CONFIG, lambda config: _load_table(client, url, config))
+    failed = False
+    staged = {}
+    print("テーブル別のスループット:")
+    for (table, _, _, _), result in zip(LOAD_CONFIG, results):
+        if isinstance(result, Exception):
+            print(f"エラー: {table} - {result}", file=sys.stderr)
+            failed = True
+        elif result is not None:
+            records, stats = result
+            print(batch_upload.format_throughput(table, stats))
+            if table not in MASTER_TABLES:
+                staged[table] = records
+
+    if failed:
+        # 公開中のテーブルは変更せず、ステージングテーブル（投入が途中で失敗したテーブルを含む）を削除する
+        tables = [table for table, _, _, _ in LOAD_CONFIG if table not in MASTER_TABLES]
+        try:
+            client.rpc(DROP_STAGING_FUNCTION, {"p_tables": tables}).execute()
+        except Exception as e:
+            print(f"エラー: ステージングテーブルの削除 - {e}", file=sys.stderr)
+        print("投入に失敗したため、トランザクションテーブルを入れ替えませんでした", file=sys.stderr)
+        return 1
+
+    tables = list(staged)
+    if tables:
         try:
-            if table in MASTER_TABLES:
-                # マスターテーブルはUPSERT（手動追加レコードを保護）
-                upserted = _upsert_batched(client, table, records)
-                print(f"UPSERT: {table} {upserted} 件")
-            else:
-                _delete_all(client, table)
-                print(f"削除: {table} の全レコードを削除しました")
-                inserted = _insert_batched(client, table, records)
-                print(f"投入: {table} {inserted} 件")
+            count = client.rpc(SWAP_FUNCTION, {"p_tables": tables}).execute().data or 0
         except Exception as e:
-            print(f"エラー: {table} - {e}", file=sys.stderr)
+            print(f"エラー: テーブルの入れ替え - {e}", file=sys.stderr)
             return 1
+        print(f"入れ替え: {len(tables)} テーブル {count} 件")
+        for table, records in staged.items():
+            _save_manifest(url, table, records)
 
     print("投入完了")
     return 0
@@ -0,0 +1,223 @@
+"""
+選手・チームの索引
+
+入力CSV（01_players_info.csv / 00_teams_info.csv）を1回だけ読み込み、スクリプトが使うすべてのキーの
+辞書を持つ索引（PlayerIndex / TeamIndex）を作成する。
+
+    PlayerIndex.by_number    ${team}_${player_number} -> player_name（打者・投手成績の選手名）
+    PlayerIndex.by_nickname  ${team}_${nickname} -> player_name（試合情報の勝利投手など）
+    PlayerIndex.by_name      ${team}_${player_name} -> [${team}_${player_number}, ...]（選手名からの逆引き）
+    TeamIndex.by_key         key -> team_name
+    TeamIndex.by_name        team_name -> key（チーム名からの逆引き）
+
+作成した索引は cache/index/ に pickle で保存し（辞書ではなく列ごとのリストを保存する）、次回以降はCSVを読み込まずに復元する。
+CSVの更新日時・サイズが保存時と異なる場合は内容のハッシュ（SHA-256）を比較し、内容が変わっていれば作り直す
+（git checkout などで更新日時のみ変わった場合は作り直さない）。
+"""
+import os
+import sys
+import csv
+import pickle
+import hashlib
+
+# 保存形式のバージョン（索引の辞書の構成を変えた場合に上げる）
+FORMAT_VERSION = 1
+
+
+def _read_csv_rows(csv_path):
+    """CSVの行を読み込む（列名・値の前後の空白は除く。ファイルがない場合は空）"""
+    if not os.path.exists(csv_path):
+        return
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield {k.strip(): (v or '').strip() for k, v in row.items() if k is not None}
+
+
+class PlayerIndex:
+    """
+    選手情報の索引（01_players_info.csv）
+
+    列ごとのリスト（key・チーム・選手名と、ニックネームのキー・選手名）を保持し、辞書はリストから作成する
+    （保存するのはリストのみ。選手名からの逆引きの辞書は初回の参照時に作成する）
+    """
+
+    def __init__(self, keys=(), teams=(), player_names=(), nickname_keys=(), nickname_names=()):
+        self.keys = list(keys)
+        self.teams = list(teams)
+        self.player_names = list(player_names)
+        self.nickname_keys = list(nickname_keys)
+        self.nickname_names = list(nickname_names)
+        self.by_number = dict(zip(self.keys, self.player_names))
+        self.by_nickname = dict(zip(self.nickname_keys, self.nickname_names))
+        self._by_name = None
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        """
+        選手情報CSVファイルから索引を作成する。
+
+        CSVの形式:
+        - key列がある場合: key列を直接使用
+        - key列がない場合: team列とplayer_number列からkeyを生成
+        """
+        keys, teams, player_names, nickname_keys, nickname_names = [], [], [], [], []
+        for row in _read_csv_rows(csv_path):
+            # チーム名は行ごとに同じ値のため、1つの文字列を共有する（保存するファイルも小さくなる）
+            team = sys.intern(row.get('team', ''))
+            player_name = row.get('player_name', '')
+            key = row.get('key', '')
+            if not key:
+                pnum = row.get('player_number', '')
+                if team and pnum:
+                    key = f"{team}_{pnum}"
+            if key:
+                keys.append(key)
+                teams.append(team)
+                player_names.append(player_name)
+            nickname = row.get('nickname', '')
+            if team and nickname:
+                nickname_keys.append(f"{team}_{nickname}")
+                nickname_names.append(player_name)
+        return cls(keys, teams, player_names, nickname_keys, nickname_names)
+
+    @property
+    def by_name(self):
+        """${team}_${player_name} -> [${team}_${player_number}, ...]"""
+        if self._by_name is None:
+            by_name = {}
+            for key, team, player_name in zip(self.keys, self.teams, self.player_names):
+                if team and player_name:
+                    by_name.setdefault(f"{team}_{player_name}", []).append(key)
+            self._by_name = by_name
+        return self._by_name
+
+    def player_name(self, team_name, player_number, default=''):
+        """背番号から選手名を返す"""
+        return self.by_number.get(f"{team_name}_{player_number}", default)
+
+    def player_name_by_nickname(self, team_name, nickname, default=None):
+        """ニックネーム（Webの表示名）から選手名を返す"""
+        return self.by_nickname.get(f"{team_name}_{nickname}", default)
+
+    def player_keys(self, team_name, player_name):
+        """選手名から選手の key（${team}_${player_number}）の一覧を返す（同名の選手がいる場合は複数）"""
+        return list(self.by_name.get(f"{team_name}_{player_name}", ()))
+
+    def state(self):
+        """保存する値（__init__ の引数）"""
+        return {
+            'keys': self.keys, 'teams': self.teams, 'player_names': self.player_names,
+            'nickname_keys': self.nickname_keys, 'nickname_names': self.nickname_names,
+        }
+
+
+class TeamIndex:
+    """チーム情報の索引（00_teams_info.csv）"""
+
+    def __init__(self, by_key=None, by_name=None):
+        self.by_key = by_key or {}
+        self.by_name = by_name or {}
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        """チーム情報CSVファイルから索引を作成する（key・team_name のいずれかが空の行は除く）"""
+        index = cls()
+        for row in _read_csv_rows(csv_path):
+            key = row.get('key', '')
+            team_name = row.get('team_name', '')
+            if key and team_name:
+                index.by_key[key] = team_name
+                index.by_name.setdefault(team_name, key)
+        return index
+
+    def team_name(self, key, default=None):
+        """key からチーム名を返す"""
+        return self.by_key.get(key, default)
+
+    def team_key(self, team_name, default=None):
+        """チーム名から key を返す"""
+        return self.by_name.get(team_name, default)
+
+    def state(self):
+        """保存する値（__init__ の引数）"""
+        return {'by_key': self.by_key, 'by_name': self.by_name}
+
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _cache_path(cache_dir, csv_path):
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(csv_path))[0] + '.pickle')
+
+
+def _read_cache(cache_path, index_class):
+    """
+    保存した索引を読み込む（{'stamp', 'sha256', 'index'}）。
+    ファイルがない・壊れている・保存形式や索引の種類が異なる場合は None
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['version'] != FORMAT_VERSION or cached['kind'] != index_class.__name__:
+            return None
+        cached['index'] = index_class(**cached['state'])
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError,
+            KeyError, TypeError, IndexError):
+        return None
+    return cached
+
+
+def _write_cache(cache_path, index_class, stamp, digest, index):
+    try:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'version': FORMAT_VERSION,
+                'kind': index_class.__name__,
+                'stamp': stamp,
+                'sha256': digest,
+                'state': index.state(),
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # 保存できない場合も索引はそのまま使う（次回はCSVから作り直す）
+        pass
+
+
+def load_index(index_class, csv_path, cache_dir=None):
+    """
+    CSVファイルの索引を返す（cache_dir に保存した索引が有効であれば復元し、なければ作成して保存する）
+
+    Args:
+        index_class: PlayerIndex または TeamIndex
+        csv_path: 入力CSVのパス（ファイルがない場合は空の索引。保存しない）
+        cache_dir: 索引を保存するディレクトリ（None の場合は保存しない）
+    """
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return index_class()
+    if cache_dir is None:
+        return index_class.from_csv(csv_path)
+
+    cache_path = _cache_path(cache_dir, csv_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _read_cache(cache_path, index_class)
+    digest = None
+    if cached is not None:
+        if tuple(cached['stamp']) == stamp:
+            return cached['index']
+        digest = _file_digest(csv_path)
+        if cached['sha256'] == digest:
+            # 内容は同じ（更新日時のみ変わった）。次回はハッシュを計算しないように更新日時を保存し直す
+            _write_cache(cache_path, index_class, stamp, digest, cached['index'])
+            return cached['index']
+    if digest is None:
+        digest = _file_digest(csv_path)
+
+    index = index_class.from_csv(csv_path)
+    _write_cache(cache_path, index_class, stamp, digest, index)
+    return index
@@ -0,0 +1,136 @@
+"""
+取得・パース・書き込みのパイプライン
+
+    取得（スレッド） -> パース（プロセスプール） -> 書き込み（呼び出し元のスレッド、入力順）
+
+取得はI/O待ちが中心のためスレッドで並行に行い、CPU負荷の高いパースはプロセスプールで全コアに分散する。
+処理中の件数を上限（max_pending）までに制限するため、取得が先行してもHTMLや結果がメモリに溜まらない
+（上限に達すると先頭の結果が書き込まれるまで次の取得を始めない）。
+
+パース関数はモジュールの最上位に定義した関数とし、プロセスプールの各ワーカーはその関数のファイルを
+読み込み直して呼び出す（数字で始まるスクリプトも importlib で読み込むため、関数そのものは送らない）。
+ワーカーからはこのモジュールを通常の import で読み込むため（99_utils も pipeline として import する）、
+プロセスプールの起動時に src ディレクトリを sys.path に追加する。
+"""
+import os
+import sys
+import importlib.util
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+
+
+# プロセスプールのワーカー内で読み込んだモジュールとパース関数の共通引数
+_worker_module = None
+_worker_context = None
+
+
+def _init_worker(module_path, context, run_options):
+    """プロセスプールのワーカーを初期化する（パース関数のモジュールを読み込む）"""
+    global _worker_module, _worker_context
+    name = os.path.splitext(os.path.basename(module_path))[0]
+    spec = importlib.util.spec_from_file_location(name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # パーサーなどの実行時オプションを親プロセスと揃える
+    module.utils.RUN_OPTIONS.update(run_options)
+    _worker_module = module
+    _worker_context = context
+
+
+def _call_in_worker(func_name, args):
+    """プロセスプールのワーカーでパース関数を呼び出す"""
+    return getattr(_worker_module, func_name)(*args, **_worker_context)
+
+
+class Pipeline:
+    """
+    取得・パース・書き込みのパイプライン。with 文で使用し、終了時にプールを閉じる。
+
+    Args:
+        parse: パース関数（モジュールの最上位の関数。parse(*fetchの戻り値, **context) で呼ばれる）
+        context: パース関数に毎回渡すキーワード引数（選手辞書など。ワーカーには起動時に1回だけ送る）
+        fetch_workers: 取得のスレッド数
+        parse_workers: パースのプロセス数（1以下の場合はプロセスプールを使わず取得スレッドでパースする）
+        max_pending: 同時に処理中にする件数の上限（省略時は取得・パースのワーカー数の合計の2倍）
+    """
+
+    def __init__(self, parse, context=None, fetch_workers=1, parse_workers=1, max_pending=None):
+        self.parse = parse
+        self.context = context or {}
+        self.fetch_workers = max(1, fetch_workers)
+        self.parse_workers = parse_workers
+        self.max_pending = max_pending or 2 * (self.fetch_workers + max(1, parse_workers))
+        self._fetch_pool = None
+        self._parse_pool = None
+
+    def __enter__(self):
+        self._fetch_pool = ThreadPoolExecutor(max_workers=self.fetch_workers)
+        if self.parse_workers > 1:
+            # プロセスプールを使う場合のみインポートする（起動時間の短縮）
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # ワーカーが _init_worker / _call_in_worker を pipeline モジュールとして import できるようにする
+            # （spawn の子プロセスは親の sys.path を引き継ぐ）
+            src_dir = os.path.dirname(os.path.abspath(__file__))
+            if src_dir not in sys.path:
+                sys.path.append(src_dir)
+            module = self.parse.__globals__
+            run_options = {
+                key: module['utils'].RUN_OPTIONS[key] for key in ('parser', 'partial_parse')
+            } if 'utils' in module else {}
+            # 取得スレッドの動作中に fork すると子プロセスの状態が不定になるため spawn を使う
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(module['__file__'], self.context, run_options),
+            )
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._fetch_pool.shutdown(wait=True, cancel_futures=exc_type is not None)
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=True, cancel_futures=exc_type is not None)
+        return False
+
+    def _stage(self, fetch, item):
+        """取得スレッドで実行する処理（取得してパースを開始する）"""
+        args = fetch(item)
+        if args is None:
+            return None
+        if self._parse_pool is None:
+            return self.parse(*args, **self.context)
+        return self._parse_pool.submit(_call_in_worker, self.parse.__name__, args)
+
+    def run(self, items, fetch, write):
+        """
+        items の各要素を取得・パースし、結果を入力順に書き込む。
+
+        Args:
+            items: 入力（リストまたはイテレーター。順に読み出す）
+            fetch: fetch(item) -> パース関数の位置引数のタプル（Noneの場合はパースしない）
+            write: write(item, result) 入力順に呼ばれる（fetchがNoneを返した場合は result=None）
+        """
+        pending = deque()
+        items = iter(items)
+        exhausted = False
+        while True:
+            # 処理中の件数が上限に達するまで取得を始める（バックプレッシャー）
+            while not exhausted and len(pending) < self.max_pending:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                # 呼び出し元のコンテキスト（処理中のチーム名・出力の接頭辞など）を取得スレッドに引き継ぐ
+                context = contextvars.copy_context()
+                pending.append((item, self._fetch_pool.submit(context.run, self._stage, fetch, item)))
+            if not pending:
+                break
+            item, future = pending.popleft()
+            result = future.result()
+            if self._parse_pool is not None and result is not None:
+                result = result.result()
+            write(item, result)
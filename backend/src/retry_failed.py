@@ -0,0 +1,233 @@
+"""
+取得に失敗したページの再取得
+
+各スクリプトが取得に失敗したページ（output/failed_urls.jsonl。dead_letter.py）のみを再取得し、
+取得できた行を既存の出力ファイルにマージする。全体を取得し直さずに、一時的な障害で欠けた行を補う。
+
+    試合詳細ページ（game）         01〜03 の該当する試合の行を置き換える（新しい試合は一覧ページの直前の試合の後ろに挿入）
+    試合一覧ページ（game_list）    チームの一覧ページを最後までたどり、出力にない試合のみ取得してチームの行を置き換える
+    チーム成績ページ（team_stats）  04 のチームの行を置き換える
+    年度別成績ページ（hitter_stats / pitcher_stats）  05 / 06 のチーム・年度の行を置き換える
+
+再取得に成功したページは記録から削除し、失敗したページは失敗回数を加算して記録に残す。
+出力ファイルは一時ファイルに書き出してからリネームして置き換える（日付付きのファイルへの退避は行わない）。
+
+使用方法: python src/retry_failed.py [<チーム名> ...] [--replay <dir>] [--parser NAME]
+（チーム名を指定した場合はそのチームのページのみ再取得する）
+"""
+import os
+import sys
+import importlib
+
+# 各スクリプトの抽出処理をインポート（数字で始まるモジュール名は importlib を使用）
+import game_pages
+team_stats = importlib.import_module("04_get_team_stats")
+hitter_stats = importlib.import_module("05_get_hitter_stats")
+pitcher_stats = importlib.import_module("06_get_pitcher_stats")
+utils = game_pages.utils
+row_types = utils.row_types
+
+# 試合ページの出力（load_previous_game_rows の種類 -> (ファイル名, 行クラス)）
+GAME_OUTPUTS = {
+    'games': (game_pages.GAME_INFO_CSV, game_pages.GameInfoRow),
+    'hitters': (game_pages.GAME_HITTER_STATS_CSV, game_pages.GameHitterStatsRow),
+    'pitchers': (game_pages.GAME_PITCHER_STATS_CSV, game_pages.GamePitcherStatsRow),
+}
+
+
+def read_rows(base_filename, row_class, output_dir='output'):
+    """出力ファイルの行を読み込む（ファイルがない場合は空のリスト）"""
+    filepath = os.path.join(output_dir, base_filename)
+    if not os.path.exists(filepath):
+        return []
+    return list(row_types.iter_csv(filepath, row_class))
+
+
+def write_rows(rows, base_filename, row_class, output_dir='output'):
+    """出力ファイルを置き換える（一時ファイルに書き出してからリネームする）"""
+    os.makedirs(output_dir, exist_ok=True)
+    filepath = os.path.join(output_dir, base_filename)
+    tmp_path = os.path.join(output_dir, f".{base_filename}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        row_types.write_csv(f, rows, row_class.fieldnames)
+    os.replace(tmp_path, filepath)
+    print(f"CSVファイルを更新しました: {filepath}")
+    if utils.COLUMNAR_FORMAT:
+        columnar_path = row_types.write_columnar(filepath, row_class, utils.COLUMNAR_FORMAT)
+        if columnar_path:
+            print(f"列指向のファイルを更新しました: {columnar_path}")
+
+
+def merge_rows(base_filename, row_class, new_rows, is_replaced, insert_index):
+    """
+    出力ファイルの行のうち is_replaced(row) が真の行を new_rows で置き換える
+
+    Args:
+        row_class: 出力ファイルの行クラス（row_types）
+        is_replaced: 置き換える（削除する）行の判定関数
+        insert_index: insert_index(残りの行のリスト) -> new_rows を挿入する位置
+    """
+    rows = [row for row in read_rows(base_filename, row_class) if not is_replaced(row)]
+    index = insert_index(rows)
+    rows[index:index] = new_rows
+    write_rows(rows, base_filename, row_class)
+
+
+def _team_block(rows, team_name):
+    """チームの行の位置（先頭, 末尾の次）。チームの行がない場合は (末尾, 末尾)"""
+    indexes = [i for i, row in enumerate(rows) if row.team == team_name]
+    if not indexes:
+        return len(rows), len(rows)
+    return indexes[0], indexes[-1] + 1
+
+
+def retry_game(record, lookups):
+    """試合詳細ページを再取得し、01〜03 の試合の行を置き換える"""
+    url, team_name = record['url'], record['team']
+    html = utils.get_html(url)
+    if html is None:
+        utils.record_failure(url, 'game', team_name, **record.get('context', {}))
+        return False
+    game_info, hitters, pitchers = game_pages.parse_game_page(html, url, team_name, **lookups)
+    after = record.get('context', {}).get('after')
+
+    def insert_index(rows):
+        # 一覧ページで直前にある試合の行の後ろ（直前の試合がない場合はチームの先頭）
+        if after is not None:
+            indexes = [i for i, row in enumerate(rows) if row.url == after]
+            if indexes:
+                return indexes[-1] + 1
+        return _team_block(rows, team_name)[0]
+
+    new_rows = {'games': [game_info] if game_info else [], 'hitters': hitters, 'pitchers': pitchers}
+    for kind, (base_filename, row_class) in GAME_OUTPUTS.items():
+        merge_rows(base_filename, row_class, new_rows[kind], lambda row: row.url == url, insert_index)
+    return True
+
+
+def retry_game_list(record, lookups):
+    """
+    チームの試合一覧ページを最後までたどり直し、01〜03 のチームの行を置き換える。
+    出力にある確定済みの試合は再取得せずに行を再利用するため、取得するのは一覧ページと出力にない試合のみ
+    """
+    team_name = record['team']
+    previous = game_pages.load_previous_game_rows()
+    failed_pages = []
+    games, hitters, pitchers = game_pages.scrape_all_game_pages(
+        team_name, previous=previous, stop_early=False, failed_pages=failed_pages, **lookups
+    )
+    if failed_pages:
+        # 一覧ページを最後までたどれなかった（チームの行は置き換えない）
+        return False
+    new_rows = {'games': games, 'hitters': hitters, 'pitchers': pitchers}
+    for kind, (base_filename, row_class) in GAME_OUTPUTS.items():
+        merge_rows(base_filename, row_class, new_rows[kind],
+                   lambda row: row.team == team_name, lambda rows: _team_block(rows, team_name)[0])
+    return True
+
+
+def retry_team_stats(record):
+    """チーム成績ページを再取得し、04 のチームの行を置き換える"""
+    url, team_name = record['url'], record['team']
+    html = utils.get_html(url)
+    if html is None:
+        utils.record_failure(url, 'team_stats', team_name)
+        return False
+    rows = team_stats.parse_team_stats(html, team_name)
+    merge_rows(team_stats.TEAM_STATS_CSV, team_stats.TeamStatsRow, rows,
+               lambda row: row.team == team_name, lambda rows: _team_block(rows, team_name)[0])
+    return True
+
+
+def retry_season_stats(record, parse, base_filename, row_class, player_lookup):
+    """年度別成績ページ（05 / 06）を再取得し、チーム・年度の行を置き換える"""
+    url, team_name, kind = record['url'], record['team'], record['kind']
+    year = record['context']['year']
+    html = utils.get_html(url)
+    if html is None:
+        utils.record_failure(url, kind, team_name, year=year)
+        return False
+    rows = parse(html, team_name, year, player_lookup)
+
+    def insert_index(rows):
+        # チームの行は年度の降順に並ぶため、より古い年度の行の前（なければチームの末尾）
+        start, end = _team_block(rows, team_name)
+        for i in range(start, end):
+            if rows[i].team == team_name and rows[i].year is not None and rows[i].year < int(year):
+                return i
+        return end
+
+    merge_rows(base_filename, row_class, rows,
+               lambda row: row.team == team_name and row.year == int(year), insert_index)
+    return True
+
+
+def main():
+    """メイン処理"""
+    args = sys.argv[1:]
+    replay_dir = utils._pop_option(args, '--replay')
+    if replay_dir is not None:
+        if not os.path.isdir(replay_dir):
+            print(f"エラー: --replay に指定したディレクトリが存在しません: {replay_dir}")
+            sys.exit(1)
+        utils.set_replay_dir(replay_dir)
+    parser = utils._pop_option(args, '--parser')
+    utils.set_parser_option(parser)
+    team_names = args
+
+    records = utils.get_dead_letters().list(team_names=team_names)
+    print("=" * 50)
+    print("取得に失敗したページの再取得を開始します")
+    if team_names:
+        print(f"チーム: {', '.join(team_names)}")
+    print(f"対象: {len(records)}件（{utils.constants.DEAD_LETTER_PATH}）")
+    print("=" * 50)
+    if not records:
+        print("再取得するページはありません。")
+        return
+
+    player_lookup = utils.load_player_lookup()
+    lookups = {
+        'player_lookup': player_lookup,
+        'player_lookup_by_nickname': utils.load_player_lookup_by_nickname(),
+        'teams_info': utils.load_teams_info(),
+    }
+    handlers = {
+        'game_list': lambda record: retry_game_list(record, lookups),
+        'game': lambda record: retry_game(record, lookups),
+        'team_stats': retry_team_stats,
+        'hitter_stats': lambda record: retry_season_stats(
+            record, hitter_stats.parse_hitter_stats,
+            hitter_stats.HITTER_STATS_CSV, hitter_stats.HitterStatsRow, player_lookup),
+        'pitcher_stats': lambda record: retry_season_stats(
+            record, pitcher_stats.parse_pitcher_stats,
+            pitcher_stats.PITCHER_STATS_CSV, pitcher_stats.PitcherStatsRow, player_lookup),
+    }
+
+    succeeded = 0
+    failed = 0
+    # 一覧ページを先に処理する（たどり直した一覧ページの試合は、そこで取得されて記録から削除される）
+    for kind in handlers:
+        for record in utils.get_dead_letters().list(kind=kind, team_names=team_names):
+            if record['url'] not in utils.get_dead_letters().records:
+                continue
+            print(f"\n再取得中（{record['attempts']}回失敗, {record['error']}）: {record['url']}")
+            if handlers[kind](record):
+                utils.get_dead_letters().discard(record['url'])
+                succeeded += 1
+                print(f"  成功: {record['url']}")
+            else:
+                failed += 1
+                print(f"  失敗: {record['url']}")
+
+    print()
+    utils.print_http_stats()
+    print("\n" + "=" * 50)
+    print(f"再取得: 成功 {succeeded}件, 失敗 {failed}件")
+    if failed:
+        print(f"失敗したページは {utils.constants.DEAD_LETTER_PATH} に残っています（再度実行すると再取得します）")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+"""
+出力行の型
+
+出力CSVのスキーマごとに、列を __slots__ に持つ行クラスを定義する。スクレイピング（抽出処理）・CSVの書き込み・
+前回の出力の読み込みで共通に使い、行ごとに辞書を作らない（1行あたりのメモリが小さく、キーのハッシュ計算もない）。
+行は辞書と同じように row['列名'] / row.get('列名') で参照でき、csv.DictWriter にもそのまま渡せる。
+
+数値の列（int_fields / float_fields）は行の作成時に1回だけ型変換する（整数は int、小数は float、空欄・「-」は None）。
+数値として読めない値・小数部のある整数の列の値は None にして警告を表示する（背番号 player_number は「00」などを区別するため文字列のまま）。
+CSVには変換後の値を書き出し、pyarrow がインストールされている場合は同じ値を列指向のファイル（Parquet / Arrow IPC）にも
+書き出す（write_columnar）。投球回の列（innings_fields）は文字列のまま保持し、列指向のファイルにはアウト数の列を追加する。
+
+プロセスプールのワーカーから返した行を親プロセスで復元できるように、このモジュールは全スクリプトで
+row_types として import する（99_utils）。行クラスはこのモジュールの最上位に定義する。
+"""
+import os
+import re
+import csv
+import operator
+import itertools
+import threading
+
+# 数値に変換しない値（空欄・未記録）
+_EMPTY_VALUES = frozenset(('', '-', '.'))
+# 3桁区切りのカンマ（「1,234」）
+_THOUSANDS = re.compile(r'^[+-]?\d{1,3}(?:,\d{3})+(?:\.\d*)?$')
+
+# 警告を表示した (列名, 値)（同じ値の警告は1回のみ表示する）
+_warned = set()
+_warned_lock = threading.Lock()
+
+
+def _warn_unconvertible(value, field, kind):
+    key = (field, value)
+    with _warned_lock:
+        if key in _warned:
+            return
+        _warned.add(key)
+    column = f"列 {field} の" if field else ""
+    print(f"警告: {column}値 {value!r} は{kind}に変換できないため空欄として出力します")
+
+
+def _number_text(value):
+    """数値として解釈する文字列（空欄・「-」は None。3桁区切りのカンマは除く）"""
+    text = str(value).strip()
+    if text in _EMPTY_VALUES:
+        return None
+    if ',' in text and _THOUSANDS.match(text):
+        text = text.replace(',', '')
+    return text
+
+
+def to_int(value, field=None):
+    """
+    整数の列の値に変換する（空欄・「-」は None。「3.0」「1,234」も変換する）。
+    数値として読めない値・小数部のある値（「.667」など）は切り捨てずに None にして警告を表示する
+    """
+    if value is None or type(value) is int:
+        return value
+    text = _number_text(value)
+    if text is None:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        number = float(text)
+    except ValueError:
+        number = None
+    if number is not None and number.is_integer():
+        return int(number)
+    _warn_unconvertible(value, field, '整数')
+    return None
+
+
+def to_float(value, field=None):
+    """
+    小数の列の値に変換する（空欄・「-」は None。「.333」は 0.333、「1,234.5」は 1234.5）。
+    数値として読めない値は None にして警告を表示する
+    """
+    if value is None or type(value) is float:
+        return value
+    text = _number_text(value)
+    if text is None:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        _warn_unconvertible(value, field, '小数')
+        return None
+
+
+# 投球回の表記（試合別: 「5」「5.3」「5.6」（.3 / .6 は 1/3・2/3 回）、年度別: 「7回」「7回1/3」）
+_INNINGS_FRACTION = re.compile(r'^(\d+)回(?:([012])/3)?$')
+_INNINGS_DECIMAL = re.compile(r'^(\d+)(?:\.([036]))?$')
+
+
+def innings_to_outs(text):
+    """投球回の表記をアウト数に変換する（変換できない場合は None）"""
+    if not text:
+        return None
+    text = text.strip()
+    match = _INNINGS_FRACTION.match(text)
+    if match:
+        return int(match.group(1)) * 3 + int(match.group(2) or 0)
+    match = _INNINGS_DECIMAL.match(text)
+    if match:
+        return int(match.group(1)) * 3 + int(match.group(2) or 0) // 3
+    return None
+
+
+class Row:
+    """
+    出力行の基底クラス。サブクラスは __slots__ に列名を出力順に定義する
+
+        class TeamStatsRow(Row):
+            __slots__ = ('key', 'team', ...)
+
+        row = TeamStatsRow(key=..., team=...)   # 列はキーワード引数で指定する（指定のない列は空文字）
+
+    数値の列は int_fields（int）・float_fields（float）に、投球回の列は innings_fields に列名を定義する。
+    """
+    __slots__ = ()
+    # 列名（出力順。サブクラスの __slots__）
+    fieldnames = ()
+    # 整数の列・小数の列・投球回の列
+    int_fields = ()
+    float_fields = ()
+    innings_fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fieldnames = tuple(cls.__slots__)
+        cls._fieldset = frozenset(cls.fieldnames)
+        # csv.DictWriter が列の過不足の確認に使う（集合演算のできる keys ビュー）
+        cls._keys = dict.fromkeys(cls.fieldnames).keys()
+        cls._values = operator.attrgetter(*cls.fieldnames)
+        cls._converters = {name: to_int for name in cls.int_fields}
+        cls._converters.update({name: to_float for name in cls.float_fields})
+
+    def __init__(self, *args, **kwargs):
+        """列の値を列順の位置引数・列名のキーワード引数で指定する（指定のない列は空文字。数値の列は型変換する）"""
+        fieldnames = self.fieldnames
+        if len(args) > len(fieldnames):
+            raise TypeError(f"{type(self).__name__}: 列は{len(fieldnames)}個ですが、{len(args)}個の値が指定されました")
+        converters = self._converters
+        for i, name in enumerate(fieldnames):
+            if i < len(args):
+                if name in kwargs:
+                    raise TypeError(f"{type(self).__name__}: 列 {name} の値が重複して指定されました")
+                value = args[i]
+            else:
+                value = kwargs.pop(name, '')
+            converter = converters.get(name)
+            setattr(self, name, converter(value, name) if converter else value)
+        if kwargs:
+            raise TypeError(f"{type(self).__name__}: 未知の列です: {', '.join(kwargs)}")
+
+    @classmethod
+    def from_values(cls, values):
+        """列順の値（CSVの文字列または変換済みの値）から行を作成する（値が足りない列は空文字、余分な値は無視）"""
+        return cls(*tuple(values)[:len(cls.fieldnames)])
+
+    def values(self):
+        """列順の値のタプル"""
+        return self._values(self)
+
+    def keys(self):
+        return self._keys
+
+    def items(self):
+        return zip(self.fieldnames, self.values())
+
+    def get(self, name, default=None):
+        if name in self._fieldset:
+            return getattr(self, name)
+        return default
+
+    def __getitem__(self, name):
+        if name not in self._fieldset:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        if name not in self._fieldset:
+            raise KeyError(name)
+        converter = self._converters.get(name)
+        setattr(self, name, converter(value, name) if converter else value)
+
+    def __contains__(self, name):
+        return name in self._fieldset
+
+    def __iter__(self):
+        return iter(self.fieldnames)
+
+    def __len__(self):
+        return len(self.fieldnames)
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            return type(self) is type(other) and self.values() == other.values()
+        if isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # pickle では列名を送らず、列順の値のみ送る
+        return type(self).from_values, (self.values(),)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={value!r}" for name, value in self.items())
+        return f"{type(self).__name__}({fields})"
+
+
+class GameInfoRow(Row):
+    """試合情報（01_game_info.csv）"""
+    __slots__ = (
+        'key', 'team', 'url', 'type', 'date', 'start_time', 'place',
+        'top_or_bottom', 'top_team', 'top_team_score', 'bottom_team', 'bottom_team_score',
+        'result',
+        'top_inning_score_1', 'top_inning_score_2', 'top_inning_score_3',
+        'top_inning_score_4', 'top_inning_score_5', 'top_inning_score_6',
+        'top_inning_score_7', 'top_inning_score_8', 'top_inning_score_9',
+        'bottom_inning_score_1', 'bottom_inning_score_2', 'bottom_inning_score_3',
+        'bottom_inning_score_4', 'bottom_inning_score_5', 'bottom_inning_score_6',
+        'bottom_inning_score_7', 'bottom_inning_score_8', 'bottom_inning_score_9',
+        'win_pitcher', 'lose_pitcher', 'save_pitcher', 'hr_player'
+    )
+    int_fields = (
+        'top_team_score', 'bottom_team_score',
+        'top_inning_score_1', 'top_inning_score_2', 'top_inning_score_3',
+        'top_inning_score_4', 'top_inning_score_5', 'top_inning_score_6',
+        'top_inning_score_7', 'top_inning_score_8', 'top_inning_score_9',
+        'bottom_inning_score_1', 'bottom_inning_score_2', 'bottom_inning_score_3',
+        'bottom_inning_score_4', 'bottom_inning_score_5', 'bottom_inning_score_6',
+        'bottom_inning_score_7', 'bottom_inning_score_8', 'bottom_inning_score_9',
+    )
+
+
+class GameHitterStatsRow(Row):
+    """試合別打者成績（02_game_hitter_stats.csv）"""
+    __slots__ = (
+        'key', 'team', 'url', 'date', 'start_time',
+        'player_number', 'player', 'entry', 'order', 'position',
+        'plate_apperance', 'at_bat', 'hit', 'hr', 'rbi', 'run',
+        'stolen_base', 'double', 'triple',
+        'at_bat_in_scoring', 'hit_in_scoring',
+        'strikeout', 'walk', 'hit_by_pitch',
+        'sacrifice_bunt', 'sacrifice_fly', 'double_play',
+        'oponent_error', 'own_error', 'caught_stealing'
+    )
+    int_fields = (
+        'order',
+        'plate_apperance', 'at_bat', 'hit', 'hr', 'rbi', 'run',
+        'stolen_base', 'double', 'triple',
+        'at_bat_in_scoring', 'hit_in_scoring',
+        'strikeout', 'walk', 'hit_by_pitch',
+        'sacrifice_bunt', 'sacrifice_fly', 'double_play',
+        'oponent_error', 'own_error', 'caught_stealing',
+    )
+
+
+class GamePitcherStatsRow(Row):
+    """試合別投手成績（03_game_pitcher_stats.csv）"""
+    __slots__ = (
+        'key', 'team', 'url', 'date', 'start_time',
+        'player_number', 'player', 'result', 'inning',
+        'pitches', 'runs_allowed', 'earned_runs',
+        'complete_game', 'shotout', 'hits_allowed', 'hr_allowed',
+        'strikeouts', 'walks_allowed', 'hit_batsmen',
+        'balks', 'wild_pitches', 'order'
+    )
+    int_fields = (
+        'pitches', 'runs_allowed', 'earned_runs',
+        'hits_allowed', 'hr_allowed', 'strikeouts', 'walks_allowed', 'hit_batsmen',
+        'balks', 'wild_pitches', 'order',
+    )
+    innings_fields = ('inning',)
+
+
+class TeamStatsRow(Row):
+    """チーム成績（04_team_stats.csv）"""
+    __slots__ = (
+        'key', 'team', 'year', 'games', 'wins', 'losses', 'draws',
+        'winning_percentage', 'runs_scored', 'runs_allowed',
+        'batting_average', 'home_runs', 'stolen_bases', 'earned_run_average'
+    )
+    int_fields = (
+        'year', 'games', 'wins', 'losses', 'draws', 'runs_scored', 'runs_allowed', 'home_runs', 'stolen_bases',
+    )
+    float_fields = ('winning_percentage', 'batting_average', 'earned_run_average')
+
+
+class HitterStatsRow(Row):
+    """打者成績（05_hitter_stats.csv）"""
+    __slots__ = (
+        'key', 'team', 'year', 'player_number', 'player',
+        'games_played', 'batting_average', 'plate_appearance', 'at_bats',
+        'hit', 'hr', 'rbi', 'run', 'stolen_base',
+        'on_base_percentage', 'slugging_percentage', 'average_in_scoring', 'ops',
+        'double', 'triple', 'total_bases',
+        'strikeout', 'walk', 'hit_by_pitch',
+        'sacrifice_bunt', 'sacrifice_fly', 'double_play',
+        'opponent_error', 'own_error', 'caught_stealing'
+    )
+    int_fields = (
+        'year',
+        'games_played', 'plate_appearance', 'at_bats',
+        'hit', 'hr', 'rbi', 'run', 'stolen_base',
+        'double', 'triple', 'total_bases',
+        'strikeout', 'walk', 'hit_by_pitch',
+        'sacrifice_bunt', 'sacrifice_fly', 'double_play',
+        'opponent_error', 'own_error', 'caught_stealing',
+    )
+    float_fields = (
+        'batting_average', 'on_base_percentage', 'slugging_percentage', 'average_in_scoring', 'ops',
+    )
+
+
+class PitcherStatsRow(Row):
+    """投手成績（06_pitcher_stats.csv）"""
+    __slots__ = (
+        'key', 'team', 'year', 'player_number', 'player',
+        'games_played', 'wins', 'holds', 'saves', 'losses', 'win_percentage',
+        'era', 'innings_pitched', 'pitches_thrown',
+        'runs_allowed', 'earned_runs_allowed',
+        'complete_games', 'shutouts',
+        'hits_allowed', 'home_runs_allowed',
+        'strikeouts', 'strikeout_rate', 'walks_allowed', 'hit_batters',
+        'balks', 'wild_pitches', 'k_bb', 'whip'
+    )
+    int_fields = (
+        'year',
+        'games_played', 'wins', 'holds', 'saves', 'losses', 'pitches_thrown',
+        'runs_allowed', 'earned_runs_allowed',
+        'complete_games', 'shutouts',
+        'hits_allowed', 'home_runs_allowed',
+        'strikeouts', 'walks_allowed', 'hit_batters',
+        'balks', 'wild_pitches',
+    )
+    float_fields = ('win_percentage', 'era', 'strikeout_rate', 'k_bb', 'whip')
+    innings_fields = ('innings_pitched',)
+
+
+def row_values(row, fieldnames):
+    """行の列順の値（行クラスの行はそのまま、辞書の行は列名で取り出す）"""
+    if isinstance(row, Row):
+        return row.values()
+    return [row.get(name, '') for name in fieldnames]
+
+
+def iter_csv(filepath, row_class):
+    """
+    CSVファイルを読み込み、行クラスの行を順に返すジェネレーター。
+    ヘッダーの列順が行クラスと異なる場合は列名で対応付ける（ファイルにない列は空文字）
+    """
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if tuple(header) == row_class.fieldnames:
+            for values in reader:
+                if values:
+                    yield row_class.from_values(values)
+            return
+        index = {name: i for i, name in enumerate(header)}
+        positions = [index.get(name) for name in row_class.fieldnames]
+        for values in reader:
+            if values:
+                yield row_class.from_values(
+                    values[i] if i is not None and i < len(values) else '' for i in positions
+                )
+
+
+def write_csv(f, rows, fieldnames, header=True):
+    """行（行クラスの行または辞書）を開いたファイルにCSVで書き込む"""
+    writer = csv.writer(f)
+    if header:
+        writer.writerow(fieldnames)
+    writer.writerows(row_values(row, fieldnames) for row in rows)
+
+
+# 列指向の出力形式 -> 拡張子
+COLUMNAR_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def columnar_path(csv_path, fmt):
+    """出力CSVに対応する列指向のファイルのパス（同じディレクトリ・同じ名前で拡張子のみ異なる）"""
+    return os.path.splitext(csv_path)[0] + COLUMNAR_EXTENSIONS[fmt]
+
+
+def arrow_schema(row_class):
+    """
+    行クラスの Arrow スキーマ（整数の列は int64、小数の列は float64、それ以外は string）。
+    投球回の列の後ろには、アウト数の列（<列名>_outs、int64）を追加する
+    """
+    import pyarrow as pa
+    fields = []
+    for name in row_class.fieldnames:
+        if name in row_class.int_fields:
+            fields.append(pa.field(name, pa.int64()))
+        elif name in row_class.float_fields:
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+        if name in row_class.innings_fields:
+            fields.append(pa.field(f"{name}_outs", pa.int64()))
+    return pa.schema(fields)
+
+
+def _record_batch(rows, row_class, schema):
+    import pyarrow as pa
+    arrays = []
+    for name, column in zip(row_class.fieldnames, zip(*(row.values() for row in rows))):
+        arrays.append(pa.array(column, type=schema.field(name).type))
+        if name in row_class.innings_fields:
+            arrays.append(pa.array([innings_to_outs(value) for value in column], type=pa.int64()))
+    return pa.record_batch(arrays, schema=schema)
+
+
+def write_columnar(csv_path, row_class, fmt='parquet', batch_rows=10000):
+    """
+    出力CSVを読み込み、同じ値を列指向のファイル（Parquet / Arrow IPC）に書き出す。
+    batch_rows 行ずつ書き出すため、行数が多くてもメモリに全行を保持しない。
+    pyarrow がインストールされていない場合は何もしない。
+
+    Args:
+        csv_path: 出力CSVのパス
+        row_class: 行クラス
+        fmt: 'parquet' または 'arrow'
+
+    Returns:
+        書き出したファイルのパス（pyarrow がない場合は None）
+    """
+    try:
+        import pyarrow as pa
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+    except ImportError:
+        return None
+
+    schema = arrow_schema(row_class)
+    path = columnar_path(csv_path, fmt)
+    tmp_path = f"{path}.tmp"
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(tmp_path, schema)
+    else:
+        writer = pa.ipc.new_file(tmp_path, schema)
+    rows = iter_csv(csv_path, row_class)
+    with writer:
+        while True:
+            batch = list(itertools.islice(rows, batch_rows))
+            if not batch:
+                break
+            writer.write_batch(_record_batch(batch, row_class, schema))
+    os.replace(tmp_path, path)
+    return path
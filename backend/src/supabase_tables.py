@@ -0,0 +1,270 @@
+"""
+Supabase に同期するテーブルの定義と、CSV・列指向のファイルの読み込み（load_to_supabase.py / update_supabase.py で共通）
+
+行のハッシュ（sync_manifest.row_hash）は読み込んだ値から計算するため、一括投入と差分更新で
+同じ行が同じ値になるように、テーブルの定義と読み込み・型変換はこのモジュールにのみ置く。
+"""
+
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+
+# backend ディレクトリ = このスクリプトの親の親（backend/src/supabase_tables.py → backend）
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+INPUT_DIR = BACKEND_DIR / "input"
+OUTPUT_DIR = BACKEND_DIR / "output"
+
+# マスターテーブルは手動管理レコードが存在するため、一括投入でも削除せず、
+# 過去の試合の行からも参照されるため、差分更新で CSV からなくなった行も論理削除しない
+MASTER_TABLES = {"master_teams_info", "master_players_info"}
+
+# テーブル名 -> (CSV パス, 整数カラム, 小数カラム)
+# 実際のCSVヘッダーに準拠（plate_apperance, oponent_error, shotout 等）
+LOAD_CONFIG = [
+    ("master_teams_info", INPUT_DIR / "00_teams_info.csv", [], []),
+    ("master_players_info", INPUT_DIR / "01_players_info.csv", ["player_number"], []),
+    (
+        "transaction_game_info",
+        OUTPUT_DIR / "01_game_info.csv",
+        [
+            "top_team_score",
+            "bottom_team_score",
+            "top_inning_score_1",
+            "top_inning_score_2",
+            "top_inning_score_3",
+            "top_inning_score_4",
+            "top_inning_score_5",
+            "top_inning_score_6",
+            "top_inning_score_7",
+            "top_inning_score_8",
+            "top_inning_score_9",
+            "bottom_inning_score_1",
+            "bottom_inning_score_2",
+            "bottom_inning_score_3",
+            "bottom_inning_score_4",
+            "bottom_inning_score_5",
+            "bottom_inning_score_6",
+            "bottom_inning_score_7",
+            "bottom_inning_score_8",
+            "bottom_inning_score_9",
+        ],
+        [],
+    ),
+    (
+        "transaction_game_hitter_stats",
+        OUTPUT_DIR / "02_game_hitter_stats.csv",
+        [
+            "player_number",
+            "order",
+            "plate_apperance",
+            "at_bat",
+            "hit",
+            "hr",
+            "rbi",
+            "run",
+            "stolen_base",
+            "double",
+            "triple",
+            "at_bat_in_scoring",
+            "hit_in_scoring",
+            "strikeout",
+            "walk",
+            "hit_by_pitch",
+            "sacrifice_bunt",
+            "sacrifice_fly",
+            "double_play",
+            "oponent_error",
+            "own_error",
+            "caught_stealing",
+        ],
+        [],
+    ),
+    (
+        "transaction_game_pitcher_stats",
+        OUTPUT_DIR / "03_game_pitcher_stats.csv",
+        [
+            "player_number",
+            "pitches",
+            "runs_allowed",
+            "earned_runs",
+            "hits_allowed",
+            "hr_allowed",
+            "strikeouts",
+            "walks_allowed",
+            "hit_batsmen",
+            "balks",
+            "wild_pitches",
+            "order",
+        ],
+        [],
+    ),
+    (
+        "transaction_team_stats",
+        OUTPUT_DIR / "04_team_stats.csv",
+        ["year", "games", "wins", "losses", "draws", "runs_scored", "runs_allowed", "home_runs", "stolen_bases"],
+        ["winning_percentage", "batting_average", "earned_run_average"],
+    ),
+    (
+        "transaction_hitter_stats",
+        OUTPUT_DIR / "05_hitter_stats.csv",
+        [
+            "year",
+            "player_number",
+            "games_played",
+            "plate_appearance",
+            "at_bats",
+            "hit",
+            "hr",
+            "rbi",
+            "run",
+            "stolen_base",
+            "double",
+            "triple",
+            "total_bases",
+            "strikeout",
+            "walk",
+            "hit_by_pitch",
+            "sacrifice_bunt",
+            "sacrifice_fly",
+            "double_play",
+            "opponent_error",
+            "own_error",
+            "caught_stealing",
+        ],
+        ["batting_average", "on_base_percentage", "slugging_percentage", "average_in_scoring", "ops"],
+    ),
+    (
+        "transaction_pitcher_stats",
+        OUTPUT_DIR / "06_pitcher_stats.csv",
+        [
+            "year",
+            "player_number",
+            "games_played",
+            "wins",
+            "holds",
+            "saves",
+            "losses",
+            "pitches_thrown",
+            "runs_allowed",
+            "earned_runs_allowed",
+            "complete_games",
+            "shutouts",
+            "hits_allowed",
+            "home_runs_allowed",
+            "strikeouts",
+            "walks_allowed",
+            "hit_batters",
+            "balks",
+            "wild_pitches",
+        ],
+        ["win_percentage", "era", "strikeout_rate", "k_bb", "whip"],
+    ),
+]
+
+
+def to_int(s: str | None) -> int | None:
+    if s is None or (isinstance(s, str) and s.strip() in ("", "-", ".")):
+        return None
+    try:
+        return int(float(s))
+    except (ValueError, TypeError):
+        return None
+
+
+def to_num(s: str | None) -> float | None:
+    if s is None or (isinstance(s, str) and s.strip() in ("", "-")):
+        return None
+    t = s.strip()
+    if t == ".":
+        return None
+    try:
+        return float(t)
+    except (ValueError, TypeError):
+        return None
+
+
+def to_text(v: str) -> str | None:
+    if v is None:
+        return None
+    s = v.strip()
+    return s if s else None
+
+
+def column_converters(
+    headers: list[str],
+    int_cols: set[str],
+    num_cols: set[str],
+) -> list:
+    """列ごとの変換関数（列の種類の判定は行ごとではなく最初に1回だけ行う）"""
+    return [to_int if h in int_cols else to_num if h in num_cols else to_text for h in headers]
+
+
+def row_to_record(headers: list[str], row: list[str], converters: list) -> dict:
+    out = {}
+    for i, h in enumerate(headers):
+        raw = row[i].strip() if i < len(row) else ""
+        out[h] = converters[i](raw) if raw else None
+    return out
+
+
+def read_csv(path: Path, int_cols: set[str], num_cols: set[str]) -> list[dict]:
+    """CSV を読み込む。key は先頭列としてCSVに含まれる想定。"""
+    records = []
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        r = csv.reader(f)
+        raw_headers = next(r, None)
+        if not raw_headers:
+            return records
+        headers = [c.strip() for c in raw_headers]
+        converters = column_converters(headers, int_cols, num_cols)
+        for row in r:
+            if not row:
+                continue
+            rec = row_to_record(headers, row, converters)
+            records.append(rec)
+    return records
+
+
+def read_columnar(path: Path, int_cols: set[str], num_cols: set[str]) -> list[dict]:
+    """
+    スクレイパーが CSV と同時に出力した列指向のファイル（.parquet / .arrow）を読み込む。
+    数値の列は出力時に型付けされているため、文字列の値のみ CSV と同じく変換する。
+    投球回のアウト数の列（<列名>_outs）はテーブルにないため除く。
+    """
+    import pyarrow as pa
+
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+    else:
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+    columns = [c for c in table.column_names if not c.endswith("_outs")]
+    converters = list(zip(columns, column_converters(columns, int_cols, num_cols)))
+    records = table.select(columns).to_pylist()
+    for rec in records:
+        for h, convert in converters:
+            v = rec[h]
+            if isinstance(v, str):
+                v = v.strip()
+                rec[h] = convert(v) if v else None
+    return records
+
+
+def read_records(path: Path, int_cols: set[str], num_cols: set[str]) -> list[dict]:
+    """
+    出力ファイルを読み込む。CSV 以降に書き出された列指向のファイルがあり、
+    pyarrow がインストールされている場合はそちらを読み込む（文字列からの変換を省く）。
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return read_csv(path, int_cols, num_cols)
+    csv_mtime = path.stat().st_mtime
+    for suffix in (".parquet", ".arrow"):
+        columnar_path = path.with_suffix(suffix)
+        if columnar_path.exists() and columnar_path.stat().st_mtime >= csv_mtime:
+            return read_columnar(columnar_path, int_cols, num_cols)
+    return read_csv(path, int_cols, num_cols)
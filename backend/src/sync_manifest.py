@@ -0,0 +1,113 @@
+"""
+Supabase に同期した行の記録（マニフェスト）
+
+テーブルごとに、前回までに同期した行の key -> [行のハッシュ, チーム] を
+cache/supabase_sync/<テーブル名>.json に保存する。update_supabase.py は読み込んだ行のハッシュ（row_hash）と
+比較し、新しい行・内容が変わった行のみ送信する。マニフェストにあって今回の行にない key は論理削除の対象とする。
+
+行のハッシュは管理用の列（delete_flg・created_dt・updated_dt・row_hash）を除くすべての列の列名と値から計算し、
+テーブルの row_hash 列にも保存する。マニフェストは同期先（SUPABASE_URL）ごとに作り直す
+（同期先が異なる・ファイルがない・壊れている場合は空のマニフェストとして扱い、すべての行を送信する）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# 保存形式のバージョン（ハッシュの計算方法・保存する値を変えた場合に上げる）
+FORMAT_VERSION = 1
+
+# ハッシュの対象外の列（同期時に付与する管理用の列）
+META_COLUMNS = frozenset(("delete_flg", "created_dt", "updated_dt", "row_hash"))
+
+
+def _target_id(target: str) -> str:
+    """同期先の識別子（URL をそのまま保存しないようにハッシュにする）"""
+    return hashlib.sha256(target.encode("utf-8")).hexdigest()[:16]
+
+
+def row_hash(record: dict, columns: list[str]) -> str:
+    """行のハッシュ（列名と値の JSON の SHA-256）"""
+    payload = json.dumps([[h, record.get(h)] for h in columns], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def add_row_hashes(records: list[dict]) -> None:
+    """各レコードに row_hash を設定する（対象の列は先頭のレコードの列から決める）"""
+    if not records:
+        return
+    columns = [h for h in records[0] if h not in META_COLUMNS]
+    for rec in records:
+        rec["row_hash"] = row_hash(rec, columns)
+
+
+class SyncManifest:
+    """
+    テーブルの同期済みの行の記録
+
+    Args:
+        path: マニフェストのファイル
+        target: 同期先（SUPABASE_URL）
+    """
+
+    def __init__(self, path: Path, target: str):
+        self.path = path
+        self.target = _target_id(target)
+        self.rows: dict[str, list] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved["version"] == FORMAT_VERSION and saved["target"] == self.target:
+                self.rows = saved["rows"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def diff(self, records: list[dict]) -> tuple[list[dict], list[str], int]:
+        """
+        送信する行と論理削除する key を返す（records には add_row_hashes で row_hash を設定しておくこと）
+
+        論理削除する key は、マニフェストにあって records にない key のうち、records に含まれるチームの key のみ
+        （一部のチームのみ取得した場合に、他のチームの行を削除しないように）。
+
+        Returns:
+            (新しい行・内容が変わった行, 論理削除する key, 変更がない行の件数) のタプル
+        """
+        changed = []
+        current = set()
+        teams = set()
+        for rec in records:
+            key = rec.get("key")
+            current.add(key)
+            teams.add(rec.get("team"))
+            synced = self.rows.get(key)
+            if synced is None or synced[0] != rec["row_hash"]:
+                changed.append(rec)
+        deleted = [key for key, (_, team) in self.rows.items() if key not in current and team in teams]
+        return changed, deleted, len(records) - len(changed)
+
+    def mark_synced(self, records: list[dict]) -> None:
+        """送信した行を記録する"""
+        for rec in records:
+            self.rows[rec["key"]] = [rec["row_hash"], rec.get("team")]
+
+    def mark_deleted(self, keys: list[str]) -> None:
+        """論理削除した key を記録から除く（再び現れた場合は新しい行として送信する）"""
+        for key in keys:
+            self.rows.pop(key, None)
+
+    def replace(self, records: list[dict]) -> None:
+        """記録をテーブルの全件（一括投入した行）で置き換える"""
+        self.rows = {}
+        self.mark_synced(records)
+
+    def save(self) -> None:
+        """マニフェストを保存する（一時ファイルに書き出してからリネームする）"""
+        os.makedirs(self.path.parent, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "target": self.target, "rows": self.rows}, f,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
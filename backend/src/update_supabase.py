@@ -2,334 +2,182 @@
 """
 CSV を読み込み、Supabase の野球記録テーブルを更新するスクリプト。
 既存レコードは更新（created_dtは保持）、新規レコードは登録する。
+UPSERT は DB 関数 upsert_records（ddl/upsert_records.sql）で行うため、事前に作成しておくこと
+（1バッチにつき1リクエスト。created_dt・updated_dt はサーバー側で設定する）。
+バッチは payload のバイト数と応答時間で大きさを調整し、テーブルごと・テーブル内の複数のバッチを並行に送信する（batch_upload.py）。
+
+前回までに同期した行は cache/supabase_sync/ のマニフェスト（sync_manifest.py）に記録し、
+行のハッシュ（row_hash）が変わった行・新しい行のみ送信する。前回あって今回の CSV にない行は
+DB 関数 mark_records_deleted で論理削除（delete_flg = 1）する（トランザクションテーブルの、CSV に含まれるチームの行のみ。
+マスターテーブルは手動管理のため、CSV からなくなった行も削除しない）。
+論理削除する行が多すぎる場合（一部のページの取得に失敗した場合など）は削除せずに警告する。
 
 実行時カレントディレクトリはどこでも可（スクリプト配置から backend を基準にパス解決）。
 .env はプロジェクトルートまたは backend に SUPABASE_URL と SUPABASE_SERVICE_KEY を設定すること。
+
+使用方法: python src/update_supabase.py [--full] [--allow-mass-delete]
+  --full               マニフェストを使わずにすべての行を送信する
+  --allow-mass-delete  論理削除する行が多い場合も削除する
 """
 
 from __future__ import annotations
 
-import csv
 import os
 import sys
-from datetime import datetime, timezone
 from pathlib import Path
 
-from dotenv import load_dotenv
-from supabase import create_client
+import batch_upload
+import supabase_tables
+import sync_manifest
 
 # backend ディレクトリ = このスクリプトの親の親（backend/src/update_supabase.py → backend）
 BACKEND_DIR = Path(__file__).resolve().parent.parent
-INPUT_DIR = BACKEND_DIR / "input"
-OUTPUT_DIR = BACKEND_DIR / "output"
-BATCH_SIZE = 500
-# 既存レコード取得用のバッチサイズ（IN句の制限を考慮して小さく設定）
-EXISTING_RECORDS_BATCH_SIZE = 100
-
-# テーブル名 -> (CSV パス, 整数カラム, 小数カラム)
-# 仕様通りに記載順で処理
-LOAD_CONFIG = [
-    ("master_teams_info", INPUT_DIR / "00_teams_info.csv", [], []),
-    ("master_players_info", INPUT_DIR / "01_players_info.csv", ["player_number"], []),
-    (
-        "transaction_game_info",
-        OUTPUT_DIR / "01_game_info.csv",
-        [
-            "top_team_score",
-            "bottom_team_score",
-            "top_inning_score_1",
-            "top_inning_score_2",
-            "top_inning_score_3",
-            "top_inning_score_4",
-            "top_inning_score_5",
-            "top_inning_score_6",
-            "top_inning_score_7",
-            "top_inning_score_8",
-            "top_inning_score_9",
-            "bottom_inning_score_1",
-            "bottom_inning_score_2",
-            "bottom_inning_score_3",
-            "bottom_inning_score_4",
-            "bottom_inning_score_5",
-            "bottom_inning_score_6",
-            "bottom_inning_score_7",
-            "bottom_inning_score_8",
-            "bottom_inning_score_9",
-        ],
-        [],
-    ),
-    (
-        "transaction_game_hitter_stats",
-        OUTPUT_DIR / "02_game_hitter_stats.csv",
-        [
-            "player_number",
-            "order",
-            "plate_apperance",
-            "at_bat",
-            "hit",
-            "hr",
-            "rbi",
-            "run",
-            "stolen_base",
-            "double",
-            "triple",
-            "at_bat_in_scoring",
-            "hit_in_scoring",
-            "strikeout",
-            "walk",
-            "hit_by_pitch",
-            "sacrifice_bunt",
-            "sacrifice_fly",
-            "double_play",
-            "oponent_error",
-            "own_error",
-            "caught_stealing",
-        ],
-        [],
-    ),
-    (
-        "transaction_game_pitcher_stats",
-        OUTPUT_DIR / "03_game_pitcher_stats.csv",
-        [
-            "player_number",
-            "pitches",
-            "runs_allowed",
-            "earned_runs",
-            "hits_allowed",
-            "hr_allowed",
-            "strikeouts",
-            "walks_allowed",
-            "hit_batsmen",
-            "balks",
-            "wild_pitches",
-            "order",
-        ],
-        [],
-    ),
-    (
-        "transaction_team_stats",
-        OUTPUT_DIR / "04_team_stats.csv",
-        ["year", "games", "wins", "losses", "draws", "runs_scored", "runs_allowed", "home_runs", "stolen_bases"],
-        ["winning_percentage", "batting_average", "earned_run_average"],
-    ),
-    (
-        "transaction_hitter_stats",
-        OUTPUT_DIR / "05_hitter_stats.csv",
-        [
-            "year",
-            "player_number",
-            "games_played",
-            "plate_appearance",
-            "at_bats",
-            "hit",
-            "hr",
-            "rbi",
-            "run",
-            "stolen_base",
-            "double",
-            "triple",
-            "total_bases",
-            "strikeout",
-            "walk",
-            "hit_by_pitch",
-            "sacrifice_bunt",
-            "sacrifice_fly",
-            "double_play",
-            "opponent_error",
-            "own_error",
-            "caught_stealing",
-        ],
-        ["batting_average", "on_base_percentage", "slugging_percentage", "average_in_scoring", "ops"],
-    ),
-    (
-        "transaction_pitcher_stats",
-        OUTPUT_DIR / "06_pitcher_stats.csv",
-        [
-            "year",
-            "player_number",
-            "games_played",
-            "wins",
-            "holds",
-            "saves",
-            "losses",
-            "pitches_thrown",
-            "runs_allowed",
-            "earned_runs_allowed",
-            "complete_games",
-            "shutouts",
-            "hits_allowed",
-            "home_runs_allowed",
-            "strikeouts",
-            "walks_allowed",
-            "hit_batters",
-            "balks",
-            "wild_pitches",
-        ],
-        ["win_percentage", "era", "strikeout_rate", "k_bb", "whip"],
-    ),
-]
-
-
-def _to_int(s: str | None) -> int | None:
-    if s is None or (isinstance(s, str) and s.strip() in ("", "-", ".")):
-        return None
-    try:
-        return int(float(s))
-    except (ValueError, TypeError):
-        return None
+# UPSERT・論理削除を行う DB 関数（ddl/upsert_records.sql）
+UPSERT_FUNCTION = "upsert_records"
+DELETE_FUNCTION = "mark_records_deleted"
+# 同期済みの行の記録（sync_manifest.py）
+MANIFEST_DIR = BACKEND_DIR / "cache" / "supabase_sync"
+# 論理削除する行がこの件数を超え、かつ対象のチームの行のこの割合を超える場合は削除しない（--allow-mass-delete で削除）
+MASS_DELETE_MIN = 10
+MASS_DELETE_RATIO = 0.2
+
+# 同期するテーブル・読み込みは一括投入と差分更新で共通（supabase_tables.py）
+LOAD_CONFIG = supabase_tables.LOAD_CONFIG
+MASTER_TABLES = supabase_tables.MASTER_TABLES
+
+
+def _upsert_batched(
+    client,
+    table: str,
+    records: list[dict],
+    manifest: sync_manifest.SyncManifest | None = None,
+) -> tuple[int, int, batch_upload.UploadStats]:
+    """
+    レコードをバッチでUPSERT処理（1バッチにつき DB 関数 upsert_records を1回呼び出す）。
+    既存レコードはcreated_dtを保持し、updated_dtを更新。
+    新規レコードはcreated_dtとupdated_dtを現在日時に設定（いずれもサーバー側で設定する）。
+    manifest を指定した場合は、送信できたバッチの行を記録する。
 
+    Returns:
+        (更新件数, 新規登録件数, 送信の統計) のタプル
+    """
+    counts = {"updated": 0, "inserted": 0}
+    for rec in records:
+        rec["delete_flg"] = 0
 
-def _to_num(s: str | None) -> float | None:
-    if s is None or (isinstance(s, str) and s.strip() in ("", "-")):
-        return None
-    t = s.strip()
-    if t == ".":
-        return None
-    try:
-        return float(t)
-    except (ValueError, TypeError):
-        return None
+    def send(chunk):
+        response = client.rpc(UPSERT_FUNCTION, {"p_table": table, "p_records": chunk}).execute()
+        return response.data[0] if isinstance(response.data, list) else response.data
 
+    def done(chunk, result):
+        counts["inserted"] += result["inserted"]
+        counts["updated"] += result["updated"]
+        if manifest is not None:
+            manifest.mark_synced(chunk)
 
-def _cell(v: str) -> str | None:
-    if v is None:
-        return None
-    s = v.strip()
-    return s if s else None
-
-
-def _row_to_record(
-    headers: list[str],
-    row: list[str],
-    int_cols: set[str],
-    num_cols: set[str],
-) -> dict:
-    out = {}
-    for i, h in enumerate(headers):
-        raw = row[i].strip() if i < len(row) else ""
-        val: str | int | float | None
-        if h in int_cols:
-            val = _to_int(raw) if raw else None
-        elif h in num_cols:
-            val = _to_num(raw) if raw else None
-        else:
-            val = _cell(raw) if raw else None
-        out[h] = val
-    return out
-
-
-def _read_csv(path: Path, int_cols: set[str], num_cols: set[str]) -> list[dict]:
-    """CSV を読み込む。key は先頭列としてCSVに含まれる想定。"""
-    records = []
-    with open(path, encoding="utf-8-sig", newline="") as f:
-        r = csv.reader(f)
-        raw_headers = next(r, None)
-        if not raw_headers:
-            return records
-        headers = [c.strip() for c in raw_headers]
-        for row in r:
-            if not row:
-                continue
-            rec = _row_to_record(headers, row, int_cols, num_cols)
-            records.append(rec)
-    return records
-
-
-def _get_existing_records_batch(client, table: str, keys: list[str], existing_map: dict[str, dict]) -> None:
+    try:
+        stats = batch_upload.upload(records, send, on_done=done, label=table)
+    except Exception as e:
+        print(f"エラー: {table} のUPSERT処理中にエラー: {e}", file=sys.stderr)
+        raise
+    return (counts["updated"], counts["inserted"], stats)
+
+
+def _mark_deleted_batched(
+    client,
+    table: str,
+    keys: list[str],
+    manifest: sync_manifest.SyncManifest,
+) -> tuple[int, batch_upload.UploadStats]:
     """
-    既存レコードをkeyで取得してマップに追加（再帰的にバッチ分割）。
-    エラーが発生した場合は、バッチを分割して再試行する。
+    key のレコードをバッチで論理削除する（1バッチにつき DB 関数 mark_records_deleted を1回呼び出す）。
+
+    Returns:
+        (論理削除件数, 送信の統計) のタプル
     """
-    if not keys:
-        return
-    
+    counts = {"deleted": 0}
+
+    def send(chunk):
+        return client.rpc(DELETE_FUNCTION, {"p_table": table, "p_keys": chunk}).execute().data or 0
+
+    def done(chunk, result):
+        counts["deleted"] += result
+        manifest.mark_deleted(chunk)
+
     try:
-        # keyカラムでIN検索
-        response = client.table(table).select("key,created_dt").in_("key", keys).execute()
-        for record in response.data:
-            existing_map[record["key"]] = record
-    except Exception:
-        # エラーが発生した場合、バッチを分割して再試行
-        if len(keys) > 1:
-            mid = len(keys) // 2
-            _get_existing_records_batch(client, table, keys[:mid], existing_map)
-            _get_existing_records_batch(client, table, keys[mid:], existing_map)
-        else:
-            # 1件の場合は個別に取得を試みる
-            try:
-                response = client.table(table).select("key,created_dt").eq("key", keys[0]).execute()
-                if response.data:
-                    existing_map[response.data[0]["key"]] = response.data[0]
-            except Exception:
-                pass
-
-
-def _get_existing_records(client, table: str, keys: list[str]) -> dict[str, dict]:
-    """既存レコードをkeyで取得してマップ化。"""
-    if not keys:
-        return {}
-    
-    existing_map = {}
-    # 重複を除去
-    unique_keys = list(dict.fromkeys(keys))
-    
-    # バッチサイズごとに既存レコードを取得
-    for i in range(0, len(unique_keys), EXISTING_RECORDS_BATCH_SIZE):
-        chunk_keys = unique_keys[i : i + EXISTING_RECORDS_BATCH_SIZE]
-        _get_existing_records_batch(client, table, chunk_keys, existing_map)
-    
-    return existing_map
+        stats = batch_upload.upload(keys, send, on_done=done, label=table)
+    except Exception as e:
+        print(f"エラー: {table} の論理削除処理中にエラー: {e}", file=sys.stderr)
+        raise
+    return (counts["deleted"], stats)
 
 
-def _upsert_batched(client, table: str, records: list[dict]) -> tuple[int, int]:
+def _is_mass_delete(deleted: int, records: int) -> bool:
+    """論理削除する行が多すぎるか（今回の行と合わせた件数に対する割合で判定する）"""
+    return deleted > MASS_DELETE_MIN and deleted > MASS_DELETE_RATIO * (deleted + records)
+
+
+def _update_table(client, url: str, config: tuple, full: bool, allow_mass_delete: bool) -> dict | None:
     """
-    レコードをバッチでUPSERT処理。
-    既存レコードはcreated_dtを保持し、updated_dtを更新。
-    新規レコードはcreated_dtとupdated_dtを現在日時に設定。
-    
+    1テーブルを更新する（batch_upload.run_tables から並行に呼び出す）。
+
     Returns:
-        (更新件数, 新規登録件数) のタプル
+        件数（updated / inserted / deleted / unchanged）と送信の統計（stats）の辞書。スキップした場合は None
     """
-    now = datetime.now(timezone.utc)
-    updated_count = 0
-    inserted_count = 0
-    
-    for i in range(0, len(records), BATCH_SIZE):
-        chunk = records[i : i + BATCH_SIZE]
-        
-        # バッチ内の全keyを取得
-        keys = [rec.get("key") for rec in chunk if rec.get("key")]
-        
-        # 既存レコードを取得
-        existing_map = _get_existing_records(client, table, keys)
-        
-        # 各レコードに日時と削除フラグを設定
-        for rec in chunk:
-            rec["delete_flg"] = 0
-            key = rec.get("key")
-            
-            if key and key in existing_map:
-                # 既存レコード: created_dtを保持、updated_dtを更新
-                rec["created_dt"] = existing_map[key]["created_dt"]
-                rec["updated_dt"] = now.isoformat()
-                updated_count += 1
-            else:
-                # 新規レコード: created_dtとupdated_dtを現在日時に設定
-                rec["created_dt"] = now.isoformat()
-                rec["updated_dt"] = now.isoformat()
-                inserted_count += 1
-        
-        # upsertで一括更新
-        try:
-            client.table(table).upsert(chunk).execute()
-        except Exception as e:
-            print(f"エラー: {table} のUPSERT処理中にエラー: {e}", file=sys.stderr)
-            raise
-    
-    return (updated_count, inserted_count)
+    table, csv_path, int_cols, num_cols = config
+    # ファイルの存在確認
+    if not csv_path.exists():
+        print(f"スキップ: {csv_path} が存在しません")
+        return None
+
+    records = supabase_tables.read_records(csv_path, set(int_cols), set(num_cols))
+    if not records:
+        print(f"スキップ: {table} ({csv_path}) にデータ行がありません")
+        return None
+
+    # 前回の同期から変わった行・なくなった行のみ送信する
+    manifest = sync_manifest.SyncManifest(MANIFEST_DIR / f"{table}.json", url)
+    sync_manifest.add_row_hashes(records)
+    changed, deleted_keys, unchanged = manifest.diff(records)
+    if full:
+        changed, unchanged = records, 0
+    if table in MASTER_TABLES:
+        deleted_keys = []
+    if deleted_keys and not allow_mass_delete and _is_mass_delete(len(deleted_keys), len(records)):
+        print(
+            f"警告: {table} - 論理削除する行が多すぎるため削除しません（{len(deleted_keys)} 件。"
+            "--allow-mass-delete で削除）",
+            file=sys.stderr,
+        )
+        deleted_keys = []
+
+    # UPSERT処理
+    try:
+        updated, inserted, stats = _upsert_batched(client, table, changed, manifest)
+        deleted, delete_stats = _mark_deleted_batched(client, table, deleted_keys, manifest)
+    finally:
+        # 送信できた行までを記録する（途中で失敗した場合、残りの行は次回送信する）
+        manifest.save()
+    stats.add(delete_stats)
+    print(
+        f"更新: {table} - 更新 {updated} 件, 新規登録 {inserted} 件, 論理削除 {deleted} 件, "
+        f"変更なし {unchanged} 件（リクエスト {stats.requests} 回）"
+    )
+    return {"updated": updated, "inserted": inserted, "deleted": deleted, "unchanged": unchanged, "stats": stats}
 
 
 def main() -> int:
+    args = sys.argv[1:]
+    full = "--full" in args
+    allow_mass_delete = "--allow-mass-delete" in args
+    unknown = [a for a in args if a not in ("--full", "--allow-mass-delete")]
+    if unknown:
+        print("使用方法: python src/update_supabase.py [--full] [--allow-mass-delete]", file=sys.stderr)
+        return 1
+
+    # dotenv・supabase は実行時にのみインポートする（supabase は読み込みに時間がかかるため、設定を確認してから）
+    from dotenv import load_dotenv
+
     load_dotenv()
     url = os.environ.get("SUPABASE_URL", "").strip()
     key = os.environ.get("SUPABASE_SERVICE_KEY", "").strip()
@@ -337,45 +185,44 @@ def main() -> int:
         print("SUPABASE_URL と SUPABASE_SERVICE_KEY を .env に設定してください。", file=sys.stderr)
         return 1
 
+    from supabase import create_client
+
     client = create_client(url, key)
 
-    total_updated = 0
-    total_inserted = 0
+    totals = {"updated": 0, "inserted": 0, "deleted": 0, "unchanged": 0}
+    total_stats = batch_upload.UploadStats()
+    throughput = []
     error_count = 0
 
-    for table, csv_path, int_cols, num_cols in LOAD_CONFIG:
-        # ファイルの存在確認
-        if not csv_path.exists():
-            print(f"スキップ: {csv_path} が存在しません")
-            continue
-        
-        try:
-            int_s = set(int_cols)
-            num_s = set(num_cols)
-            records = _read_csv(csv_path, int_s, num_s)
-            
-            if not records:
-                print(f"スキップ: {table} ({csv_path}) にデータ行がありません")
-                continue
-            
-            # UPSERT処理
-            updated, inserted = _upsert_batched(client, table, records)
-            total_updated += updated
-            total_inserted += inserted
-            print(f"更新: {table} - 更新 {updated} 件, 新規登録 {inserted} 件")
-            
-        except Exception as e:
-            print(f"エラー: {table} ({csv_path}) - {e}", file=sys.stderr)
+    # テーブル間に依存関係はないため並行に更新する（エラーが発生しても他のテーブルの処理は継続）
+    results = batch_upload.run_tables(
+        LOAD_CONFIG, lambda config: _update_table(client, url, config, full, allow_mass_delete)
+    )
+    for (table, csv_path, _, _), result in zip(LOAD_CONFIG, results):
+        if isinstance(result, Exception):
+            print(f"エラー: {table} ({csv_path}) - {result}", file=sys.stderr)
             error_count += 1
-            # エラーが発生しても次のテーブル処理を継続
             continue
+        if result is None:
+            continue
+        for name in totals:
+            totals[name] += result[name]
+        total_stats.add(result["stats"])
+        throughput.append(batch_upload.format_throughput(table, result["stats"]))
 
     # サマリー表示
     print("\n" + "=" * 70)
     print("処理完了")
     print("=" * 70)
-    print(f"更新件数: {total_updated} 件")
-    print(f"新規登録件数: {total_inserted} 件")
+    print(f"更新件数: {totals['updated']} 件")
+    print(f"新規登録件数: {totals['inserted']} 件")
+    print(f"論理削除件数: {totals['deleted']} 件")
+    print(f"変更なし（送信しなかった行）: {totals['unchanged']} 件")
+    print(f"リクエスト数: {total_stats.requests} 回（再送 {total_stats.retries} 回）")
+    if throughput:
+        print("テーブル別のスループット:")
+        for line in throughput:
+            print(line)
     if error_count > 0:
         print(f"エラー発生テーブル数: {error_count}")
         return 1
@@ -0,0 +1,12 @@
+"""
+テストの共通設定
+
+src のモジュールは同じディレクトリのモジュールを通常の import で読み込むため、src を sys.path の先頭に追加する
+（スクリプトを直接実行した場合と同じ）。
+"""
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
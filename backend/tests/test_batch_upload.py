@@ -0,0 +1,100 @@
+"""batch_upload のバッチ分割・再送のテスト"""
+import threading
+
+import pytest
+
+import batch_upload
+
+
+class ApiError(Exception):
+    """postgrest の APIError と同じく code にステータスを持つ例外"""
+
+    def __init__(self, code):
+        super().__init__(f"status {code}")
+        self.code = code
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(batch_upload, "BACKOFF_BASE", 0.0)
+
+
+def collect(items, send, **kwargs):
+    """upload を実行し、送信できたバッチの一覧と統計を返す"""
+    sent = []
+    stats = batch_upload.upload(items, send, on_done=lambda chunk, result: sent.append(list(chunk)), **kwargs)
+    return sent, stats
+
+
+def test_413_splits_the_batch_until_it_fits():
+    lock = threading.Lock()
+    attempts = []
+
+    def send(chunk):
+        with lock:
+            attempts.append(len(chunk))
+        if len(chunk) > 10:
+            raise ApiError("413")
+        return len(chunk)
+
+    items = list(range(100))
+    sizer = batch_upload.BatchSizer(initial_bytes=10_000, min_bytes=1)
+    sent, stats = collect(items, send, size=lambda item: 100, sizer=sizer)
+
+    assert sorted(item for chunk in sent for item in chunk) == items
+    assert all(len(chunk) <= 10 for chunk in sent)
+    assert stats.rows == 100
+    assert stats.requests == len(attempts)
+    # 以降のバッチの上限も下がる
+    assert sizer.ceiling < 10_000
+
+
+def test_413_for_a_single_row_is_raised():
+    def send(chunk):
+        raise ApiError(413)
+
+    with pytest.raises(ApiError):
+        collect(["row"], send)
+
+
+def test_retryable_error_resends_the_same_batch():
+    failures = {"left": 2}
+
+    def send(chunk):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise ApiError("503")
+        return len(chunk)
+
+    sent, stats = collect(list(range(5)), send)
+    assert sent == [[0, 1, 2, 3, 4]]
+    assert stats.retries == 2
+
+
+def test_non_retryable_error_is_raised():
+    def send(chunk):
+        raise ApiError("23505")
+
+    with pytest.raises(ApiError):
+        collect(list(range(5)), send)
+
+
+def test_sizer_takes_at_least_one_row_and_respects_the_limit():
+    sizer = batch_upload.BatchSizer(initial_bytes=250, min_bytes=1, max_rows=3)
+    sizes = [100, 100, 100, 100, 1000]
+    assert sizer.take(sizes, 0) == 2
+    assert sizer.take(sizes, 4) == 5
+    sizer.target_bytes = 10_000
+    assert sizer.take(sizes, 0) == 3
+
+
+@pytest.mark.parametrize("exc, expected", [
+    (ApiError("413"), batch_upload.TOO_LARGE),
+    (ApiError(429), batch_upload.RETRY),
+    (ApiError("57014"), batch_upload.TIMEOUT),
+    (TimeoutError(), batch_upload.TIMEOUT),
+    (ApiError("23505"), None),
+    (ValueError(), None),
+])
+def test_classify(exc, expected):
+    assert batch_upload.classify(exc) == expected
@@ -0,0 +1,120 @@
+"""checkpoint.CsvCheckpoint の再開（--resume）と出力ファイルの書き出しのテスト"""
+import json
+import os
+
+import pytest
+
+import checkpoint
+import row_types
+
+OUTPUTS = {'games': ('01_game_info.csv', row_types.GameInfoRow)}
+OPTIONS = {'test': False, 'incremental': False, 'replay': None}
+
+
+def game(team, url):
+    return row_types.GameInfoRow(key=f"{team}_{url}", team=team, url=url)
+
+
+def open_checkpoint(tmp_path, resume=False, options=OPTIONS, teams=('a', 'b')):
+    return checkpoint.CsvCheckpoint('01_game_info', teams, OUTPUTS, output_dir=str(tmp_path),
+                                    resume=resume, options=options)
+
+
+def read_urls(path):
+    return [row.url for row in row_types.iter_csv(path, row_types.GameInfoRow)]
+
+
+def test_finalize_concatenates_teams_in_order(tmp_path):
+    cp = open_checkpoint(tmp_path)
+    cp.write('b', 'b1', {'games': [game('b', 'b1')]})
+    cp.write('a', 'a1', {'games': [game('a', 'a1')]})
+    cp.write('a', 'a2', {'games': [game('a', 'a2')]})
+    filepaths = cp.finalize()
+
+    assert read_urls(filepaths['games']) == ['a1', 'a2', 'b1']
+    assert cp.finished
+    # 一時ファイル・ジャーナルは削除され、完了の記録のみ残る
+    assert os.listdir(cp.dir) == ['complete.json']
+
+
+def test_resume_skips_completed_pages(tmp_path):
+    cp = open_checkpoint(tmp_path)
+    cp.write('a', 'a1', {'games': [game('a', 'a1')]})
+    cp.write('b', 'b1', {'games': [game('b', 'b1')]})
+    # finalize せずに中断した
+
+    resumed = open_checkpoint(tmp_path, resume=True)
+    assert resumed.is_completed('a1') and resumed.is_completed('b1')
+    assert not resumed.is_completed('a2')
+    assert resumed.count('games') == 2
+    resumed.write('a', 'a2', {'games': [game('a', 'a2')]})
+    filepaths = resumed.finalize()
+
+    assert read_urls(filepaths['games']) == ['a1', 'a2', 'b1']
+
+
+def test_resume_truncates_rows_written_after_the_last_journal_record(tmp_path):
+    cp = open_checkpoint(tmp_path)
+    cp.write('a', 'a1', {'games': [game('a', 'a1')]})
+    # 一時ファイルへの書き込み後、ジャーナルへの記録の途中で中断した
+    part_path = cp._part_path('a', 'games')
+    with open(part_path, 'a', encoding='utf-8') as f:
+        f.write('a_a9,a,a9\n')
+    with open(cp.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"team": "a", "url": "a9", "si')
+
+    resumed = open_checkpoint(tmp_path, resume=True)
+    assert not resumed.is_completed('a9')
+    filepaths = resumed.finalize()
+
+    assert read_urls(filepaths['games']) == ['a1']
+
+
+def test_resume_with_different_options_raises(tmp_path):
+    cp = open_checkpoint(tmp_path)
+    cp.write('a', 'a1', {'games': [game('a', 'a1')]})
+
+    with pytest.raises(checkpoint.CheckpointMismatch):
+        open_checkpoint(tmp_path, resume=True, options=dict(OPTIONS, incremental=True))
+
+
+def test_without_resume_previous_pages_are_discarded(tmp_path):
+    cp = open_checkpoint(tmp_path)
+    cp.write('a', 'a1', {'games': [game('a', 'a1')]})
+
+    fresh = open_checkpoint(tmp_path)
+    assert not fresh.is_completed('a1')
+    assert fresh.count('games') == 0
+
+
+def test_resume_after_finalize_is_finished_only_for_the_same_run(tmp_path):
+    cp = open_checkpoint(tmp_path)
+    cp.write('a', 'a1', {'games': [game('a', 'a1')]})
+    filepaths = cp.finalize()
+
+    resumed = open_checkpoint(tmp_path, resume=True)
+    assert resumed.finished
+    assert resumed.previous_outputs == filepaths
+
+    # 別のチームの組み合わせ・別の日の完了は再開しない
+    other_teams = open_checkpoint(tmp_path, resume=True, teams=('a',))
+    assert not other_teams.finished
+    assert not os.path.exists(other_teams.complete_path)
+
+    cp = open_checkpoint(tmp_path)
+    cp.write('a', 'a1', {'games': [game('a', 'a1')]})
+    cp.finalize()
+    with open(cp.complete_path, 'r', encoding='utf-8') as f:
+        complete = json.load(f)
+    complete['date'] = '2000-01-01'
+    with open(cp.complete_path, 'w', encoding='utf-8') as f:
+        json.dump(complete, f)
+    assert not open_checkpoint(tmp_path, resume=True).finished
+
+
+def test_finalize_without_rows_writes_no_file(tmp_path):
+    cp = open_checkpoint(tmp_path)
+    cp.write('a', 'a1', {})
+
+    assert cp.finalize() == {'games': None}
+    assert not os.path.exists(os.path.join(tmp_path, '01_game_info.csv'))
@@ -0,0 +1,99 @@
+"""row_types の数値・投球回の変換と行クラスのテスト"""
+import pytest
+
+import row_types
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('12', 12),
+    (' 7 ', 7),
+    ('-3', -3),
+    ('3.0', 3),
+    ('1,234', 1234),
+    (5, 5),
+    ('', None),
+    ('-', None),
+    ('.', None),
+    (None, None),
+])
+def test_to_int(value, expected):
+    assert row_types.to_int(value) == expected
+
+
+@pytest.mark.parametrize('value', ['.667', '2.5', 'abc', '1,23', 'nan'])
+def test_to_int_does_not_truncate_or_guess(value, capsys):
+    assert row_types.to_int(value, 'test_to_int') is None
+    assert 'test_to_int' in capsys.readouterr().out
+
+
+def test_to_int_warns_once_per_value(capsys):
+    row_types.to_int('x1', 'test_warn_once')
+    row_types.to_int('x1', 'test_warn_once')
+    assert capsys.readouterr().out.count('x1') == 1
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('.333', 0.333),
+    ('3.25', 3.25),
+    ('1,234.5', 1234.5),
+    ('10', 10.0),
+    (0.5, 0.5),
+    ('', None),
+    ('-', None),
+    (None, None),
+])
+def test_to_float(value, expected):
+    assert row_types.to_float(value) == expected
+
+
+def test_to_float_invalid_value(capsys):
+    assert row_types.to_float('---', 'test_to_float') is None
+    assert 'test_to_float' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('5', 15),
+    ('5.3', 16),
+    ('5.6', 17),
+    ('0.3', 1),
+    ('7回', 21),
+    ('7回1/3', 22),
+    ('7回2/3', 23),
+    ('0回1/3', 1),
+    (' 6 ', 18),
+    ('', None),
+    (None, None),
+    ('5.5', None),
+    ('7回3/3', None),
+    ('-', None),
+])
+def test_innings_to_outs(text, expected):
+    assert row_types.innings_to_outs(text) == expected
+
+
+def test_row_converts_numeric_columns_and_keeps_text():
+    row = row_types.GameHitterStatsRow(key='k', player_number='07', at_bat='4', hit='')
+    assert row.player_number == '07'
+    assert row.at_bat == 4
+    assert row.hit is None
+    assert row.team == ''
+
+    row['hit'] = '2'
+    assert row['hit'] == 2
+
+
+def test_row_from_values_pads_and_ignores_extra_values():
+    fieldnames = row_types.GameInfoRow.fieldnames
+    row = row_types.GameInfoRow.from_values(['k', 'team'])
+    assert (row.key, row.team, row.url) == ('k', 'team', '')
+    row = row_types.GameInfoRow.from_values([''] * (len(fieldnames) + 3))
+    assert len(row.values()) == len(fieldnames)
+
+
+@pytest.mark.parametrize('make', [
+    lambda: row_types.GameInfoRow(unknown='x'),
+    lambda: row_types.GameInfoRow('k', key='k'),
+])
+def test_row_rejects_invalid_arguments(make):
+    with pytest.raises(TypeError):
+        make()
@@ -0,0 +1,148 @@
+"""sync_manifest.SyncManifest の差分と update_supabase の論理削除の抑止のテスト"""
+import csv
+
+import pytest
+
+import sync_manifest
+import update_supabase
+
+TARGET = "https://example.supabase.co"
+
+
+def records(*rows):
+    result = [{"key": key, "team": team, "value": value} for key, team, value in rows]
+    sync_manifest.add_row_hashes(result)
+    return result
+
+
+def test_diff_returns_new_and_changed_rows(tmp_path):
+    manifest = sync_manifest.SyncManifest(tmp_path / "t.json", TARGET)
+    first = records(("k1", "a", "1"), ("k2", "a", "2"))
+    changed, deleted, unchanged = manifest.diff(first)
+    assert [r["key"] for r in changed] == ["k1", "k2"]
+    assert (deleted, unchanged) == ([], 0)
+    manifest.mark_synced(changed)
+
+    second = records(("k1", "a", "1"), ("k2", "a", "20"), ("k3", "a", "3"))
+    changed, deleted, unchanged = manifest.diff(second)
+    assert [r["key"] for r in changed] == ["k2", "k3"]
+    assert (deleted, unchanged) == ([], 1)
+
+
+def test_diff_deletes_only_keys_of_teams_in_records(tmp_path):
+    manifest = sync_manifest.SyncManifest(tmp_path / "t.json", TARGET)
+    manifest.mark_synced(records(("a1", "a", "1"), ("a2", "a", "2"), ("b1", "b", "1")))
+
+    # チーム b の行を取得しなかった場合、b の行は削除しない
+    _, deleted, _ = manifest.diff(records(("a1", "a", "1")))
+    assert deleted == ["a2"]
+
+    manifest.mark_deleted(deleted)
+    assert sorted(manifest.rows) == ["a1", "b1"]
+
+
+def test_row_hash_ignores_meta_columns():
+    base = records(("k", "a", "1"))[0]
+    with_meta = {"key": "k", "team": "a", "value": "1", "delete_flg": 1, "updated_dt": "2026-01-01"}
+    sync_manifest.add_row_hashes([with_meta])
+    assert with_meta["row_hash"] == base["row_hash"]
+
+
+def test_manifest_round_trip_and_target_check(tmp_path):
+    path = tmp_path / "sync" / "t.json"
+    manifest = sync_manifest.SyncManifest(path, TARGET)
+    manifest.mark_synced(records(("k1", "a", "1")))
+    manifest.save()
+
+    assert sync_manifest.SyncManifest(path, TARGET).rows == manifest.rows
+    # 同期先が異なる・壊れたマニフェストは空として扱う（すべての行を送信する）
+    assert sync_manifest.SyncManifest(path, "https://other.supabase.co").rows == {}
+    path.write_text("{broken", encoding="utf-8")
+    assert sync_manifest.SyncManifest(path, TARGET).rows == {}
+
+
+@pytest.mark.parametrize("deleted, remaining, expected", [
+    (0, 100, False),
+    (update_supabase.MASS_DELETE_MIN, 0, False),
+    (update_supabase.MASS_DELETE_MIN + 1, 0, True),
+    (20, 100, False),
+    (30, 100, True),
+])
+def test_is_mass_delete(deleted, remaining, expected):
+    assert update_supabase._is_mass_delete(deleted, remaining) is expected
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Execute:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeClient:
+    """DB 関数の呼び出しを記録する Supabase クライアントの代わり"""
+
+    def __init__(self):
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        if name == update_supabase.UPSERT_FUNCTION:
+            return _Execute(FakeResponse([{"inserted": len(params["p_records"]), "updated": 0}]))
+        return _Execute(FakeResponse(len(params["p_keys"])))
+
+    def keys(self, name):
+        return [key for called, params in self.calls if called == name
+                for key in params.get("p_keys", [])]
+
+
+def write_csv(path, keys):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["key", "team", "value"])
+        for key in keys:
+            writer.writerow([key, "a", "1"])
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    monkeypatch.setattr(update_supabase, "MANIFEST_DIR", tmp_path / "sync")
+    csv_path = tmp_path / "rows.csv"
+    return ("transaction_test", csv_path, [], []), csv_path
+
+
+def test_update_table_skips_mass_delete(table):
+    config, csv_path = table
+    write_csv(csv_path, [f"k{i}" for i in range(50)])
+    update_supabase._update_table(FakeClient(), TARGET, config, full=False, allow_mass_delete=False)
+
+    # 一部のページの取得に失敗して行が大きく減った
+    write_csv(csv_path, [f"k{i}" for i in range(20)])
+    client = FakeClient()
+    result = update_supabase._update_table(client, TARGET, config, full=False, allow_mass_delete=False)
+    assert result["deleted"] == 0
+    assert client.keys(update_supabase.DELETE_FUNCTION) == []
+
+    # --allow-mass-delete の場合は削除する
+    client = FakeClient()
+    result = update_supabase._update_table(client, TARGET, config, full=False, allow_mass_delete=True)
+    assert result["deleted"] == 30
+    assert sorted(client.keys(update_supabase.DELETE_FUNCTION)) == sorted(f"k{i}" for i in range(20, 50))
+
+
+def test_update_table_deletes_a_few_removed_rows(table):
+    config, csv_path = table
+    write_csv(csv_path, [f"k{i}" for i in range(50)])
+    update_supabase._update_table(FakeClient(), TARGET, config, full=False, allow_mass_delete=False)
+
+    write_csv(csv_path, [f"k{i}" for i in range(48)])
+    client = FakeClient()
+    result = update_supabase._update_table(client, TARGET, config, full=False, allow_mass_delete=False)
+    assert (result["deleted"], result["unchanged"], result["inserted"]) == (2, 48, 0)
+    assert sorted(client.keys(update_supabase.DELETE_FUNCTION)) == ["k48", "k49"]